@@ -0,0 +1,181 @@
+// Benchmark the latency and memory the Astro API proxy adds on top of the API server.
+//
+// Starts a stub API server, launches the built Astro server pointed at it, then sends the
+// same load directly to the stub and through the proxy and compares latency percentiles.
+// The proxy's resident memory is sampled for the whole run.
+//
+// Usage (from the client directory):
+//   npm run build
+//   node scripts/bench-proxy.mjs [--requests 20000] [--concurrency 256] [--body-kb 64] [--gzip]
+import http from 'node:http';
+import zlib from 'node:zlib';
+import { spawn, execFile } from 'node:child_process';
+import { promisify } from 'node:util';
+import { setTimeout as sleep } from 'node:timers/promises';
+
+function parseArgs(argv) {
+  const options = { requests: 20000, concurrency: 256, bodyKb: 64, gzip: false, proxyPort: 4399 };
+  for (let i = 0; i < argv.length; i++) {
+    const arg = argv[i];
+    if (arg === '--requests') options.requests = parseInt(argv[++i]);
+    else if (arg === '--concurrency') options.concurrency = parseInt(argv[++i]);
+    else if (arg === '--body-kb') options.bodyKb = parseInt(argv[++i]);
+    else if (arg === '--proxy-port') options.proxyPort = parseInt(argv[++i]);
+    else if (arg === '--gzip') options.gzip = true;
+  }
+  return options;
+}
+
+// Stub API server returning a fixed JSON body, optionally pre-compressed like the Flask app does
+function startStubServer(bodyKb, gzip) {
+  const dogs = [];
+  while (JSON.stringify(dogs).length < bodyKb * 1024) {
+    dogs.push({ id: String(dogs.length), name: `Dog ${dogs.length}`, breed: 'Labrador Retriever' });
+  }
+  const body = Buffer.from(JSON.stringify(dogs));
+  const compressed = zlib.gzipSync(body);
+
+  const server = http.createServer((req, res) => {
+    const useGzip = gzip && (req.headers['accept-encoding'] || '').includes('gzip');
+    res.writeHead(200, {
+      'Content-Type': 'application/json',
+      'Content-Length': useGzip ? compressed.length : body.length,
+      ...(useGzip ? { 'Content-Encoding': 'gzip' } : {}),
+    });
+    res.end(useGzip ? compressed : body);
+  });
+  server.keepAliveTimeout = 60000;
+  return new Promise((resolve) => server.listen(0, '127.0.0.1', () => resolve(server)));
+}
+
+async function waitForServer(url, timeoutMs = 30000) {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    try {
+      await request(url, new http.Agent());
+      return;
+    } catch {
+      await sleep(200);
+    }
+  }
+  throw new Error(`Server at ${url} did not start within ${timeoutMs}ms`);
+}
+
+function request(url, agent) {
+  return new Promise((resolve, reject) => {
+    const start = process.hrtime.bigint();
+    const req = http.get(url, { agent, headers: { 'accept-encoding': 'gzip' } }, (res) => {
+      res.on('data', () => {});
+      res.on('end', () => resolve(Number(process.hrtime.bigint() - start) / 1e6));
+      res.on('error', reject);
+    });
+    req.on('error', reject);
+  });
+}
+
+// Closed-loop load: `concurrency` workers each issue requests back to back
+async function runLoad(url, requests, concurrency) {
+  const agent = new http.Agent({ keepAlive: true, maxSockets: concurrency });
+  const latencies = [];
+  let errors = 0;
+  let remaining = requests;
+
+  const start = process.hrtime.bigint();
+  await Promise.all(Array.from({ length: concurrency }, async () => {
+    while (remaining-- > 0) {
+      try {
+        latencies.push(await request(url, agent));
+      } catch {
+        errors++;
+      }
+    }
+  }));
+  const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+  agent.destroy();
+
+  latencies.sort((a, b) => a - b);
+  const percentile = (p) => latencies[Math.min(latencies.length - 1, Math.floor(latencies.length * p))] ?? NaN;
+  return {
+    requests: latencies.length,
+    errors,
+    rps: latencies.length / (elapsedMs / 1000),
+    p50: percentile(0.5),
+    p95: percentile(0.95),
+    p99: percentile(0.99),
+  };
+}
+
+// Sample resident memory of a process (in MB) until stopped
+function sampleMemory(pid) {
+  let peak = 0;
+  let running = true;
+  const done = (async () => {
+    while (running) {
+      try {
+        const { stdout } = await promisify(execFile)('ps', ['-o', 'rss=', '-p', String(pid)]);
+        const rssKb = parseInt(stdout.trim());
+        peak = Math.max(peak, rssKb / 1024);
+      } catch {
+        // Process not running (yet)
+      }
+      await sleep(100);
+    }
+  })();
+  return async () => {
+    running = false;
+    await done;
+    return peak;
+  };
+}
+
+function format(label, result) {
+  return `${label.padEnd(8)} ${result.rps.toFixed(0).padStart(8)} req/s` +
+    `  p50 ${result.p50.toFixed(2)}ms  p95 ${result.p95.toFixed(2)}ms  p99 ${result.p99.toFixed(2)}ms` +
+    `  errors ${result.errors}`;
+}
+
+async function main() {
+  const options = parseArgs(process.argv.slice(2));
+  const stub = await startStubServer(options.bodyKb, options.gzip);
+  const stubUrl = `http://127.0.0.1:${stub.address().port}`;
+
+  const proxy = spawn(process.execPath, ['dist/server/entry.mjs'], {
+    env: {
+      ...process.env,
+      API_SERVER_URL: stubUrl,
+      HOST: '127.0.0.1',
+      PORT: String(options.proxyPort),
+      LOG_LEVEL: 'warn',
+    },
+    stdio: ['ignore', 'inherit', 'inherit'],
+  });
+  const proxyUrl = `http://127.0.0.1:${options.proxyPort}`;
+
+  try {
+    await waitForServer(`${proxyUrl}/api/dogs`);
+    const stopIdleSampling = sampleMemory(proxy.pid);
+    await sleep(300);
+    const baselineRss = await stopIdleSampling();
+    const stopSampling = sampleMemory(proxy.pid);
+
+    console.log(`${options.requests} requests, concurrency ${options.concurrency}, ` +
+      `${options.bodyKb}KB body${options.gzip ? ' (gzip)' : ''}`);
+    const direct = await runLoad(`${stubUrl}/api/dogs`, options.requests, options.concurrency);
+    console.log(format('direct', direct));
+    const proxied = await runLoad(`${proxyUrl}/api/dogs`, options.requests, options.concurrency);
+    console.log(format('proxy', proxied));
+
+    const peakRss = await stopSampling();
+    console.log(`added latency  p50 ${(proxied.p50 - direct.p50).toFixed(2)}ms` +
+      `  p95 ${(proxied.p95 - direct.p95).toFixed(2)}ms  p99 ${(proxied.p99 - direct.p99).toFixed(2)}ms`);
+    console.log(`proxy memory   idle ${baselineRss.toFixed(1)}MB  peak ${peakRss.toFixed(1)}MB`);
+  } finally {
+    proxy.kill();
+    stub.close();
+  }
+}
+
+main().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
@@ -0,0 +1,89 @@
+// Benchmark time-to-content for the dog list and dog detail pages.
+//
+// "prefetched" is the time until the server-rendered HTML containing the dog data has been
+// received. "waterfall" adds the API round-trip through the proxy that the components used to
+// issue from onMount after the page loaded. JS download and boot time are not included, so the
+// gap between the two is a lower bound on what prefetching saves.
+//
+// Usage (from the client directory, with the API server and Astro server running):
+//   node scripts/bench-ttc.mjs [--url http://localhost:4321] [--iterations 200] [--concurrency 8]
+import { setTimeout as sleep } from 'node:timers/promises';
+
+function parseArgs(argv) {
+  const options = { url: 'http://localhost:4321', iterations: 200, concurrency: 8 };
+  for (let i = 0; i < argv.length; i++) {
+    const arg = argv[i];
+    if (arg === '--url') options.url = argv[++i];
+    else if (arg === '--iterations') options.iterations = parseInt(argv[++i]);
+    else if (arg === '--concurrency') options.concurrency = parseInt(argv[++i]);
+  }
+  return options;
+}
+
+async function timed(fn) {
+  const start = performance.now();
+  const result = await fn();
+  return { ms: performance.now() - start, result };
+}
+
+async function getText(url) {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`${url} returned ${response.status}`);
+  }
+  return response.text();
+}
+
+async function measure(iterations, concurrency, scenario) {
+  const samples = [];
+  let remaining = iterations;
+  await Promise.all(Array.from({ length: concurrency }, async () => {
+    while (remaining-- > 0) {
+      samples.push((await timed(scenario)).ms);
+    }
+  }));
+  samples.sort((a, b) => a - b);
+  const percentile = (p) => samples[Math.min(samples.length - 1, Math.floor(samples.length * p))];
+  return { p50: percentile(0.5), p95: percentile(0.95), p99: percentile(0.99) };
+}
+
+function format(label, result) {
+  return `${label.padEnd(22)} p50 ${result.p50.toFixed(2)}ms  p95 ${result.p95.toFixed(2)}ms  p99 ${result.p99.toFixed(2)}ms`;
+}
+
+async function main() {
+  const { url, iterations, concurrency } = parseArgs(process.argv.slice(2));
+
+  const dogs = JSON.parse(await getText(`${url}/api/dogs`));
+  if (!dogs.length) {
+    throw new Error('No dogs returned by the API; seed the database first');
+  }
+  const dog = dogs[0];
+
+  // Make sure the page really embeds the data before timing it
+  const listHtml = await getText(`${url}/`);
+  if (!listHtml.includes(`/dog/${dog.id}`)) {
+    console.warn('Warning: the dog list page does not contain prefetched dogs');
+  }
+
+  // Warm up both paths
+  await Promise.all([getText(`${url}/`), getText(`${url}/dog/${dog.id}`)]);
+  await sleep(100);
+
+  console.log(`${iterations} iterations, concurrency ${concurrency}`);
+  console.log(format('list prefetched', await measure(iterations, concurrency, () => getText(`${url}/`))));
+  console.log(format('list waterfall', await measure(iterations, concurrency, async () => {
+    await getText(`${url}/`);
+    await getText(`${url}/api/dogs`);
+  })));
+  console.log(format('detail prefetched', await measure(iterations, concurrency, () => getText(`${url}/dog/${dog.id}`))));
+  console.log(format('detail waterfall', await measure(iterations, concurrency, async () => {
+    await getText(`${url}/dog/${dog.id}`);
+    await getText(`${url}/api/dogs/${dog.id}`);
+  })));
+}
+
+main().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
@@ -0,0 +1,79 @@
+// Server-side API client used by pages to prefetch data at render time.
+// Responses are kept in a cache shared by every request handled by this server process.
+
+// Get server URL from environment variable with fallback for local development
+const API_SERVER_URL = process.env.API_SERVER_URL || 'http://localhost:5100';
+
+// How long a cached response is served without revalidation
+const API_CACHE_TTL_MS = parseInt(process.env.API_CACHE_TTL_MS || '5000');
+// How long a stale response may still be served while it is refreshed in the background
+const API_CACHE_STALE_MS = parseInt(process.env.API_CACHE_STALE_MS || '60000');
+const API_CACHE_MAX_ENTRIES = parseInt(process.env.API_CACHE_MAX_ENTRIES || '1000');
+const API_PREFETCH_TIMEOUT_MS = parseInt(process.env.API_PREFETCH_TIMEOUT_MS || '2000');
+
+interface CacheEntry {
+  fetchedAt: number;
+  value: Promise<unknown>;
+  refreshing: boolean;
+}
+
+const cache = new Map<string, CacheEntry>();
+
+async function load(path: string): Promise<unknown> {
+  const response = await fetch(`${API_SERVER_URL}${path}`, {
+    headers: { 'Accept': 'application/json' },
+    signal: AbortSignal.timeout(API_PREFETCH_TIMEOUT_MS),
+  });
+  if (response.status === 404) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`API request ${path} failed: ${response.status} ${response.statusText}`);
+  }
+  return response.json();
+}
+
+function store(path: string): CacheEntry {
+  const entry: CacheEntry = { fetchedAt: Date.now(), value: load(path), refreshing: false };
+  // Failed loads are evicted so the next request retries
+  entry.value.catch(() => {
+    if (cache.get(path) === entry) {
+      cache.delete(path);
+    }
+  });
+
+  cache.set(path, entry);
+  if (cache.size > API_CACHE_MAX_ENTRIES) {
+    cache.delete(cache.keys().next().value as string);
+  }
+  return entry;
+}
+
+// Fetch an API path with a shared cache. Concurrent renders share one in-flight request,
+// and stale entries are served immediately while a background refresh runs.
+// Resolves to null when the data is unavailable, so the component can fall back to a client fetch.
+export async function fetchApi<T>(path: string): Promise<T | null> {
+  const now = Date.now();
+  let entry = cache.get(path);
+
+  if (!entry || now - entry.fetchedAt > API_CACHE_TTL_MS + API_CACHE_STALE_MS) {
+    entry = store(path);
+  } else if (now - entry.fetchedAt > API_CACHE_TTL_MS && !entry.refreshing) {
+    entry.refreshing = true;
+    const refreshed = load(path);
+    refreshed
+      .then(() => {
+        cache.set(path, { fetchedAt: Date.now(), value: refreshed, refreshing: false });
+      })
+      .catch(() => {
+        entry!.refreshing = false;
+      });
+  }
+
+  try {
+    return await entry.value as T | null;
+  } catch (error) {
+    console.error(`Error prefetching ${path}:`, error);
+    return null;
+  }
+}
@@ -1,47 +1,159 @@
 import { defineMiddleware } from "astro:middleware";
+import http from "node:http";
+import https from "node:https";
+import { Readable } from "node:stream";
 
 // Get server URL from environment variable with fallback for local development
 const API_SERVER_URL = process.env.API_SERVER_URL || 'http://localhost:5100';
 
+// Upstream tuning
+const API_TIMEOUT_MS = parseInt(process.env.API_TIMEOUT_MS || '10000');
+const API_RETRIES = parseInt(process.env.API_RETRIES || '1');
+const API_MAX_SOCKETS = parseInt(process.env.API_MAX_SOCKETS || '128');
+
+// Keep-alive agents shared by every request, so connections to the API server are reused
+const agentOptions = {
+  keepAlive: true,
+  maxSockets: API_MAX_SOCKETS,
+  maxFreeSockets: Math.min(API_MAX_SOCKETS, 32),
+  scheduling: 'lifo' as const,
+};
+const httpAgent = new http.Agent(agentOptions);
+const httpsAgent = new https.Agent(agentOptions);
+
+// Level-controlled logging; per-request lines are only written at debug level
+const LOG_LEVELS = { debug: 10, info: 20, warn: 30, error: 40, silent: 100 };
+type LogLevel = keyof typeof LOG_LEVELS;
+const LOG_LEVEL: LogLevel = (process.env.LOG_LEVEL as LogLevel) in LOG_LEVELS ?
+  process.env.LOG_LEVEL as LogLevel : 'info';
+
+function log(level: Exclude<LogLevel, 'silent'>, ...args: unknown[]) {
+  if (LOG_LEVELS[level] >= LOG_LEVELS[LOG_LEVEL]) {
+    console[level === 'debug' ? 'log' : level](...args);
+  }
+}
+
+// Hop-by-hop headers must not be forwarded by a proxy
+const HOP_BY_HOP_HEADERS = new Set([
+  'connection',
+  'keep-alive',
+  'proxy-authenticate',
+  'proxy-authorization',
+  'te',
+  'trailer',
+  'transfer-encoding',
+  'upgrade',
+  'host',
+]);
+
+// Only idempotent requests are safe to retry
+const RETRYABLE_METHODS = new Set(['GET', 'HEAD']);
+const RETRYABLE_ERRORS = new Set(['ECONNRESET', 'ECONNREFUSED', 'EPIPE', 'ETIMEDOUT', 'UPSTREAM_TIMEOUT']);
+
+class UpstreamTimeoutError extends Error {
+  code = 'UPSTREAM_TIMEOUT';
+}
+
+// Forward a request to the API server without decoding the response body.
+// Unlike fetch, node:http leaves Content-Encoding alone, so compressed bodies pass through unchanged.
+function forwardRequest(target: URL, request: Request, body?: Buffer): Promise<http.IncomingMessage> {
+  const headers: http.OutgoingHttpHeaders = {};
+  request.headers.forEach((value, key) => {
+    if (!HOP_BY_HOP_HEADERS.has(key)) {
+      headers[key] = value;
+    }
+  });
+  if (body) {
+    headers['content-length'] = body.length;
+  }
+
+  const isHttps = target.protocol === 'https:';
+  const client = isHttps ? https : http;
+  return new Promise((resolve, reject) => {
+    const upstream = client.request(target, {
+      method: request.method,
+      headers,
+      agent: isHttps ? httpsAgent : httpAgent,
+    }, resolve);
+
+    // Idle socket timeout: covers connecting, waiting for headers and stalled bodies
+    upstream.setTimeout(API_TIMEOUT_MS, () => {
+      upstream.destroy(new UpstreamTimeoutError(`API server did not respond within ${API_TIMEOUT_MS}ms`));
+    });
+    upstream.on('error', reject);
+    upstream.end(body);
+  });
+}
+
+// Forward with retries for idempotent requests that failed before a response arrived
+async function forwardWithRetry(target: URL, request: Request, body?: Buffer): Promise<http.IncomingMessage> {
+  const attempts = RETRYABLE_METHODS.has(request.method) ? API_RETRIES + 1 : 1;
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await forwardRequest(target, request, body);
+    } catch (error) {
+      const code = (error as NodeJS.ErrnoException).code;
+      if (attempt >= attempts || !code || !RETRYABLE_ERRORS.has(code)) {
+        throw error;
+      }
+      log('warn', `Retrying ${request.method} ${target.pathname} after ${code} (attempt ${attempt + 1}/${attempts})`);
+      await new Promise((resolve) => setTimeout(resolve, 25 * attempt));
+    }
+  }
+}
+
+// Convert upstream response headers, dropping hop-by-hop headers
+function responseHeaders(upstream: http.IncomingMessage): Headers {
+  const headers = new Headers();
+  for (const [key, value] of Object.entries(upstream.headers)) {
+    if (value === undefined || HOP_BY_HOP_HEADERS.has(key)) {
+      continue;
+    }
+    for (const item of Array.isArray(value) ? value : [value]) {
+      headers.append(key, item);
+    }
+  }
+  return headers;
+}
+
 // Middleware to handle API requests
 export const onRequest = defineMiddleware(async (context, next) => {
-  console.log('Request URL:', context.request.url);
-  
+  log('debug', 'Request URL:', context.request.url);
+
   // Guard clause: if not an API request, pass through to regular Astro handling
   if (!context.request.url.includes('/api/')) {
     return await next();
   }
-  
+
   // API request handling
-  console.log('Forwarding request to server:', API_SERVER_URL);
-  
+  log('debug', 'Forwarding request to server:', API_SERVER_URL);
+
   const url = new URL(context.request.url);
   const apiPath = url.pathname + url.search;
-  
-  // Create a new request to the backend server
-  const serverRequest = new Request(`${API_SERVER_URL}${apiPath}`, {
-    method: context.request.method,
-    headers: context.request.headers,
-    body: context.request.method !== 'GET' && context.request.method !== 'HEAD' ? 
-          await context.request.clone().arrayBuffer() : undefined,
-  });
-  
+  const body = context.request.method !== 'GET' && context.request.method !== 'HEAD' ?
+    Buffer.from(await context.request.arrayBuffer()) : undefined;
+
   try {
     // Forward the request to the API server
-    const response = await fetch(serverRequest);
-    const data = await response.arrayBuffer();
-    
-    // Return the response from the API server
-    return new Response(data, {
-      status: response.status,
-      statusText: response.statusText,
-      headers: response.headers,
+    const upstream = await forwardWithRetry(new URL(apiPath, API_SERVER_URL), context.request, body);
+    const status = upstream.statusCode ?? 502;
+    const hasBody = context.request.method !== 'HEAD' && status !== 204 && status !== 304;
+    if (!hasBody) {
+      upstream.resume();
+    }
+
+    // Stream the response body through as-is instead of buffering it
+    return new Response(hasBody ? Readable.toWeb(upstream) as ReadableStream : null, {
+      status,
+      statusText: upstream.statusMessage,
+      headers: responseHeaders(upstream),
     });
   } catch (error) {
-    console.error('Error forwarding request to API:', error);
-    return new Response(JSON.stringify({ error: 'Failed to reach API server' }), {
-      status: 502,
+    log('error', 'Error forwarding request to API:', error);
+    const timedOut = error instanceof UpstreamTimeoutError;
+    return new Response(JSON.stringify({ error: timedOut ? 'API server timed out' : 'Failed to reach API server' }), {
+      status: timedOut ? 504 : 502,
       headers: { 'Content-Type': 'application/json' }
     });
   }
-});
\ No newline at end of file
+});
@@ -0,0 +1,262 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Flask, Response, g, jsonify, request
+
+from config import Config
+
+try:
+    import redis
+except ImportError:  # redis is optional; buckets are kept in memory without it
+    redis = None
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the server is at capacity"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class MemoryBucketStore:
+    """Token buckets kept in process memory, evicting the least recently used clients"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, float]:
+        """Refill the bucket for key and take one token, returning (allowed, tokens left)"""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            tokens = min(float(burst), tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class RedisBucketStore:
+    """Token buckets shared between processes through Redis or a Redis-compatible server"""
+
+    # Refill and take in one round trip so concurrent workers cannot overspend a bucket
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        if redis is None:
+            raise RuntimeError('RATE_LIMIT_REDIS_URL requires the redis package')
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, float]:
+        """Refill the bucket for key and take one token, returning (allowed, tokens left)"""
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[rate, burst, now])
+        return bool(allowed), float(tokens)
+
+class RateLimiter:
+    """Token bucket rate limiter keyed by client"""
+
+    def __init__(self, rate: float, burst: int, store: Any = None):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.store = store if store is not None else MemoryBucketStore()
+        self._lock = threading.Lock()
+        self._allowed: int = 0
+        self._limited: int = 0
+        self._store_errors: int = 0
+
+    def check(self, key: str) -> Tuple[bool, float]:
+        """Take a token for key, returning (allowed, seconds until the next token)"""
+        try:
+            allowed, tokens = self.store.take(key, self.rate, self.burst, time.time())
+        except Exception as e:
+            # A shared store outage must not take the API down with it, so fail open
+            logging.warning(f"Rate limit store unavailable: {e}")
+            with self._lock:
+                self._store_errors += 1
+            return True, 0.0
+
+        with self._lock:
+            if allowed:
+                self._allowed += 1
+            else:
+                self._limited += 1
+        return allowed, 0.0 if allowed else (1 - tokens) / self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        """Get rate limiting counters"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'store': type(self.store).__name__,
+                'allowed': self._allowed,
+                'limited': self._limited,
+                'store_errors': self._store_errors
+            }
+
+class ConcurrencyLimiter:
+    """Caps the number of requests each route handles at once, queueing briefly before shedding"""
+
+    def __init__(self, limit: int, queue_timeout: float = 0.0):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._active: Dict[str, int] = {}
+        self._shed: Dict[str, int] = {}
+
+    def acquire(self, route: str) -> bool:
+        """Take a slot for route, waiting up to queue_timeout; False means the request should be shed"""
+        with self._lock:
+            slots = self._slots.get(route)
+            if slots is None:
+                slots = self._slots[route] = threading.BoundedSemaphore(self.limit)
+
+        if self.queue_timeout > 0:
+            acquired = slots.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._shed[route] = self._shed.get(route, 0) + 1
+            return False
+
+        with self._lock:
+            self._active[route] = self._active.get(route, 0) + 1
+        return True
+
+    def release(self, route: str):
+        """Give back a slot taken by acquire"""
+        with self._lock:
+            self._active[route] -= 1
+        self._slots[route].release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-route concurrency counters"""
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'queue_timeout': self.queue_timeout,
+                'active': dict(self._active),
+                'shed': dict(self._shed)
+            }
+
+class Admission:
+    """Admission control for Flask: per-client rate limits and per-route concurrency limits"""
+
+    def __init__(self, app: Optional[Flask] = None, config: Config = None):
+        self.rate_limiter: Optional[RateLimiter] = None
+        self.concurrency: Optional[ConcurrencyLimiter] = None
+        self.exempt: set = {'/health', '/metrics'}
+        self.trust_forwarded: bool = False
+        self.api_keys: frozenset = frozenset()
+        if app is not None:
+            self.init_app(app, config)
+
+    def init_app(self, app: Flask, config: Config = None):
+        """Register the admission hooks on the app"""
+        if config is None:
+            config = Config()
+
+        if config.RATE_LIMIT_ENABLED:
+            store = RedisBucketStore(config.RATE_LIMIT_REDIS_URL) if config.RATE_LIMIT_REDIS_URL else None
+            self.rate_limiter = RateLimiter(config.RATE_LIMIT_PER_SECOND, config.RATE_LIMIT_BURST, store)
+        if config.ROUTE_CONCURRENCY_LIMIT > 0:
+            self.concurrency = ConcurrencyLimiter(config.ROUTE_CONCURRENCY_LIMIT, config.ADMISSION_QUEUE_TIMEOUT)
+        self.trust_forwarded = config.RATE_LIMIT_TRUST_FORWARDED
+        self.api_keys = frozenset(config.RATE_LIMIT_API_KEYS)
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def client_key(self) -> str:
+        """Identify the client by API key, falling back to its address
+        
+        Only configured keys get their own bucket; otherwise a client could send a new
+        made-up key with every request and never be limited.
+        """
+        api_key = request.headers.get('X-API-Key')
+        if api_key and api_key in self.api_keys:
+            return 'key:' + api_key
+        if self.trust_forwarded and request.access_route:
+            return 'ip:' + request.access_route[0]
+        return 'ip:' + (request.remote_addr or 'unknown')
+
+    def before_request(self) -> Optional[Response]:
+        """Reject the request if its client is over its rate or its route is at capacity"""
+        if request.url_rule is None or request.path in self.exempt:
+            return None
+
+        if self.rate_limiter is not None:
+            allowed, retry_after = self.rate_limiter.check(self.client_key())
+            if not allowed:
+                return self.reject(Overloaded('Too many requests', retry_after), 429)
+
+        if self.concurrency is not None:
+            route = request.url_rule.rule
+            if not self.concurrency.acquire(route):
+                return self.reject(Overloaded('Server is busy, please retry'))
+            g.admission_route = route
+        return None
+
+    def after_request(self, response: Response) -> Response:
+        """Hold the route slot of a streamed response (events, exports) until it is closed
+
+        The request is torn down before a streamed body is sent, so releasing the slot then
+        would not limit the streams being served at all.
+        """
+        if response.is_streamed:
+            route = g.pop('admission_route', None)
+            if route is not None:
+                response.call_on_close(lambda: self.concurrency.release(route))
+        return response
+
+    def teardown_request(self, error: Optional[BaseException] = None):
+        """Release the route slot taken in before_request, unless a streamed response holds it"""
+        route = g.pop('admission_route', None)
+        if route is not None:
+            self.concurrency.release(route)
+
+    @staticmethod
+    def reject(error: Exception, status: int = 503) -> Response:
+        """Build a 429/503 response telling the client when to retry"""
+        response = jsonify({"error": str(error)})
+        response.status_code = status
+        retry_after = getattr(error, 'retry_after', 1.0)
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Get admission control counters"""
+        return {
+            'rate_limit': self.rate_limiter.stats() if self.rate_limiter else None,
+            'concurrency': self.concurrency.stats() if self.concurrency else None
+        }
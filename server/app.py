@@ -1,12 +1,26 @@
 import os
 import logging
-from typing import Dict, List, Any, Optional
-from flask import Flask, jsonify, Response
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from flask import Flask, g, jsonify, request, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-from models import init_db, Dog, Breed
+from models import db, init_db, Dog, Breed
+from database import DatabaseBusyError
+from models.dog import SORT_FIELDS, AdoptionStatus, recommender, snapshot, status_history, write_behind
+from models.status_events import INTERVALS, day_start
+from models.payloads import EncodedPayload, collection_versions, encode_json, payload_cache
+from models.repository import configure_repository
 from config import Config, config
+from admission import Admission, Overloaded
+from coalescing import RequestCoalescer
+from compression import Compression
+from change_events import ChangeEvent, ChangeStreamBroadcaster
+from dog_export import FORMATS
+from dog_sync import SyncToken, changes_since
+from tenancy import SHELTER_HEADER, clear_shelter, current_shelter, is_home_shelter, start_shelter, use_shelter
 
 # Load environment variables
 load_dotenv()
@@ -26,54 +40,432 @@ CORS(app)
 env = os.getenv('FLASK_ENV', 'development')
 app_config = config.get(env, config['default'])
 
-# Initialize the database
-init_db(app_config)
+@app.before_request
+def _start_deadline():
+    """Give the request a deadline; every query it runs gets maxTimeMS from what is left of it"""
+    g.deadline_token = db.start_deadline(app_config.REQUEST_TIMEOUT_SECONDS)
+
+@app.teardown_request
+def _clear_deadline(error: Optional[BaseException] = None):
+    """Drop the request deadline so it does not leak into the next request on this thread"""
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        db.clear_deadline(token)
+
+@app.before_request
+def _start_shelter():
+    """Scope the request's dog queries to the shelter it names, or to SHELTER_ID"""
+    shelter_id = request.args.get('shelter_id') or request.headers.get(SHELTER_HEADER) or app_config.SHELTER_ID
+    try:
+        g.shelter_token = start_shelter(shelter_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.teardown_request
+def _clear_shelter(error: Optional[BaseException] = None):
+    """Drop the request shelter so it does not leak into the next request on this thread"""
+    token = g.pop('shelter_token', None)
+    if token is not None:
+        clear_shelter(token)
+
+# Shed load from greedy clients and overloaded routes before it reaches MongoDB
+admission = Admission(app, app_config)
+
+# Compress JSON responses that were not pre-encoded
+compression = Compression(app, app_config)
+
+# Initialize the database; edge nodes read from an embedded SQLite copy and never connect to MongoDB
+repository = configure_repository(app_config)
+if repository.name == 'mongodb':
+    init_db(app_config)
+
+# Share one in-flight query between concurrent identical requests
+coalescer = RequestCoalescer(enabled=app_config.COALESCE_REQUESTS)
+
+# Size the pre-encoded payload cache kept by the models
+payload_cache.max_entries = app_config.PAYLOAD_CACHE_SIZE
+payload_cache.max_age = app_config.PAYLOAD_CACHE_MAX_AGE
+
+def _breed_name(breed_id: Any) -> Optional[str]:
+    """Resolve a breed name for change events"""
+    breed = Breed.find_by_id(str(breed_id))
+    return breed.name if breed else None
+
+# One change stream per process, shared by every Server-Sent Events client
+dog_events = ChangeStreamBroadcaster(
+    lambda: db.get_collection(app_config.DOGS_COLLECTION),
+    resolve_breed=_breed_name,
+    history_size=app_config.CHANGE_EVENT_HISTORY,
+    queue_size=app_config.SSE_QUEUE_SIZE,
+    enabled=app_config.CHANGE_STREAM_ENABLED
+)
+
+# Writes from any process invalidate this process's pre-encoded dog payloads
+dog_events.add_listener(lambda event: collection_versions.bump(app_config.DOGS_COLLECTION))
+if app_config.CHANGE_STREAM_ENABLED:
+    dog_events.start()
+
+# Answer dog list filters and stats from an in-memory columnar copy, refreshed with deltas.
+# Workers map the snapshot file (if any) instead of all loading the full collection at boot.
+if app_config.SNAPSHOT_ENABLED:
+    dog_events.add_listener(lambda event: snapshot.mark_stale())
+    snapshot_metadata = snapshot.start(app_config.SNAPSHOT_REFRESH_SECONDS, path=app_config.SNAPSHOT_FILE or None)
+    if snapshot_metadata and snapshot_metadata.get('breeds') is not None:
+        Breed.list_payload(snapshot_metadata['breeds'])
+
+# Score dogs for adopters from a feature matrix kept up to date with deltas
+if app_config.RECOMMENDATIONS_ENABLED:
+    dog_events.add_listener(lambda event: recommender.mark_stale())
+    recommender.start(app_config.RECOMMENDATIONS_REFRESH_SECONDS)
+
+def _coalesce(producer: Callable[[], Any]) -> Any:
+    """Run producer once for all concurrent identical requests, holding one query slot"""
+    def run() -> Any:
+        with db.query_slot():
+            return producer()
+    
+    # Requests for different shelters never share a result, even when the shelter came in a header
+    key = RequestCoalescer.make_key(f'{current_shelter()}:{request.path}', request.args)
+    result, _ = coalescer.do(key, run)
+    return result
+
+def _requires_mongodb(view: Callable[..., Any]) -> Callable[..., Any]:
+    """Refuse a route that reads MongoDB directly on edge nodes, which only hold the SQLite copy"""
+    @wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if repository.name != 'mongodb':
+            return jsonify({"error": f"{request.path} is not served by edge nodes; use the main API"}), 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def _coalesced_json(producer: Callable[[], Tuple[bytes, int]]) -> Response:
+    """Run producer once for all concurrent identical requests and return its JSON"""
+    body, status = _coalesce(producer)
+    return Response(body, status=status, mimetype='application/json')
+
+def _payload_response(payload: EncodedPayload) -> Response:
+    """Serve a pre-encoded payload in the best encoding the client accepts"""
+    accepted = [encoding for encoding, quality in request.accept_encodings if quality > 0]
+    body, encoding = payload.select(accepted)
+    
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(payload.etag, weak=True)
+    return response.make_conditional(request)
+
+def _dog_filters() -> Dict[str, Any]:
+    """Parse the dog list filters from the query string, raising ValueError if one is invalid"""
+    filters: Dict[str, Any] = {}
+    
+    status = request.args.get('status')
+    if status:
+        matches = [s for s in AdoptionStatus if status in (s.value, s.name)]
+        if not matches:
+            raise ValueError(f"Unknown status '{status}'")
+        filters['status'] = matches[0]
+    
+    if request.args.get('breed_id'):
+        filters['breed_id'] = request.args['breed_id']
+    
+    for name in ('min_age', 'max_age'):
+        if request.args.get(name):
+            try:
+                filters[name] = int(request.args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+    
+    return filters
 
 @app.route('/api/dogs', methods=['GET'])
-def get_dogs() -> Response:
-    """Get all dogs with breed information"""
+def get_dogs() -> tuple[Response, int] | Response:
+    """Get all dogs with breed information, optionally filtered and sorted"""
     try:
-        # Use aggregation to get dogs with breed names
-        dogs_data = Dog.find_with_breed_info()
+        filters = _dog_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    sort = request.args.get('sort', 'name')
+    if sort.lstrip('-') not in SORT_FIELDS:
+        return jsonify({"error": f"Cannot sort dogs by '{sort}'", "sort_fields": list(SORT_FIELDS)}), 400
+    
+    def build() -> Tuple[bytes, int]:
+        # Use aggregation (or the in-memory snapshot) to get dogs with breed names
+        dogs_data = Dog.find_with_breed_info(sort=sort, **filters)
         
         # Convert the result to a list of dictionaries with proper formatting
-        dogs_list: List[Dict[str, Any]] = []
-        for dog_data in dogs_data:
-            dogs_list.append({
-                'id': str(dog_data['_id']),
-                'name': dog_data['name'],
-                'breed': dog_data.get('breed', 'Unknown')
-            })
+        dogs_list: List[Dict[str, Any]] = [Dog.list_item(dog_data) for dog_data in dogs_data]
         
-        return jsonify(dogs_list)
+        return encode_json(dogs_list), 200
+    
+    try:
+        return _coalesced_json(build)
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
     
     except Exception as e:
         logging.error(f"Error retrieving dogs: {e}")
         return jsonify({"error": "Failed to retrieve dogs"}), 500
 
+@app.route('/api/dogs/stats', methods=['GET'])
+def get_dog_stats() -> tuple[Response, int] | Response:
+    """Count dogs by status and breed and summarize ages, with the same filters as the dog list"""
+    try:
+        filters = _dog_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        return _coalesced_json(lambda: (encode_json(Dog.stats(**filters)), 200))
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
+    
+    except Exception as e:
+        logging.error(f"Error retrieving dog stats: {e}")
+        return jsonify({"error": "Failed to retrieve dog stats"}), 500
+
+@app.route('/api/dogs/nearby', methods=['GET'])
+@_requires_mongodb
+def get_dogs_nearby() -> tuple[Response, int] | Response:
+    """Find dogs within a radius of a point, nearest first, across every shelter"""
+    try:
+        filters = _dog_filters()
+        if request.args.get('lat') is None or request.args.get('lng') is None:
+            raise ValueError("lat and lng are required")
+        longitude, latitude = Dog.point(request.args['lat'], request.args['lng'])['coordinates']
+        radius = request.args.get('radius', app_config.NEARBY_DEFAULT_RADIUS_KM, type=float)
+        if radius is None or not 0 < radius <= app_config.NEARBY_MAX_RADIUS_KM:
+            raise ValueError(f"radius must be a number of kilometers between 0 and {app_config.NEARBY_MAX_RADIUS_KM:g}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = request.args.get('per_page', 20, type=int)
+    per_page = max(1, min(per_page, app_config.NEARBY_MAX_PAGE_SIZE))
+    filters.setdefault('status', AdoptionStatus.AVAILABLE)
+    
+    def build() -> Tuple[bytes, int]:
+        return encode_json(Dog.find_nearby(latitude, longitude, radius, page=page, per_page=per_page, **filters)), 200
+    
+    try:
+        return _coalesced_json(build)
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
+    
+    except Exception as e:
+        logging.error(f"Error finding nearby dogs: {e}")
+        return jsonify({"error": "Failed to find nearby dogs"}), 500
+
+def _parse_day(name: str, default: datetime) -> datetime:
+    """Parse an ISO 8601 date or timestamp query parameter as the start of its UTC day"""
+    value = request.args.get(name)
+    if not value:
+        return day_start(default)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return day_start(parsed)
+
+@app.route('/api/stats/timeline', methods=['GET'])
+@_requires_mongodb
+def get_status_timeline() -> tuple[Response, int] | Response:
+    """Count intakes, status changes and days to adoption per day, week or month from the status rollups"""
+    interval = request.args.get('interval', 'week')
+    if interval not in INTERVALS:
+        return jsonify({"error": f"Unknown interval '{interval}'", "intervals": list(INTERVALS)}), 400
+    
+    try:
+        # Both ends are whole days; the last one is included
+        end = _parse_day('to', datetime.utcnow()) + timedelta(days=1)
+        start = _parse_day('from', end - timedelta(weeks=12))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start >= end:
+        return jsonify({"error": "from must not be after to"}), 400
+    if (end - start).days > app_config.TIMELINE_MAX_DAYS:
+        return jsonify({"error": f"The timeline covers at most {app_config.TIMELINE_MAX_DAYS} days"}), 400
+    
+    breed_id = request.args.get('breed_id') or None
+    
+    try:
+        return _coalesced_json(lambda: (encode_json(status_history.timeline(start, end, interval, breed_id)), 200))
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
+    
+    except Exception as e:
+        logging.error(f"Error retrieving the status timeline: {e}")
+        return jsonify({"error": "Failed to retrieve the status timeline"}), 500
+
+@app.route('/api/dogs/events', methods=['GET'])
+@_requires_mongodb
+def get_dog_events() -> tuple[Response, int] | Response:
+    """Stream dog inserts, status changes and deletes as Server-Sent Events"""
+    if not dog_events.enabled:
+        return jsonify({"error": "Dog events are not enabled"}), 503
+    if dog_events.unsupported:
+        return jsonify({"error": "Dog events require a MongoDB replica set"}), 503
+    
+    subscription = dog_events.subscribe(request.headers.get('Last-Event-ID'), shelter_id=current_shelter())
+    heartbeat = app_config.SSE_HEARTBEAT_SECONDS
+    
+    def stream():
+        try:
+            # Reconnect quickly; Last-Event-ID lets us replay what was missed
+            yield 'retry: 1000\n\n'
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield event.encode()
+                if event is subscription.RESET:
+                    # The client has to re-sync, so end the stream and let it reconnect
+                    return
+        finally:
+            dog_events.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/dogs/export', methods=['GET'])
+@_requires_mongodb
+def export_dogs() -> tuple[Response, int] | Response:
+    """Stream every dog field as CSV, Arrow IPC or Parquet, optionally only dogs updated since a timestamp"""
+    format_name = request.args.get('format', 'csv')
+    export_format = FORMATS.get(format_name)
+    if export_format is None:
+        return jsonify({"error": f"Unsupported format '{format_name}'", "formats": sorted(FORMATS)}), 400
+    if not export_format.available:
+        return jsonify({"error": f"The {format_name} format requires pyarrow"}), 501
+    
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 timestamp"}), 400
+    
+    batch_size = request.args.get('batch_size', app_config.EXPORT_BATCH_SIZE, type=int)
+    batch_size = max(1, min(batch_size, app_config.EXPORT_MAX_BATCH_SIZE))
+    
+    try:
+        # Pin the upper bound so the export is consistent and the next one can start from it
+        with db.query_slot():
+            watermark = Dog.latest_update() or since
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
+    
+    except Exception as e:
+        logging.error(f"Error starting dog export: {e}")
+        return jsonify({"error": "Failed to export dogs"}), 500
+    
+    # The stream runs after the request context is gone, so it re-enters the shelter itself
+    shelter_id = current_shelter()
+    
+    def stream():
+        try:
+            with use_shelter(shelter_id):
+                yield from export_format.writer(Dog.find_for_export(since, watermark, batch_size))
+        except Exception as e:
+            # Headers are already sent, so all we can do is log and cut the stream short
+            logging.error(f"Error streaming dog export: {e}")
+            raise
+    
+    headers = {'Content-Disposition': f'attachment; filename=dogs.{export_format.extension}'}
+    if watermark is not None:
+        headers['X-Export-Watermark'] = watermark.isoformat()
+    return Response(stream(), mimetype=export_format.mimetype, headers=headers)
+
+@app.route('/api/recommendations', methods=['GET'])
+@_requires_mongodb
+def get_recommendations() -> tuple[Response, int] | Response:
+    """Rank dogs by how well they fit an adopter's age, gender, breed and keyword preferences"""
+    if not recommender.enabled:
+        return jsonify({"error": "Recommendations are not enabled"}), 503
+    if not is_home_shelter():
+        return jsonify({"error": f"Recommendations are only served for shelter '{app_config.SHELTER_ID}' here"}), 503
+    if not recommender.ready:
+        return Admission.reject(Overloaded("Recommendations are still loading"))
+    
+    try:
+        filters = _dog_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    gender = request.args.get('gender')
+    if gender and gender not in ('Male', 'Female', 'Unknown'):
+        return jsonify({"error": "gender must be 'Male', 'Female', or 'Unknown'"}), 400
+    
+    # Lists may be repeated (?breed_id=a&breed_id=b) or comma-separated
+    breed_ids = [value for arg in request.args.getlist('breed_id') for value in arg.split(',') if value]
+    keywords = [value for arg in request.args.getlist('keywords') for value in arg.split(',') if value.strip()]
+    
+    limit = request.args.get('limit', 10, type=int)
+    limit = max(1, min(limit, app_config.RECOMMENDATIONS_MAX_LIMIT))
+    
+    status = filters.get('status', AdoptionStatus.AVAILABLE)
+    try:
+        return jsonify(recommender.recommend(
+            status=status.value,
+            min_age=filters.get('min_age'),
+            max_age=filters.get('max_age'),
+            gender=gender,
+            breed_ids=breed_ids,
+            keywords=keywords,
+            limit=limit
+        ))
+    
+    except Exception as e:
+        logging.error(f"Error scoring dog recommendations: {e}")
+        return jsonify({"error": "Failed to retrieve recommendations"}), 500
+
+@app.route('/api/dogs/changes', methods=['GET'])
+@_requires_mongodb
+def get_dog_changes() -> tuple[Response, int] | Response:
+    """Get dogs changed and deleted since a sync token, for clients that sync deltas"""
+    try:
+        token = SyncToken.decode(request.args['since']) if request.args.get('since') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    limit = request.args.get('limit', app_config.SYNC_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, app_config.SYNC_PAGE_SIZE))
+    
+    try:
+        with db.query_slot():
+            changes = changes_since(token, limit, timedelta(days=app_config.TOMBSTONE_TTL_DAYS))
+        return jsonify(changes)
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
+    
+    except Exception as e:
+        logging.error(f"Error retrieving dog changes: {e}")
+        return jsonify({"error": "Failed to retrieve dog changes"}), 500
+
 @app.route('/api/dogs/<dog_id>', methods=['GET'])
 def get_dog(dog_id: str) -> tuple[Response, int] | Response:
     """Get a specific dog by ID with breed information"""
     try:
-        # Find dog by ID with breed information
-        dog_data = Dog.find_by_id_with_breed_info(dog_id)
+        # Hot records are served from pre-encoded bytes
+        payload = _coalesce(lambda: Dog.detail_payload(dog_id))
         
         # Return 404 if dog not found
-        if not dog_data:
+        if payload is None:
             return jsonify({"error": "Dog not found"}), 404
         
-        # Convert the result to a properly formatted dictionary
-        dog: Dict[str, Any] = {
-            'id': str(dog_data['_id']),
-            'name': dog_data['name'],
-            'breed': dog_data.get('breed', 'Unknown'),
-            'age': dog_data.get('age'),
-            'description': dog_data.get('description'),
-            'gender': dog_data.get('gender'),
-            'status': dog_data.get('status', 'AVAILABLE')
-        }
-        
-        return jsonify(dog)
+        return _payload_response(payload)
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
     
     except Exception as e:
         logging.error(f"Error retrieving dog {dog_id}: {e}")
@@ -83,17 +475,10 @@ def get_dog(dog_id: str) -> tuple[Response, int] | Response:
 def get_breeds() -> Response:
     """Get all breeds"""
     try:
-        breeds = Breed.find_all()
-        
-        breeds_list: List[Dict[str, Any]] = []
-        for breed in breeds:
-            breeds_list.append({
-                'id': breed.id,
-                'name': breed.name,
-                'description': breed.description
-            })
-        
-        return jsonify(breeds_list)
+        return _payload_response(_coalesce(Breed.list_payload))
+    
+    except DatabaseBusyError as e:
+        return Admission.reject(e)
     
     except Exception as e:
         logging.error(f"Error retrieving breeds: {e}")
@@ -110,6 +495,8 @@ def health_check() -> Response:
         return jsonify({
             "status": "healthy",
             "database": "connected",
+            "backend": repository.name,
+            "shelter_id": current_shelter(),
             "breeds_count": breeds_count,
             "dogs_count": dogs_count
         })
@@ -122,5 +509,22 @@ def health_check() -> Response:
             "error": str(e)
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    """Expose in-process performance counters"""
+    return jsonify({
+        "coalescing": coalescer.stats(),
+        "payload_cache": payload_cache.stats(),
+        "dog_events": dog_events.stats(),
+        "dog_snapshot": snapshot.info(),
+        "recommendations": recommender.info(),
+        "write_behind": write_behind.stats(),
+        "status_history": status_history.stats(),
+        "admission": admission.stats(),
+        "database_queries": db.query_stats(),
+        "circuit_breaker": db.breaker.stats(),
+        "query_plans": db.plan_sampler.stats()
+    })
+
 if __name__ == '__main__':
     app.run(debug=app_config.DEBUG, port=app_config.PORT)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Benchmark dog list filters, sorts and stats on the in-memory snapshot.
+
+Builds a snapshot of synthetic dogs (1M by default) and times the list query and the stats
+query. With --mongodb-uri the same dogs are loaded into a scratch database and the MongoDB
+aggregation path is timed as well.
+
+Usage (from the server directory):
+    python benchmarks/bench_dog_snapshot.py [--dogs 1000000] [--iterations 20] [--mongodb-uri URI]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from models.dog import AdoptionStatus
+from models.snapshot import DogSnapshot
+
+BREEDS = ['Labrador Retriever', 'German Shepherd', 'Golden Retriever', 'Beagle', 'Bulldog', 'Poodle', 'Boxer']
+NAMES = ['Buddy', 'Max', 'Bella', 'Luna', 'Charlie', 'Daisy', 'Rocky', 'Molly', 'Cooper', 'Sadie']
+
+# The query the benchmark times: available dogs aged 2-8, oldest first
+QUERY = {'status': AdoptionStatus.AVAILABLE, 'min_age': 2, 'max_age': 8}
+SORT = '-age'
+
+def synthetic_dogs(count: int, breed_ids: list) -> list:
+    """Generate dogs in the shape returned by the sync API"""
+    rng = random.Random(42)
+    intake = datetime(2024, 1, 1)
+    statuses = [status.value for status in AdoptionStatus]
+    dogs = []
+    for i in range(count):
+        breed = rng.randrange(len(BREEDS))
+        dogs.append({
+            'id': str(ObjectId()),
+            'name': f'{rng.choice(NAMES)} {i}',
+            'breed_id': breed_ids[breed],
+            'breed': BREEDS[breed],
+            'age': rng.randint(0, 15),
+            'gender': rng.choice(['Male', 'Female']),
+            'description': 'A friendly dog looking for a home',
+            'status': rng.choice(statuses),
+            'intake_date': (intake + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+            'adoption_date': None
+        })
+    return dogs
+
+def timed(fn, iterations: int) -> dict:
+    """Run fn repeatedly and summarize the wall time in milliseconds"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    }
+
+def report(label: str, result: dict):
+    print(f"{label:<28} p50 {result['p50']:9.2f}ms  p95 {result['p95']:9.2f}ms")
+
+def bench_mongodb(uri: str, dogs: list, breed_ids: list, iterations: int):
+    """Time the aggregation path against a scratch database"""
+    from config import Config
+    from models import Dog, db
+
+    class BenchConfig(Config):
+        MONGODB_URI = uri
+        DATABASE_NAME = 'dogshelter_bench'
+
+    db.init_app(BenchConfig)
+    database = db.get_database()
+    database[Config.DOGS_COLLECTION].delete_many({})
+    database[Config.BREEDS_COLLECTION].delete_many({})
+    database[Config.BREEDS_COLLECTION].insert_many(
+        [{'_id': ObjectId(breed_id), 'name': name} for breed_id, name in zip(breed_ids, BREEDS)]
+    )
+    for start in range(0, len(dogs), 10000):
+        database[Config.DOGS_COLLECTION].insert_many([
+            {**{key: value for key, value in dog.items() if key not in ('id', 'breed')}, '_id': ObjectId(dog['id'])}
+            for dog in dogs[start:start + 10000]
+        ])
+
+    try:
+        report('mongodb list', timed(lambda: Dog.find_with_breed_info(sort=SORT, **QUERY), iterations))
+        report('mongodb stats', timed(lambda: Dog.stats(**QUERY), iterations))
+    finally:
+        db._client.drop_database(database.name)
+        db.close_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dogs', type=int, default=1000000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--mongodb-uri', help='also time the MongoDB aggregation path')
+    args = parser.parse_args()
+
+    breed_ids = [str(ObjectId()) for _ in BREEDS]
+    dogs = synthetic_dogs(args.dogs, breed_ids)
+
+    snapshot = DogSnapshot([status.value for status in AdoptionStatus])
+    started = time.perf_counter()
+    snapshot._columns = snapshot._apply(None, dogs, set())
+    print(f"{args.dogs} dogs, snapshot built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # A small delta, as applied by each periodic refresh
+    delta = [dict(dog, age=(dog['age'] + 1) % 16) for dog in dogs[:1000]]
+    report('snapshot apply 1000 changes', timed(lambda: snapshot._apply(snapshot._columns, delta, set()), 3))
+
+    report('snapshot list', timed(lambda: snapshot.query(sort=SORT, **QUERY), args.iterations))
+    report('snapshot stats', timed(lambda: snapshot.stats(**QUERY), args.iterations))
+
+    if args.mongodb_uri:
+        bench_mongodb(args.mongodb_uri, dogs, breed_ids, args.iterations)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Benchmark the per-document costs of the model layer and compare them to a baseline.
+
+Times Dog construction (stored documents, defaults, and enum names that take the fallback
+path), from_dict, to_dict and the dict building of the dog list and detail responses at
+1, 1k and 100k documents. Each case is timed in --repeat samples of at least --min-time
+seconds and reports the median documents per second, and the peak and retained bytes
+allocated per document under tracemalloc.
+
+Results are written as JSON and compared to benchmarks/baselines/models.json: a case fails
+if it is more than --speed-threshold slower or allocates more than --threshold more per
+document. Throughput is compared relative to a fixed pure-Python calibration loop timed
+around each sample, which absorbs changes in machine load during the run. It does not make
+timings portable between machines, so refresh the baseline with --update-baseline on the
+machine that runs the comparison. Cases below GATED_MIN_SIZE documents are reported but not
+compared.
+
+Usage (from the server directory):
+    python benchmarks/bench_models.py [--sizes 1,1000,100000] [--output FILE] [--threshold 0.25] [--speed-threshold 0.35]
+    python benchmarks/bench_models.py --update-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from models.dog import AdoptionStatus, Dog
+from models.payloads import encode_json
+from bench_dog_snapshot import BREEDS, NAMES
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'baselines', 'models.json')
+RESULTS_PATH = os.path.join(BENCHMARKS_DIR, 'results', 'models.json')
+
+# Metrics compared to the baseline, and whether higher values are better
+METRICS = {'relative_speed': True, 'peak_bytes_per_doc': False}
+# Smaller cases take microseconds per call, where timer and allocator noise exceeds any threshold
+GATED_MIN_SIZE = 1000
+
+def calibration():
+    """A fixed workload of dict building and string formatting, to scale throughput by the machine"""
+    return [{'id': str(i), 'name': f'Dog {i}', 'age': i % 16} for i in range(1000)]
+
+def stored_dogs(count: int) -> list:
+    """Generate dog documents as stored in MongoDB"""
+    intake = datetime(2024, 1, 1)
+    statuses = [status.value for status in AdoptionStatus]
+    return [{
+        '_id': ObjectId(),
+        'shelter_id': 'main',
+        'name': f'{NAMES[i % len(NAMES)]} {i}',
+        'breed_id': str(ObjectId()),
+        'age': i % 16,
+        'gender': 'Female' if i % 2 else 'Male',
+        'description': 'A friendly dog looking for a home',
+        'status': statuses[i % len(statuses)],
+        'intake_date': intake + timedelta(minutes=i),
+        'adoption_date': None,
+        'created_at': intake,
+        'updated_at': intake
+    } for i in range(count)]
+
+def with_breed(docs: list) -> list:
+    """Add breed names, as the dog list aggregation does"""
+    return [dict(doc, breed=BREEDS[i % len(BREEDS)]) for i, doc in enumerate(docs)]
+
+def dog_init(docs: list):
+    """Construct dogs from stored documents"""
+    return lambda: [Dog(**doc) for doc in docs]
+
+def dog_init_defaults(docs: list):
+    """Construct new dogs, with default status and timestamps"""
+    return lambda: [Dog(name=doc['name']) for doc in docs]
+
+def dog_init_enum_name(docs: list):
+    """Construct dogs whose status is stored as the enum name, which takes the fallback path"""
+    named = [dict(doc, status=AdoptionStatus(doc['status']).name) for doc in docs]
+    return lambda: [Dog(**doc) for doc in named]
+
+def dog_from_dict(docs: list):
+    """Load dogs as the finders do, including the dirty-tracking snapshot"""
+    return lambda: [Dog.from_dict(doc) for doc in docs]
+
+def dog_to_dict(docs: list):
+    """Serialize loaded dogs"""
+    dogs = [Dog(**doc) for doc in docs]
+    return lambda: [dog.to_dict() for dog in dogs]
+
+def dog_list_response(docs: list):
+    """Build and encode the dog list body, as GET /api/dogs does"""
+    rows = with_breed(docs)
+    return lambda: encode_json([Dog.list_item(row) for row in rows])
+
+def dog_detail_response(docs: list):
+    """Build and encode one detail body per dog, as GET /api/dogs/<id> does"""
+    rows = with_breed(docs)
+    return lambda: [encode_json(Dog.detail_item(row)) for row in rows]
+
+# Each case prepares its input documents and returns the operation to time
+CASES = {case.__name__: case for case in (
+    dog_init, dog_init_defaults, dog_init_enum_name, dog_from_dict, dog_to_dict,
+    dog_list_response, dog_detail_response
+)}
+
+def calls_per_sample(timer: timeit.Timer, min_time: float) -> int:
+    """How many calls make one sample last at least min_time seconds"""
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+def measure(operation, count: int, repeat: int, min_time: float = 0.2) -> dict:
+    """Time an operation over count documents and trace its allocations"""
+    reference_timer, timer = timeit.Timer(calibration), timeit.Timer(operation)
+    reference_number = calls_per_sample(reference_timer, min_time / 4)
+    number = calls_per_sample(timer, min_time)
+
+    # Each sample is bracketed by calibration runs, so both see the same load, and the
+    # medians ignore samples disturbed by a burst of load
+    seconds, ratios = [], []
+    before = reference_timer.timeit(reference_number) / reference_number
+    for _ in range(repeat):
+        elapsed = timer.timeit(number) / number
+        after = reference_timer.timeit(reference_number) / reference_number
+        seconds.append(elapsed)
+        ratios.append((before + after) / 2 / elapsed)
+        before = after
+    median = statistics.median(seconds)
+
+    # Allocations are traced in a separate run, since tracing slows everything down
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    result = operation()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {
+        'docs_per_sec': round(count / median, 1),
+        'ns_per_doc': round(median / count * 1e9, 1),
+        # Documents processed in the time of one calibration loop
+        'relative_speed': round(count * statistics.median(ratios), 4),
+        'peak_bytes_per_doc': round((peak - base) / count, 1),
+        'retained_bytes_per_doc': round((current - base) / count, 1)
+    }
+
+def run(sizes: list, cases: list, repeat: int, min_time: float) -> dict:
+    """Run the cases at every size"""
+    results = {}
+    for size in sizes:
+        docs = stored_dogs(size)
+        for name in cases:
+            results.setdefault(name, {})[str(size)] = measure(CASES[name](docs), size, repeat, min_time)
+            metrics = results[name][str(size)]
+            print(f"{name:<22} {size:>7} docs  {metrics['docs_per_sec']:>12,.0f} docs/s ({metrics['relative_speed']:>9,.2f})  "
+                  f"{metrics['peak_bytes_per_doc']:>9,.0f} B/doc peak  "
+                  f"{metrics['retained_bytes_per_doc']:>9,.0f} B/doc retained")
+    return {
+        'created': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+def compare(results: dict, baseline: dict, threshold: float, speed_threshold: float = None) -> list:
+    """List the metrics that regressed by more than threshold (speed_threshold for throughput) against the baseline"""
+    if speed_threshold is None:
+        speed_threshold = threshold
+    regressions = []
+    for name, sizes in results['results'].items():
+        for size, metrics in sizes.items():
+            expected = baseline['results'].get(name, {}).get(size)
+            if expected is None or int(size) < GATED_MIN_SIZE:
+                continue
+            for metric, higher_is_better in METRICS.items():
+                if not expected.get(metric):
+                    continue
+                change = metrics[metric] / expected[metric] - 1
+                limit = speed_threshold if metric == 'relative_speed' else threshold
+                if (-change if higher_is_better else change) > limit:
+                    regressions.append(f"{name} at {size} docs: {metric} {metrics[metric]:,.2f} "
+                                       f"against {expected[metric]:,.2f} in the baseline ({change:+.0%})")
+    return regressions
+
+def write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,1000,100000', help='comma-separated document counts')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated cases to run')
+    parser.add_argument('--repeat', type=int, default=7, help='timed samples per case; the median counts')
+    parser.add_argument('--min-time', type=float, default=0.2, help='shortest sample, in seconds')
+    parser.add_argument('--output', default=RESULTS_PATH, help='where to write the results')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='largest accepted allocation increase (0.25 = 25%%)')
+    # Unchanged code varies by up to about 20% between runs on a shared machine
+    parser.add_argument('--speed-threshold', type=float, default=0.35, help='largest accepted slowdown (0.35 = 35%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    cases = [name for name in args.cases.split(',') if name]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results = run([int(size) for size in args.sizes.split(',')], cases, args.repeat, args.min_time)
+    write_json(args.output, results)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"Baseline updated: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold, args.speed_threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.speed_threshold:.0%} in speed or {args.threshold:.0%} in allocations "
+          f"against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
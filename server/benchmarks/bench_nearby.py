@@ -0,0 +1,120 @@
+"""Benchmark the nearby dog search.
+
+Places synthetic dogs (1M by default) at shelters spread over the continental US, with some in
+foster homes around them, and times what a client does today to find available dogs near a
+point: scan every dog and compute its distance. With --mongodb-uri the dogs are loaded into a
+scratch database and Dog.find_nearby ($geoNear on the 2dsphere index) is timed for the first
+and a later page at a city and a regional radius.
+
+Usage (from the server directory):
+    python benchmarks/bench_nearby.py [--dogs 1000000] [--shelters 2000] [--iterations 20] [--mongodb-uri URI]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from models.dog import AdoptionStatus
+from bench_dog_snapshot import NAMES, report, timed
+
+# Where the searches are made from: (name, latitude, longitude)
+CITIES = [('Seattle', 47.61, -122.33), ('Chicago', 41.88, -87.63), ('Austin', 30.27, -97.74)]
+# Searches timed at each city: (radius in km, page)
+SEARCHES = [(25, 1), (25, 5), (150, 1)]
+PER_PAGE = 20
+EARTH_RADIUS_KM = 6371.0
+
+def synthetic_dogs(count: int, shelter_count: int) -> list:
+    """Generate dogs stored at their shelter's coordinates, a fifth of them fostered nearby"""
+    rng = random.Random(3)
+    shelters = [(rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)) for _ in range(shelter_count)]
+    # Shelters in and around the benchmark cities, so their searches find dogs
+    shelters += [(lat + rng.uniform(-0.3, 0.3), lng + rng.uniform(-0.3, 0.3)) for _, lat, lng in CITIES for _ in range(10)]
+    statuses = [status.value for status in AdoptionStatus]
+    dogs = []
+    for i in range(count):
+        shelter = rng.randrange(len(shelters))
+        lat, lng = shelters[shelter]
+        if rng.random() < 0.2:
+            lat, lng = lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)
+        dogs.append({
+            '_id': ObjectId(),
+            'shelter_id': f'shelter-{shelter}',
+            'name': f'{rng.choice(NAMES)} {i}',
+            'age': rng.randint(0, 15),
+            'status': rng.choice(statuses),
+            'location': {'type': 'Point', 'coordinates': [round(lng, 5), round(lat, 5)]}
+        })
+    return dogs
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points"""
+    dlat, dlng = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def client_side_search(dogs: list, lat: float, lng: float, radius_km: float, page: int) -> list:
+    """Filter and sort every dog by distance, as a client holding the full dog list must"""
+    found = []
+    for dog in dogs:
+        if dog['status'] != 'Available':
+            continue
+        dog_lng, dog_lat = dog['location']['coordinates']
+        distance = haversine_km(lat, lng, dog_lat, dog_lng)
+        if distance <= radius_km:
+            found.append((distance, dog['_id']))
+    found.sort()
+    return found[(page - 1) * PER_PAGE:page * PER_PAGE]
+
+def bench_mongodb(uri: str, dogs: list, iterations: int):
+    """Time Dog.find_nearby against a scratch database"""
+    from config import Config
+    from models import Dog, db
+
+    class BenchConfig(Config):
+        MONGODB_URI = uri
+        DATABASE_NAME = 'dogshelter_bench_nearby'
+
+    # init_app creates the 2dsphere index before the dogs are loaded
+    db.init_app(BenchConfig)
+    database = db.get_database()
+    database[Config.DOGS_COLLECTION].delete_many({})
+    for start in range(0, len(dogs), 10000):
+        database[Config.DOGS_COLLECTION].insert_many(dogs[start:start + 10000], ordered=False)
+
+    try:
+        for city, lat, lng in CITIES:
+            for radius, page in SEARCHES:
+                result = Dog.find_nearby(lat, lng, radius, page=page, per_page=PER_PAGE)
+                report(f'mongodb {city} {radius}km p{page} ({len(result["dogs"])})', timed(
+                    lambda: Dog.find_nearby(lat, lng, radius, page=page, per_page=PER_PAGE), iterations
+                ))
+    finally:
+        db._client.drop_database(database.name)
+        db.close_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dogs', type=int, default=1000000)
+    parser.add_argument('--shelters', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--mongodb-uri', help='also time $geoNear on MongoDB')
+    args = parser.parse_args()
+
+    dogs = synthetic_dogs(args.dogs, args.shelters)
+    for city, lat, lng in CITIES[:1]:
+        for radius, page in SEARCHES:
+            report(f'client scan {city} {radius}km p{page}', timed(
+                lambda: client_side_search(dogs, lat, lng, radius, page), 3
+            ))
+
+    if args.mongodb_uri:
+        bench_mongodb(args.mongodb_uri, dogs, args.iterations)
+
+if __name__ == '__main__':
+    main()
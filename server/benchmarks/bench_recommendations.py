@@ -0,0 +1,82 @@
+"""Benchmark adopter-match recommendations on the feature matrix.
+
+Loads synthetic dogs (1M by default) into a DogRecommender the way the refresh loop does, then
+times a typical preference query and a small delta. For comparison it also times scoring every
+dog in a Python loop, which is what a request would cost without the precomputed matrix.
+
+Usage (from the server directory):
+    python benchmarks/bench_recommendations.py [--dogs 1000000] [--iterations 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from config import Config
+from models.dog import AdoptionStatus
+from models.recommendations import WEIGHTS, DogRecommender, tokenize
+from bench_dog_snapshot import BREEDS, report, synthetic_dogs, timed
+
+DESCRIPTIONS = [
+    'A friendly and playful dog who loves kids',
+    'Calm senior, house-trained and gentle',
+    'Energetic, loves walks and fetch',
+    'Shy at first but very affectionate and loyal',
+    'Quiet apartment dog, good with cats'
+]
+
+# The preferences the benchmark scores: a young, friendly dog of two breeds that is good with kids
+PREFERENCES = {'min_age': 1, 'max_age': 4, 'gender': 'Female', 'keywords': ['friendly', 'kids'], 'limit': 20}
+
+def python_scores(dogs: list, breed_ids: set) -> list:
+    """Score every dog in plain Python, as a per-request loop over Dog.find_all would"""
+    wanted = set(PREFERENCES['keywords'])
+    scored = []
+    for dog in dogs:
+        if dog['status'] != 'Available':
+            continue
+        age = dog['age']
+        distance = max(PREFERENCES['min_age'] - age, 0) + max(age - PREFERENCES['max_age'], 0)
+        score = WEIGHTS['age'] / (1 + distance)
+        score += WEIGHTS['gender'] * (dog['gender'] == PREFERENCES['gender'])
+        score += WEIGHTS['breed'] * (dog['breed_id'] in breed_ids)
+        score += WEIGHTS['keywords'] * len(wanted & tokenize(dog['description'])) / len(wanted)
+        scored.append((score, dog['id']))
+    scored.sort(reverse=True)
+    return scored[:PREFERENCES['limit']]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dogs', type=int, default=1000000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    breed_ids = [str(ObjectId()) for _ in BREEDS]
+    rng = random.Random(7)
+    dogs = synthetic_dogs(args.dogs, breed_ids)
+    for dog in dogs:
+        dog['description'] = rng.choice(DESCRIPTIONS)
+
+    recommender = DogRecommender([status.value for status in AdoptionStatus], Config.RECOMMENDATION_KEYWORDS)
+    started = time.perf_counter()
+    for start in range(0, len(dogs), 10000):
+        recommender.apply(dogs[start:start + 10000])
+    print(f"{args.dogs} dogs, feature matrix built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # A small delta, as applied by each periodic refresh
+    delta = [dict(dog, age=(dog['age'] + 1) % 16) for dog in dogs[:1000]]
+    report('apply 1000 changes', timed(lambda: recommender.apply(delta), 3))
+
+    preferred = breed_ids[:2]
+    report('recommend (numpy)', timed(
+        lambda: recommender.recommend(breed_ids=preferred, **PREFERENCES), args.iterations
+    ))
+    report('score in python', timed(lambda: python_scores(dogs, set(preferred)), 3))
+
+if __name__ == '__main__':
+    main()
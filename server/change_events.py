@@ -0,0 +1,264 @@
+import json
+import logging
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Server error codes meaning change streams will never work against this deployment
+_UNSUPPORTED_CODES = {40573, 40324}  # not a replica set / unrecognized pipeline stage
+# The resume token fell off the oplog
+_HISTORY_LOST_CODE = 286
+
+class ChangeEvent:
+    """A dog change ready to be sent to Server-Sent Events clients"""
+
+    def __init__(self, event_id: str, event_type: str, data: Dict[str, Any], shelter_id: Optional[str] = None):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        # None when the change does not say (deletes on an unsharded collection)
+        self.shelter_id = shelter_id
+
+    def encode(self) -> str:
+        """Format the event for a text/event-stream response"""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(",", ":"))}\n\n'
+
+class Subscription:
+    """A bounded queue of events for one connected client, optionally of one shelter"""
+
+    # Sentinel telling the client it missed events and should re-sync
+    RESET = ChangeEvent('', 'reset', {})
+
+    def __init__(self, max_size: int, shelter_id: Optional[str] = None):
+        self._queue: 'queue.Queue[ChangeEvent]' = queue.Queue(maxsize=max_size)
+        self.shelter_id = shelter_id
+        self.closed = False
+
+    def wants(self, event: ChangeEvent) -> bool:
+        """Whether the event may concern the client's shelter"""
+        return self.shelter_id is None or event.shelter_id in (None, self.shelter_id)
+
+    def put(self, event: ChangeEvent) -> bool:
+        """Queue an event, returning False if the client has fallen too far behind"""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout: float) -> Optional[ChangeEvent]:
+        """Wait for the next event, returning None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Drop pending events and tell the client to re-sync"""
+        self.closed = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put_nowait(self.RESET)
+
+class ChangeStreamBroadcaster:
+    """Fans out one MongoDB change stream per process to every connected client"""
+
+    # Inserts, deletes, replacements and updates that touch the adoption status
+    PIPELINE = [
+        {
+            '$match': {
+                '$or': [
+                    {'operationType': {'$in': ['insert', 'replace', 'delete']}},
+                    {
+                        'operationType': 'update',
+                        'updateDescription.updatedFields.status': {'$exists': True}
+                    }
+                ]
+            }
+        }
+    ]
+
+    def __init__(self, get_collection: Callable[[], Collection],
+                 resolve_breed: Callable[[Any], Optional[str]] = None,
+                 history_size: int = 1000, queue_size: int = 256,
+                 max_await_ms: int = 1000, enabled: bool = True):
+        self._get_collection = get_collection
+        self._resolve_breed = resolve_breed
+        self._queue_size = queue_size
+        self._max_await_ms = max_await_ms
+
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+        self._history: Deque[ChangeEvent] = deque(maxlen=history_size)
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        # When False, clients are refused and the watcher is never started
+        self.enabled = enabled
+        self.unsupported = False
+        self.events_published: int = 0
+        self.subscribers_dropped: int = 0
+
+    def start(self):
+        """Start the watcher thread if it is not running yet"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='dog-change-stream', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=(self._max_await_ms / 1000) + 1)
+
+    def add_listener(self, listener: Callable[[ChangeEvent], None]):
+        """Call listener for every event, e.g. to invalidate caches"""
+        self._listeners.append(listener)
+
+    def subscribe(self, last_event_id: Optional[str] = None, shelter_id: Optional[str] = None) -> Subscription:
+        """Register a client, replaying events it missed since last_event_id"""
+        subscription = Subscription(self._queue_size, shelter_id)
+
+        with self._lock:
+            if last_event_id:
+                missed = self._events_after(last_event_id)
+                if missed is None:
+                    # Too old for our history: the client has to re-sync
+                    subscription.put(Subscription.RESET)
+                else:
+                    missed = [event for event in missed if subscription.wants(event)]
+                    for event in missed[-self._queue_size:]:
+                        subscription.put(event)
+            self._subscribers.add(subscription)
+
+        # Registered first so nothing the watcher publishes once running is missed
+        if self.enabled:
+            self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a client"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: ChangeEvent):
+        """Record an event and fan it out to every subscriber"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logging.warning(f"Change event listener failed: {e}")
+
+        with self._lock:
+            self._history.append(event)
+            self.events_published += 1
+            for subscription in list(self._subscribers):
+                if not subscription.wants(event):
+                    continue
+                if not subscription.put(event):
+                    # Slow consumer: disconnect it rather than buffering without bound
+                    subscription.close()
+                    self._subscribers.discard(subscription)
+                    self.subscribers_dropped += 1
+
+    def _events_after(self, event_id: str) -> Optional[List[ChangeEvent]]:
+        """Get the events published after event_id, or None if it is not in the history"""
+        events = list(self._history)
+        for index, event in enumerate(events):
+            if event.id == event_id:
+                return events[index + 1:]
+        return None
+
+    def to_event(self, change: Dict[str, Any]) -> ChangeEvent:
+        """Convert a change stream document into a client event"""
+        operation = change['operationType']
+        dog_id = change['documentKey']['_id']
+        data: Dict[str, Any] = {'id': str(dog_id)}
+        # On a sharded collection the document key carries the shard key, deletes included
+        shelter_id = change['documentKey'].get('shelter_id')
+
+        if operation == 'delete':
+            event_type = 'delete'
+        else:
+            event_type = 'insert' if operation == 'insert' else 'update'
+            document = change.get('fullDocument') or {}
+            shelter_id = shelter_id or document.get('shelter_id')
+            data['status'] = document.get('status')
+            if document:
+                data['name'] = document.get('name')
+                breed_id = document.get('breed_id')
+                data['breed'] = self._resolve_breed(breed_id) if self._resolve_breed and breed_id else None
+
+        return ChangeEvent(change['_id']['_data'], event_type, data, shelter_id)
+
+    def _run(self):
+        """Watch the collection, resuming after transient errors"""
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                with self._get_collection().watch(
+                    self.PIPELINE,
+                    full_document='updateLookup',
+                    resume_after=self._resume_token,
+                    max_await_time_ms=self._max_await_ms
+                ) as stream:
+                    backoff = 0.5
+                    while not self._stopping.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._resume_token = stream.resume_token
+                        self.publish(self.to_event(change))
+            except OperationFailure as e:
+                if e.code in _UNSUPPORTED_CODES:
+                    logging.error(f"Change streams are not supported by this deployment: {e}")
+                    self.unsupported = True
+                    self._close_all()
+                    return
+                if e.code == _HISTORY_LOST_CODE:
+                    # Events were lost, so every client has to re-sync from a fresh stream
+                    logging.warning(f"Change stream history lost, restarting: {e}")
+                    self._resume_token = None
+                    self._close_all()
+                else:
+                    logging.warning(f"Change stream failed, resuming: {e}")
+            except PyMongoError as e:
+                logging.warning(f"Change stream interrupted, resuming: {e}")
+            except Exception as e:
+                logging.error(f"Change stream watcher stopped unexpectedly: {e}")
+                self._close_all()
+                return
+
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, 10)
+
+    def _close_all(self):
+        """Disconnect every subscriber"""
+        with self._lock:
+            for subscription in self._subscribers:
+                subscription.close()
+            self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get watcher counters"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'unsupported': self.unsupported,
+                'subscribers': len(self._subscribers),
+                'events_published': self.events_published,
+                'subscribers_dropped': self.subscribers_dropped
+            }
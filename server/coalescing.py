@@ -0,0 +1,84 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+class _InFlightCall:
+    """A single in-flight computation shared by every caller with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters: int = 0
+
+class RequestCoalescer:
+    """Single-flight helper that collapses concurrent identical calls into one"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlightCall] = {}
+        self._executed: int = 0
+        self._coalesced: int = 0
+
+    @staticmethod
+    def make_key(route: str, params: Any = None) -> str:
+        """Build a normalized key from a route and its query parameters"""
+        if not params:
+            return route
+
+        # Sort keys and values so that ?a=1&b=2 and ?b=2&a=1 share a key
+        items = params.items(multi=True) if hasattr(params, 'getlist') else params.items()
+        normalized = sorted((str(key), str(value)) for key, value in items)
+        return route + '?' + '&'.join(f'{key}={value}' for key, value in normalized)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per key, returning (result, shared) to every concurrent caller"""
+        if not self.enabled:
+            return fn(), False
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Drop the key before waking waiters so later requests start a fresh query
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+        return call.result, call.waiters > 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'executed': self._executed,
+                'coalesced': self._coalesced,
+                'in_flight': len(self._in_flight)
+            }
+
+    def reset_stats(self):
+        """Reset the coalescing counters"""
+        with self._lock:
+            self._executed = 0
+            self._coalesced = 0
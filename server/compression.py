@@ -0,0 +1,110 @@
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+class _StreamCompressor:
+    """Incremental gzip/brotli compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=min(level, 11))
+        else:
+            # wbits 16 + MAX_WBITS writes a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it so the client receives it immediately"""
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Finish the compressed stream"""
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class Compression:
+    """Response compression for Flask, with size and content type thresholds"""
+
+    def __init__(self, app: Optional[Flask] = None, config: Config = None):
+        self.enabled: bool = True
+        self.min_size: int = 500
+        self.level: int = 6
+        self.mimetypes: set = {'application/json'}
+        if app is not None:
+            self.init_app(app, config)
+
+    def init_app(self, app: Flask, config: Config = None):
+        """Register the compression hook on the app"""
+        if config is None:
+            config = Config()
+
+        self.enabled = config.COMPRESSION_ENABLED
+        self.min_size = config.COMPRESSION_MIN_SIZE
+        self.level = config.COMPRESSION_LEVEL
+        self.mimetypes = set(config.COMPRESSION_MIMETYPES)
+        app.after_request(self.after_request)
+
+    def choose_encoding(self) -> Optional[str]:
+        """Pick the best encoding the client accepts, if any"""
+        accept = request.accept_encodings
+        if brotli is not None and accept['br'] > 0:
+            return 'br'
+        if accept['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def after_request(self, response: Response) -> Response:
+        """Compress eligible responses"""
+        if (not self.enabled
+                or request.method == 'HEAD'
+                or response.status_code < 200
+                or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+
+        # Even when we do not compress, the body depends on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressor = _StreamCompressor(encoding, self.level)
+            response.set_data(compressor.compress(data) + compressor.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_stream(self, chunks: Iterable, encoding: str) -> Iterator[bytes]:
+        """Compress a streamed body chunk by chunk"""
+        compressor = _StreamCompressor(encoding, self.level)
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if chunk:
+                    yield compressor.compress(chunk)
+            yield compressor.finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
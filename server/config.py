@@ -14,11 +14,103 @@ class Config:
     # Collection names
     DOGS_COLLECTION: str = 'dogs'
     BREEDS_COLLECTION: str = 'breeds'
+    DOG_TOMBSTONES_COLLECTION: str = 'dog_tombstones'
+    DOG_STATUS_EVENTS_COLLECTION: str = 'dog_status_events'
+    DOG_STATUS_ROLLUPS_COLLECTION: str = 'dog_status_rollups'
+    
+    # Shelter served when a request names none; the snapshot, recommendations and SQLite copy hold only this one
+    SHELTER_ID: str = os.getenv('SHELTER_ID', 'main')
     
     # Flask configuration
     DEBUG: bool = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     PORT: int = int(os.getenv('FLASK_PORT', '5100'))
     
+    # Performance configuration
+    COALESCE_REQUESTS: bool = os.getenv('COALESCE_REQUESTS', 'True').lower() == 'true'
+    PAYLOAD_CACHE_SIZE: int = int(os.getenv('PAYLOAD_CACHE_SIZE', '256'))
+    PAYLOAD_CACHE_MAX_AGE: float = float(os.getenv('PAYLOAD_CACHE_MAX_AGE', '60'))
+    
+    # Change stream / Server-Sent Events configuration
+    CHANGE_STREAM_ENABLED: bool = os.getenv('CHANGE_STREAM_ENABLED', 'False').lower() == 'true'
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv('SSE_HEARTBEAT_SECONDS', '5'))
+    SSE_QUEUE_SIZE: int = int(os.getenv('SSE_QUEUE_SIZE', '256'))
+    CHANGE_EVENT_HISTORY: int = int(os.getenv('CHANGE_EVENT_HISTORY', '1000'))
+    
+    # Export configuration
+    EXPORT_BATCH_SIZE: int = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+    EXPORT_MAX_BATCH_SIZE: int = int(os.getenv('EXPORT_MAX_BATCH_SIZE', '10000'))
+    
+    # Incremental sync configuration
+    SYNC_PAGE_SIZE: int = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+    TOMBSTONE_TTL_DAYS: int = int(os.getenv('TOMBSTONE_TTL_DAYS', '30'))
+    
+    # Status history configuration
+    STATUS_EVENTS_TTL_DAYS: int = int(os.getenv('STATUS_EVENTS_TTL_DAYS', '0'))
+    TIMELINE_MAX_DAYS: int = int(os.getenv('TIMELINE_MAX_DAYS', '731'))
+    
+    # Nearby search configuration
+    NEARBY_DEFAULT_RADIUS_KM: float = float(os.getenv('NEARBY_DEFAULT_RADIUS_KM', '25'))
+    NEARBY_MAX_RADIUS_KM: float = float(os.getenv('NEARBY_MAX_RADIUS_KM', '500'))
+    NEARBY_MAX_PAGE_SIZE: int = int(os.getenv('NEARBY_MAX_PAGE_SIZE', '100'))
+    
+    # In-memory dog snapshot configuration
+    SNAPSHOT_ENABLED: bool = os.getenv('SNAPSHOT_ENABLED', 'False').lower() == 'true'
+    SNAPSHOT_REFRESH_SECONDS: float = float(os.getenv('SNAPSHOT_REFRESH_SECONDS', '5'))
+    SNAPSHOT_FILE: str = os.getenv('SNAPSHOT_FILE', '')
+    
+    # Adopter-match recommendation configuration
+    RECOMMENDATIONS_ENABLED: bool = os.getenv('RECOMMENDATIONS_ENABLED', 'False').lower() == 'true'
+    RECOMMENDATIONS_REFRESH_SECONDS: float = float(os.getenv('RECOMMENDATIONS_REFRESH_SECONDS', '5'))
+    RECOMMENDATIONS_MAX_LIMIT: int = int(os.getenv('RECOMMENDATIONS_MAX_LIMIT', '100'))
+    RECOMMENDATION_KEYWORDS: list = os.getenv(
+        'RECOMMENDATION_KEYWORDS',
+        'friendly,playful,calm,gentle,energetic,active,loyal,smart,intelligent,affectionate,quiet,'
+        'shy,trained,house-trained,kids,children,cats,dogs,family,senior,puppy,small,large,cuddly,'
+        'independent,protective,lazy,walks,fetch,swimming,apartment,yard'
+    ).split(',')
+    
+    # Read backend for the model finders: 'mongodb', or 'sqlite' on read-only edge nodes
+    REPOSITORY_BACKEND: str = os.getenv('REPOSITORY_BACKEND', 'mongodb')
+    SQLITE_PATH: str = os.getenv('SQLITE_PATH', 'dogshelter.sqlite3')
+    
+    # Write-behind configuration for Dog.save(defer=True)
+    WRITE_BEHIND_MAX_PENDING: int = int(os.getenv('WRITE_BEHIND_MAX_PENDING', '10000'))
+    WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '500'))
+    WRITE_BEHIND_FLUSH_SECONDS: float = float(os.getenv('WRITE_BEHIND_FLUSH_SECONDS', '0.5'))
+    WRITE_BEHIND_ENQUEUE_TIMEOUT: float = float(os.getenv('WRITE_BEHIND_ENQUEUE_TIMEOUT', '1'))
+    
+    # Admission control configuration
+    RATE_LIMIT_ENABLED: bool = os.getenv('RATE_LIMIT_ENABLED', 'False').lower() == 'true'
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv('RATE_LIMIT_PER_SECOND', '20'))
+    RATE_LIMIT_BURST: int = int(os.getenv('RATE_LIMIT_BURST', '40'))
+    RATE_LIMIT_REDIS_URL: str = os.getenv('RATE_LIMIT_REDIS_URL', '')
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'False').lower() == 'true'
+    RATE_LIMIT_API_KEYS: list = [key for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key]
+    ROUTE_CONCURRENCY_LIMIT: int = int(os.getenv('ROUTE_CONCURRENCY_LIMIT', '64'))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '0.1'))
+    DB_MAX_IN_FLIGHT_QUERIES: int = int(os.getenv('DB_MAX_IN_FLIGHT_QUERIES', '50'))
+    DB_QUERY_SLOT_TIMEOUT: float = float(os.getenv('DB_QUERY_SLOT_TIMEOUT', '0.5'))
+    
+    # Query time budget and circuit breaker configuration
+    REQUEST_TIMEOUT_SECONDS: float = float(os.getenv('REQUEST_TIMEOUT_SECONDS', '5'))
+    DB_MAX_TIME_MS: int = int(os.getenv('DB_MAX_TIME_MS', '5000'))
+    DB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    EXPORT_MAX_TIME_SECONDS: float = float(os.getenv('EXPORT_MAX_TIME_SECONDS', '600'))
+    CIRCUIT_BREAKER_FAILURES: int = int(os.getenv('CIRCUIT_BREAKER_FAILURES', '5'))
+    CIRCUIT_BREAKER_RESET_SECONDS: float = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '10'))
+    
+    # Query plan sampling configuration
+    PLAN_SAMPLE_RATE: float = float(os.getenv('PLAN_SAMPLE_RATE', '0'))
+    PLAN_MAX_EXAMINED_RATIO: float = float(os.getenv('PLAN_MAX_EXAMINED_RATIO', '10'))
+    
+    # Response compression configuration
+    COMPRESSION_ENABLED: bool = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE: int = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))
+    COMPRESSION_LEVEL: int = int(os.getenv('COMPRESSION_LEVEL', '6'))
+    COMPRESSION_MIMETYPES: list = os.getenv(
+        'COMPRESSION_MIMETYPES', 'application/json,text/csv'
+    ).split(',')
+    
     @classmethod
     def get_mongodb_uri(cls) -> str:
         """Get the complete MongoDB URI"""
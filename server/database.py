@@ -1,10 +1,144 @@
-from pymongo import MongoClient
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pymongo import MongoClient, monitoring
 from pymongo.database import Database
 from pymongo.collection import Collection
-from typing import Optional
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, ServerSelectionTimeoutError
+from typing import Any, Dict, Iterator, Optional
 import logging
+import threading
+import time
 
 from config import Config
+from query_plans import PlanSampler
+
+# Absolute time.monotonic() by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+# Collation of the case-insensitive breed name index: strength 2 ignores case but not accents
+BREED_NAME_COLLATION = {'locale': 'en', 'strength': 2}
+
+# Dog indexes from before every index led with shelter_id; the compound indexes replace them
+SUPERSEDED_DOG_INDEXES = ('name_1', 'breed_id_1', 'status_1', 'age_1', 'updated_at_1', 'updated_at_1__id_1')
+
+class DatabaseBusyError(Exception):
+    """Raised when every in-flight query slot is taken and none freed up in time"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceeded(DatabaseBusyError):
+    """Raised when a query cannot finish within what is left of the request deadline"""
+
+class CircuitOpenError(DatabaseBusyError, ConnectionFailure):
+    """Raised instead of querying while the circuit breaker considers MongoDB unhealthy
+
+    It is a ConnectionFailure, so callers that retry transient PyMongo errors treat it as one.
+    """
+
+class CircuitBreaker:
+    """Fails fast after consecutive connection failures, probing again with one call after a pause
+
+    Queries that exceed their maxTimeMS are not failures: a slow query says nothing about whether
+    MongoDB is reachable, and the deadlines already bound how long it can hold a worker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state: str = self.CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        # When the call let through to probe a half-open breaker started, None if there is none
+        self._probe_started_at: Optional[float] = None
+        self._trips: int = 0
+        self._rejected: int = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker turns half-open once reset_timeout has passed"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def check(self):
+        """Raise CircuitOpenError while the breaker is open, or half-open with a probe in flight"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN:
+                # A probe that never reports back (no command was sent) gives way after reset_timeout
+                if self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout:
+                    self._probe_started_at = now
+                    return
+                retry_after = self.reset_timeout - (now - self._probe_started_at)
+            else:
+                retry_after = self.reset_timeout - (now - self._opened_at)
+            self._rejected += 1
+        raise CircuitOpenError('MongoDB is unavailable', retry_after=retry_after)
+
+    def record_success(self):
+        """Close the breaker after an operation succeeded"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info("MongoDB circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_started_at = None
+
+    def record_failure(self):
+        """Count a connection failure, opening the breaker at the threshold"""
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            state = self._current_state(now)
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                logging.warning(f"MongoDB circuit breaker opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = now
+                self._probe_started_at = None
+                self._trips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters"""
+        with self._lock:
+            return {
+                'state': self._current_state(time.monotonic()),
+                'consecutive_failures': self._failures,
+                'trips': self._trips,
+                'rejected': self._rejected
+            }
+
+class _BreakerListener(monitoring.CommandListener):
+    """Feeds the outcome of every command sent to MongoDB into the circuit breaker"""
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self.breaker.record_success()
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        # Network errors are reported with their exception type; server errors (maxTimeMS
+        # expiries included) mean MongoDB answered, so they do not count
+        failure = event.failure or {}
+        if failure.get('errtype') in ('AutoReconnect', 'NetworkTimeout', 'ConnectionFailure', 'NotPrimaryError'):
+            self.breaker.record_failure()
 
 class MongoDB:
     """MongoDB connection manager"""
@@ -12,46 +146,132 @@ class MongoDB:
     def __init__(self):
         self._client: Optional[MongoClient] = None
         self._database: Optional[Database] = None
+        self._query_slots: Optional[threading.BoundedSemaphore] = None
+        self._query_slot_timeout: float = 0.0
+        self._query_stats_lock = threading.Lock()
+        self._queries_in_flight: int = 0
+        self._queries_rejected: int = 0
+        self._max_time: float = Config.DB_MAX_TIME_MS / 1000
+        self.breaker = CircuitBreaker(Config.CIRCUIT_BREAKER_FAILURES, Config.CIRCUIT_BREAKER_RESET_SECONDS)
+        self.plan_sampler = PlanSampler(self._explain, Config.PLAN_SAMPLE_RATE, Config.PLAN_MAX_EXAMINED_RATIO)
         
     def init_app(self, config: Config = None):
         """Initialize MongoDB connection"""
         if config is None:
             config = Config()
+        
+        self.set_query_limit(config.DB_MAX_IN_FLIGHT_QUERIES, config.DB_QUERY_SLOT_TIMEOUT)
+        self._max_time = config.DB_MAX_TIME_MS / 1000
+        self.breaker = CircuitBreaker(config.CIRCUIT_BREAKER_FAILURES, config.CIRCUIT_BREAKER_RESET_SECONDS)
+        self.plan_sampler.configure(config.PLAN_SAMPLE_RATE, config.PLAN_MAX_EXAMINED_RATIO)
             
         try:
-            self._client = MongoClient(config.get_mongodb_uri())
+            self._client = MongoClient(
+                config.get_mongodb_uri(),
+                serverSelectionTimeoutMS=config.DB_SERVER_SELECTION_TIMEOUT_MS,
+                event_listeners=[_BreakerListener(self.breaker), self.plan_sampler]
+            )
             self._database = self._client[config.get_database_name()]
             
             # Test the connection
             self._client.admin.command('ping')
             logging.info(f"Successfully connected to MongoDB: {config.get_database_name()}")
             
-            # Create indexes for better performance
+            # Create collections that need options, then indexes for better performance
+            self._create_collections()
             self._create_indexes()
             
+            # Dogs from before shelters existed would otherwise be invisible to every shelter
+            try:
+                for collection_name, count in self.assign_missing_shelter(config.SHELTER_ID).items():
+                    if count:
+                        logging.info(f"Assigned {count} {collection_name} documents to shelter '{config.SHELTER_ID}'")
+            except Exception as e:
+                logging.warning(f"Failed to assign documents without a shelter_id: {e}")
+            
         except Exception as e:
             logging.error(f"Failed to connect to MongoDB: {e}")
             raise
     
+    def _create_collections(self):
+        """Create the status events collection as a time-series collection if it does not exist yet"""
+        try:
+            if Config.DOG_STATUS_EVENTS_COLLECTION in self._database.list_collection_names():
+                return
+            # Events are bucketed by shelter and breed (meta) and hour; see models/status_events.py
+            options: Dict[str, Any] = {'timeseries': {'timeField': 'at', 'metaField': 'meta', 'granularity': 'hours'}}
+            if Config.STATUS_EVENTS_TTL_DAYS > 0:
+                options['expireAfterSeconds'] = Config.STATUS_EVENTS_TTL_DAYS * 24 * 60 * 60
+            self._database.create_collection(Config.DOG_STATUS_EVENTS_COLLECTION, **options)
+        except Exception as e:
+            # Servers before MongoDB 5.0 store the events in a regular collection
+            logging.warning(f"Failed to create the time-series status events collection: {e}")
+    
     def _create_indexes(self):
         """Create database indexes for better performance"""
         try:
-            # Index for dogs collection
+            # Indexes for dogs collection; every dog query filters on shelter_id, so it leads each
+            # index, and (shelter_id, _id) backs the recommended shard key
             dogs_collection = self.get_collection(Config.DOGS_COLLECTION)
-            dogs_collection.create_index([("name", 1)])
-            dogs_collection.create_index([("breed_id", 1)])
-            dogs_collection.create_index([("status", 1)])
-            dogs_collection.create_index([("age", 1)])
+            existing = dogs_collection.index_information()
+            for index_name in SUPERSEDED_DOG_INDEXES:
+                if index_name in existing:
+                    dogs_collection.drop_index(index_name)
+                    logging.info(f"Dropped superseded dogs index {index_name}")
+            dogs_collection.create_index([("shelter_id", 1), ("_id", 1)])
+            dogs_collection.create_index([("shelter_id", 1), ("name", 1)])
+            dogs_collection.create_index([("shelter_id", 1), ("breed_id", 1), ("name", 1)])
+            dogs_collection.create_index([("shelter_id", 1), ("status", 1), ("name", 1)])
+            dogs_collection.create_index([("shelter_id", 1), ("age", 1)])
+            dogs_collection.create_index([("shelter_id", 1), ("updated_at", 1), ("_id", 1)])
+            # Nearby search spans every shelter; dogs without a location are left out of this index
+            dogs_collection.create_index([("location", "2dsphere"), ("status", 1)])
+            
+            # Tombstones expire once no client can still be syncing from before them
+            tombstones_collection = self.get_collection(Config.DOG_TOMBSTONES_COLLECTION)
+            tombstones_collection.create_index(
+                [("deleted_at", 1)],
+                expireAfterSeconds=Config.TOMBSTONE_TTL_DAYS * 24 * 60 * 60
+            )
+            tombstones_collection.create_index([("shelter_id", 1), ("deleted_at", 1), ("_id", 1)])
+            
+            # Status history: events by shelter and time, one rollup per shelter, day and breed
+            events_collection = self.get_collection(Config.DOG_STATUS_EVENTS_COLLECTION)
+            events_collection.create_index([("meta.shelter_id", 1), ("at", 1)])
+            rollups_collection = self.get_collection(Config.DOG_STATUS_ROLLUPS_COLLECTION)
+            rollups_collection.create_index([("shelter_id", 1), ("day", 1), ("breed_id", 1)], unique=True)
             
             # Index for breeds collection
             breeds_collection = self.get_collection(Config.BREEDS_COLLECTION)
             breeds_collection.create_index([("name", 1)], unique=True)
+            # Case-insensitive lookups by name (Breed.find_by_name)
+            breeds_collection.create_index([("name", 1)], name='name_ci', collation=BREED_NAME_COLLATION)
             
             logging.info("Database indexes created successfully")
             
         except Exception as e:
             logging.warning(f"Failed to create indexes: {e}")
     
+    def assign_missing_shelter(self, shelter_id: str) -> Dict[str, int]:
+        """Put dogs and tombstones stored before shelters existed into shelter_id
+        
+        Matching null also matches a missing field, and reads the shelter_id index instead of scanning.
+        """
+        counts = {}
+        for collection_name in (Config.DOGS_COLLECTION, Config.DOG_TOMBSTONES_COLLECTION):
+            result = self.get_collection(collection_name).update_many(
+                {'shelter_id': None},
+                {'$set': {'shelter_id': shelter_id}}
+            )
+            counts[collection_name] = result.modified_count
+        return counts
+    
+    def _explain(self, database_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Explain a command with executionStats (for the plan sampler)"""
+        if self._client is None:
+            raise RuntimeError("Database not initialized. Call init_app() first.")
+        return self._client[database_name].command('explain', command, verbosity='executionStats')
+    
     def get_database(self) -> Database:
         """Get the database instance"""
         if self._database is None:
@@ -59,9 +279,83 @@ class MongoDB:
         return self._database
     
     def get_collection(self, collection_name: str) -> Collection:
-        """Get a collection from the database"""
+        """Get a collection from the database, raising CircuitOpenError while MongoDB is unhealthy"""
+        self.breaker.check()
         return self.get_database()[collection_name]
     
+    @staticmethod
+    def start_deadline(seconds: float) -> Token:
+        """Give the current context (e.g. a request) a deadline; pass the token to clear_deadline"""
+        deadline = time.monotonic() + seconds
+        current = _deadline.get()
+        if current is not None:
+            deadline = min(deadline, current)
+        return _deadline.set(deadline)
+    
+    @staticmethod
+    def clear_deadline(token: Token):
+        """Restore the deadline that was in effect before start_deadline"""
+        _deadline.reset(token)
+    
+    @contextmanager
+    def deadline(self, seconds: float) -> Iterator[None]:
+        """Run a block with a deadline, shortened to any deadline already in effect"""
+        token = self.start_deadline(seconds)
+        try:
+            yield
+        finally:
+            self.clear_deadline(token)
+    
+    def max_time_ms(self, budget: Optional[float] = None) -> int:
+        """maxTimeMS for the next query: budget seconds (default DB_MAX_TIME_MS), capped by the deadline"""
+        remaining = self._max_time if budget is None else budget
+        deadline = _deadline.get()
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise DeadlineExceeded('Request deadline exceeded before the query started')
+            remaining = min(remaining, left)
+        return max(1, int(remaining * 1000))
+    
+    def set_query_limit(self, max_in_flight: int, timeout: float = 0.0):
+        """Cap the queries run through query_slot at once; 0 means unlimited"""
+        self._query_slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._query_slot_timeout = timeout
+    
+    @contextmanager
+    def query_slot(self) -> Iterator[None]:
+        """Hold one in-flight query slot, raising DatabaseBusyError if none frees up in time"""
+        slots = self._query_slots
+        if slots is not None and not slots.acquire(timeout=self._query_slot_timeout):
+            with self._query_stats_lock:
+                self._queries_rejected += 1
+            raise DatabaseBusyError('Too many queries in flight', retry_after=1.0)
+        
+        with self._query_stats_lock:
+            self._queries_in_flight += 1
+        try:
+            yield
+        except ExecutionTimeout as e:
+            raise DeadlineExceeded(f'Query exceeded its time budget: {e}') from e
+        except ServerSelectionTimeoutError:
+            # No command was sent, so the command listener did not see this failure
+            self.breaker.record_failure()
+            raise
+        finally:
+            with self._query_stats_lock:
+                self._queries_in_flight -= 1
+            if slots is not None:
+                slots.release()
+    
+    def query_stats(self) -> Dict[str, Any]:
+        """Get in-flight query counters"""
+        with self._query_stats_lock:
+            return {
+                'limited': self._query_slots is not None,
+                'in_flight': self._queries_in_flight,
+                'rejected': self._queries_rejected
+            }
+    
     def close_connection(self):
         """Close the MongoDB connection"""
         if self._client:
@@ -0,0 +1,149 @@
+import csv
+import io
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from models.base import BaseModel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; CSV exports work without it
+    pa = None
+    pq = None
+
+# Exported columns, in order
+COLUMNS = [
+    'id', 'name', 'breed_id', 'breed', 'age', 'gender', 'description', 'status',
+    'intake_date', 'adoption_date', 'created_at', 'updated_at'
+]
+TIMESTAMP_COLUMNS = {'intake_date', 'adoption_date', 'created_at', 'updated_at'}
+
+def to_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a raw dog document into export columns"""
+    row = {
+        'id': str(doc['_id']),
+        'name': doc.get('name'),
+        'breed_id': str(doc['breed_id']) if doc.get('breed_id') else None,
+        'breed': doc.get('breed'),
+        'age': doc.get('age'),
+        'gender': doc.get('gender'),
+        'description': doc.get('description'),
+        'status': doc.get('status')
+    }
+    for column in TIMESTAMP_COLUMNS:
+        row[column] = BaseModel.parse_timestamp(doc.get(column))
+    return row
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the response generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Return and forget everything written so far"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def export_csv(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Stream batches of dog documents as CSV"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+
+    for batch in batches:
+        for doc in batch:
+            row = to_row(doc)
+            for column in TIMESTAMP_COLUMNS:
+                if row[column] is not None:
+                    row[column] = row[column].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def arrow_schema() -> 'pa.Schema':
+    """Arrow schema of the exported columns"""
+    return pa.schema([
+        ('id', pa.string()),
+        ('name', pa.string()),
+        ('breed_id', pa.string()),
+        ('breed', pa.string()),
+        ('age', pa.int32()),
+        ('gender', pa.string()),
+        ('description', pa.string()),
+        ('status', pa.string()),
+        ('intake_date', pa.timestamp('us')),
+        ('adoption_date', pa.timestamp('us')),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us'))
+    ])
+
+def _record_batch(batch: List[Dict[str, Any]], schema: 'pa.Schema') -> 'pa.RecordBatch':
+    """Build a columnar record batch from a batch of dog documents"""
+    rows = [to_row(doc) for doc in batch]
+    return pa.RecordBatch.from_pydict(
+        {column: [row[column] for row in rows] for column in COLUMNS},
+        schema=schema
+    )
+
+def _export_columnar(batches: Iterable[List[Dict[str, Any]]],
+                     open_writer: Callable[[_ChunkSink, 'pa.Schema'], Any]) -> Iterator[bytes]:
+    """Stream batches through an Arrow-based writer, yielding bytes after every batch"""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = open_writer(sink, schema)
+    try:
+        for batch in batches:
+            writer.write_batch(_record_batch(batch, schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_arrow(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Stream batches of dog documents in the Arrow IPC streaming format"""
+    return _export_columnar(batches, pa.ipc.new_stream)
+
+def export_parquet(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Stream batches of dog documents as Parquet, one row group per batch"""
+    return _export_columnar(batches, lambda sink, schema: pq.ParquetWriter(sink, schema, compression='snappy'))
+
+class ExportFormat:
+    """An export format with its writer and response metadata"""
+
+    def __init__(self, writer: Callable, mimetype: str, extension: str, requires_pyarrow: bool):
+        self.writer = writer
+        self.mimetype = mimetype
+        self.extension = extension
+        self.requires_pyarrow = requires_pyarrow
+
+    @property
+    def available(self) -> bool:
+        """Whether the format's dependencies are installed"""
+        return not self.requires_pyarrow or pa is not None
+
+FORMATS = {
+    'csv': ExportFormat(export_csv, 'text/csv', 'csv', requires_pyarrow=False),
+    'arrow': ExportFormat(export_arrow, 'application/vnd.apache.arrow.stream', 'arrows', requires_pyarrow=True),
+    'parquet': ExportFormat(export_parquet, 'application/vnd.apache.parquet', 'parquet', requires_pyarrow=True)
+}
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models import Dog
+from models.base import BaseModel
+
+# How far behind now the delete watermark is kept once all tombstones have been read, so
+# tombstones written just before the query (or by a server with a slightly slow clock) are not missed
+DELETE_WATERMARK_LAG = timedelta(minutes=1)
+# How far behind now the update watermark stops. Dogs saved more recently are still sent, but again
+# on the next sync too, since a writer with a slower clock (or a save still in flight) may yet
+# commit a dog with an earlier updated_at
+UPDATE_WATERMARK_LAG = timedelta(minutes=1)
+
+class SyncToken:
+    """Opaque cursor recording how far a client has synced dogs and deletes"""
+
+    def __init__(self, updated_at: Optional[datetime] = None, updated_after_id: Optional[ObjectId] = None,
+                 deleted_at: Optional[datetime] = None, deleted_ids: List[ObjectId] = None):
+        # Watermarks are inclusive. Dogs at exactly updated_at come back in _id order, so only those
+        # after updated_after_id are still to send; the tombstones at deleted_at already sent are listed
+        self.updated_at = updated_at
+        self.updated_after_id = updated_after_id
+        self.deleted_at = deleted_at
+        self.deleted_ids = deleted_ids or []
+
+    def encode(self) -> str:
+        """Serialize the token for clients"""
+        data = {
+            'u': self.updated_at.isoformat() if self.updated_at else None,
+            'ua': str(self.updated_after_id) if self.updated_after_id else None,
+            'd': self.deleted_at.isoformat() if self.deleted_at else None,
+            'di': [str(dog_id) for dog_id in self.deleted_ids]
+        }
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+    @classmethod
+    def decode(cls, token: str) -> 'SyncToken':
+        """Parse a token produced by encode(), raising ValueError if it is malformed"""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            # Older tokens list every dog sent at the watermark; the last of them is where to continue
+            updated_ids = [ObjectId(dog_id) for dog_id in data.get('ui', [])]
+            return cls(
+                updated_at=datetime.fromisoformat(data['u']) if data.get('u') else None,
+                updated_after_id=ObjectId(data['ua']) if data.get('ua') else max(updated_ids, default=None),
+                deleted_at=datetime.fromisoformat(data['d']) if data.get('d') else None,
+                deleted_ids=[ObjectId(dog_id) for dog_id in data.get('di', [])]
+            )
+        except (ValueError, TypeError, KeyError, InvalidId) as e:
+            raise ValueError(f"Invalid sync token: {e}")
+
+def _advance_updated(watermark: Optional[datetime], after_id: Optional[ObjectId],
+                     docs: List[Dict[str, Any]]) -> Tuple[Optional[datetime], Optional[ObjectId]]:
+    """Move the update watermark to the last dog of a page, which is also the last sent at its timestamp"""
+    if not docs:
+        return watermark, after_id
+    return BaseModel.parse_timestamp(docs[-1]['updated_at']), docs[-1]['_id']
+
+def _advance(watermark: Optional[datetime], seen_ids: List[ObjectId], docs: List[Dict[str, Any]],
+             field_name: str) -> Tuple[Optional[datetime], List[ObjectId]]:
+    """Move a watermark to the last document of a page, remembering ids at that exact timestamp"""
+    if not docs:
+        return watermark, seen_ids
+
+    last = BaseModel.parse_timestamp(docs[-1][field_name])
+    ids = [doc['_id'] for doc in docs if BaseModel.parse_timestamp(doc[field_name]) == last]
+    if last == watermark:
+        ids = seen_ids + ids
+    return last, ids
+
+def _isoformat(value: Any) -> Optional[str]:
+    """Format a stored timestamp for clients"""
+    timestamp = BaseModel.parse_timestamp(value)
+    return timestamp.isoformat() if timestamp else None
+
+def _to_change(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a changed dog for the sync response"""
+    return {
+        'id': str(doc['_id']),
+        'shelter_id': doc.get('shelter_id'),
+        'name': doc.get('name'),
+        'breed_id': str(doc['breed_id']) if doc.get('breed_id') else None,
+        'breed': doc.get('breed') or 'Unknown',
+        'age': doc.get('age'),
+        'description': doc.get('description'),
+        'gender': doc.get('gender'),
+        'status': doc.get('status', 'AVAILABLE'),
+        'location': doc.get('location'),
+        'intake_date': _isoformat(doc.get('intake_date')),
+        'adoption_date': _isoformat(doc.get('adoption_date')),
+        'updated_at': _isoformat(doc.get('updated_at'))
+    }
+
+def changes_since(token: Optional[SyncToken], limit: int, tombstone_ttl: timedelta) -> Dict[str, Any]:
+    """Get one page of dogs changed and deleted since the token"""
+    now = datetime.utcnow()
+    if token is None:
+        # First sync: every dog is a change, and nothing deleted before now matters
+        token = SyncToken(deleted_at=now)
+    elif token.deleted_at is not None and token.deleted_at < now - tombstone_ttl:
+        # Tombstones older than the TTL are gone, so deltas would miss deletes
+        return {'reset': True, 'changes': [], 'deleted': [], 'next': None, 'has_more': False}
+
+    docs = Dog.find_changed_since(token.updated_at, token.updated_after_id, limit)
+    tombstones = Dog.find_deleted_since(token.deleted_at, token.deleted_ids, limit)
+
+    updated_at, updated_after_id = _advance_updated(token.updated_at, token.updated_after_id, docs)
+    settled = now - UPDATE_WATERMARK_LAG
+    unsettled = updated_at is not None and updated_at > settled
+    if unsettled:
+        # Stop at the settled time instead, and wait for it to move before paging on
+        if token.updated_at is None or token.updated_at < settled:
+            updated_at, updated_after_id = settled, None
+        else:
+            updated_at, updated_after_id = token.updated_at, token.updated_after_id
+    deleted_at, deleted_ids = _advance(token.deleted_at, token.deleted_ids, tombstones, 'deleted_at')
+    if len(tombstones) < limit:
+        # Every tombstone has been read, so the watermark can catch up with the clock even when
+        # nothing was deleted; otherwise it would stay put and expire after the tombstone TTL
+        caught_up = now - DELETE_WATERMARK_LAG
+        if deleted_at is None or deleted_at < caught_up:
+            deleted_at, deleted_ids = caught_up, []
+    next_token = SyncToken(updated_at, updated_after_id, deleted_at, deleted_ids)
+
+    return {
+        'reset': False,
+        'changes': [_to_change(doc) for doc in docs],
+        'deleted': [str(tombstone['_id']) for tombstone in tombstones],
+        'next': next_token.encode(),
+        'has_more': (len(docs) >= limit and not unsettled) or len(tombstones) >= limit
+    }
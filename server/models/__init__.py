@@ -1,7 +1,8 @@
 from database import db, init_db
 
 # Import models after db is defined to avoid circular imports
+from .base import ConcurrentModificationError
 from .breed import Breed
 from .dog import Dog
 
-__all__ = ['db', 'init_db', 'Breed', 'Dog']
\ No newline at end of file
+__all__ = ['db', 'init_db', 'Breed', 'Dog', 'ConcurrentModificationError']
\ No newline at end of file
@@ -1,6 +1,10 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from bson import ObjectId
 from datetime import datetime
+from database import db
+
+class ConcurrentModificationError(Exception):
+    """Raised when a document was changed by someone else since it was loaded"""
 
 class BaseModel:
     """Base model class for MongoDB documents"""
@@ -10,6 +14,10 @@ class BaseModel:
         self._id: Optional[ObjectId] = kwargs.get('_id')
         self.created_at: datetime = kwargs.get('created_at', datetime.utcnow())
         self.updated_at: datetime = kwargs.get('updated_at', datetime.utcnow())
+        
+        # Stored field values as of the last load or save, for dirty-field tracking
+        self._clean: Optional[Dict[str, Any]] = None
+        self._loaded_updated_at: Any = None
     
     @property
     def id(self) -> str:
@@ -39,7 +47,75 @@ class BaseModel:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]):
         """Create a model instance from a dictionary"""
-        return cls(**data)
+        instance = cls(**data)
+        if instance._id:
+            instance.mark_clean()
+            # Documents written by other tools may hold updated_at as a date rather than a string
+            instance._loaded_updated_at = data.get('updated_at')
+        return instance
+    
+    def mark_clean(self):
+        """Record the current field values as the stored state of the document"""
+        self._clean = self.to_dict(include_id=False)
+        # The value as written to MongoDB, which is what the conflict check filters on
+        self._loaded_updated_at = self._clean.get('updated_at')
+    
+    def changes(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Get the fields to $set and $unset to bring the stored document up to date
+        
+        Everything is changed for documents that were not loaded from the database.
+        """
+        current = self.to_dict(include_id=False)
+        if self._clean is None:
+            return current, {}
+        
+        set_fields: Dict[str, Any] = {}
+        unset_fields: Dict[str, Any] = {}
+        for key, value in current.items():
+            if key in self._clean and self._clean[key] == value:
+                continue
+            if value is None:
+                unset_fields[key] = ''
+            else:
+                set_fields[key] = value
+        return set_fields, unset_fields
+    
+    def shard_key(self) -> Dict[str, Any]:
+        """Shard key fields (besides _id) added to writes so they are routed to one shard"""
+        return {}
+    
+    def is_dirty(self) -> bool:
+        """Whether any field differs from the stored document (ignoring updated_at)"""
+        set_fields, unset_fields = self.changes()
+        return bool(set(set_fields) - {'updated_at'} or unset_fields)
+    
+    def _update_document(self, collection, check_conflicts: bool = False) -> bool:
+        """Write only the changed fields of a loaded document, returning False if nothing changed
+        
+        With check_conflicts the update only applies if updated_at still holds the value it had
+        when the document was loaded, and ConcurrentModificationError is raised otherwise.
+        """
+        if not self.is_dirty():
+            return False
+        
+        self.update_timestamp()
+        set_fields, unset_fields = self.changes()
+        update: Dict[str, Any] = {'$set': set_fields}
+        if unset_fields:
+            update['$unset'] = unset_fields
+        
+        query: Dict[str, Any] = {'_id': self._id, **self.shard_key()}
+        if check_conflicts and self._clean is not None:
+            query['updated_at'] = self._loaded_updated_at
+        
+        result = collection.update_one(query, update)
+        if result.matched_count == 0:
+            if check_conflicts and collection.count_documents({'_id': self._id, **self.shard_key()}, limit=1, maxTimeMS=db.max_time_ms()):
+                raise ConcurrentModificationError(f"{type(self).__name__} {self.id} was modified concurrently")
+            raise ValueError(f"{type(self).__name__} not found")
+        
+        self.mark_clean()
+        return True
     
     @staticmethod
     def validate_string_length(field_name: str, value: Any, min_length: int = 2, allow_none: bool = False) -> str:
@@ -58,6 +134,35 @@ class BaseModel:
             
         return value.strip()
     
+    @staticmethod
+    def parse_timestamp(value: Any) -> Optional[datetime]:
+        """Normalize a stored timestamp (ISO string or BSON date) to a datetime"""
+        if value is None or isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def timestamp_range(field_name: str, since: Optional[datetime] = None,
+                        until: Optional[datetime] = None, inclusive: bool = False) -> Dict[str, Any]:
+        """Build a filter on a timestamp field stored either as an ISO string or a BSON date"""
+        if since is None and until is None:
+            return {}
+        
+        # to_dict() writes ISO strings, but documents written by other tools may hold dates;
+        # comparison operators only match values of the same BSON type, so filter on both
+        def bounds(convert):
+            condition = {}
+            if since is not None:
+                condition['$gte' if inclusive else '$gt'] = convert(since)
+            if until is not None:
+                condition['$lte'] = convert(until)
+            return {field_name: condition}
+        
+        return {'$or': [bounds(lambda value: value.isoformat()), bounds(lambda value: value)]}
+    
     def update_timestamp(self):
         """Update the updated_at timestamp"""
         self.updated_at = datetime.utcnow()
\ No newline at end of file
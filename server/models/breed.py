@@ -1,8 +1,11 @@
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
-from database import db
+from bson.errors import InvalidId
+from database import BREED_NAME_COLLATION, db
 from config import Config
 from .base import BaseModel
+from .payloads import EncodedPayload, collection_versions, payload_cache
+from .repository import get_repository
 
 class Breed(BaseModel):
     """Breed model for MongoDB"""
@@ -23,26 +26,24 @@ class Breed(BaseModel):
                 'Description', self.description, min_length=10, allow_none=True
             )
     
-    def save(self) -> 'Breed':
-        """Save the breed to the database"""
+    def save(self, check_conflicts: bool = False) -> 'Breed':
+        """Save the breed to the database, writing only changed fields of an existing breed"""
         self._validate()
-        self.update_timestamp()
         
         collection = db.get_collection(Config.BREEDS_COLLECTION)
         
         if self._id:
             # Update existing breed
-            result = collection.update_one(
-                {'_id': self._id},
-                {'$set': self.to_dict(include_id=False)}
-            )
-            if result.modified_count == 0:
-                raise ValueError("Breed not found or no changes made")
+            if not self._update_document(collection, check_conflicts):
+                return self
         else:
             # Insert new breed
+            self.update_timestamp()
             result = collection.insert_one(self.to_dict(include_id=False))
             self._id = result.inserted_id
+            self.mark_clean()
         
+        collection_versions.bump(Config.BREEDS_COLLECTION)
         return self
     
     def delete(self) -> bool:
@@ -52,6 +53,7 @@ class Breed(BaseModel):
         
         collection = db.get_collection(Config.BREEDS_COLLECTION)
         result = collection.delete_one({'_id': self._id})
+        collection_versions.bump(Config.BREEDS_COLLECTION)
         return result.deleted_count > 0
     
     @classmethod
@@ -59,20 +61,23 @@ class Breed(BaseModel):
         """Find a breed by ID"""
         try:
             object_id = ObjectId(breed_id)
-            collection = db.get_collection(Config.BREEDS_COLLECTION)
-            doc = collection.find_one({'_id': object_id})
-            
-            if doc:
-                return cls.from_dict(doc)
-            return None
-        except Exception:
+        except (InvalidId, TypeError):
             return None
+        
+        collection = db.get_collection(Config.BREEDS_COLLECTION)
+        doc = collection.find_one({'_id': object_id}, max_time_ms=db.max_time_ms())
+        
+        if doc:
+            return cls.from_dict(doc)
+        return None
     
     @classmethod
     def find_by_name(cls, name: str) -> Optional['Breed']:
-        """Find a breed by name"""
+        """Find a breed by name, ignoring case"""
         collection = db.get_collection(Config.BREEDS_COLLECTION)
-        doc = collection.find_one({'name': {'$regex': f'^{name}$', '$options': 'i'}})
+        # An equality match under the name_ci index collation seeks one index key, where an
+        # anchored case-insensitive regex had to scan every name (and treated the name as a pattern)
+        doc = collection.find_one({'name': name}, collation=BREED_NAME_COLLATION, max_time_ms=db.max_time_ms())
         
         if doc:
             return cls.from_dict(doc)
@@ -81,16 +86,44 @@ class Breed(BaseModel):
     @classmethod
     def find_all(cls) -> List['Breed']:
         """Find all breeds"""
-        collection = db.get_collection(Config.BREEDS_COLLECTION)
-        docs = collection.find().sort('name', 1)
+        return [cls.from_dict(doc) for doc in get_repository().find_breeds()]
+    
+    @classmethod
+    def table(cls) -> List[Dict[str, Any]]:
+        """Get every breed as it appears in the breed list"""
+        return [
+            {
+                'id': breed.id,
+                'name': breed.name,
+                'description': breed.description
+            }
+            for breed in cls.find_all()
+        ]
+    
+    @classmethod
+    def names_by_id(cls) -> Dict[str, str]:
+        """Map breed IDs (as strings) to breed names"""
+        return {breed.id: breed.name for breed in cls.find_all()}
+    
+    @classmethod
+    def list_payload(cls, breeds: Optional[List[Dict[str, Any]]] = None) -> EncodedPayload:
+        """Get the pre-encoded breed list, rebuilt only after a breed write
+
+        Pass breeds (e.g. the breed table from a snapshot file) to warm the cache without a query.
+        """
+        def build() -> EncodedPayload:
+            if breeds is not None:
+                return EncodedPayload.from_data(breeds)
+            return EncodedPayload.from_data(cls.table())
         
-        return [cls.from_dict(doc) for doc in docs]
+        return payload_cache.get_or_build(
+            'breeds:list', collection_versions.get(Config.BREEDS_COLLECTION), build
+        )
     
     @classmethod
     def count(cls) -> int:
         """Count total number of breeds"""
-        collection = db.get_collection(Config.BREEDS_COLLECTION)
-        return collection.count_documents({})
+        return get_repository().count_breeds()
     
     def to_dict(self, include_id: bool = True) -> Dict[str, Any]:
         """Convert breed to dictionary"""
@@ -1,10 +1,19 @@
 from datetime import datetime
 from enum import Enum
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from bson import ObjectId
+from bson.errors import InvalidId
 from database import db
 from config import Config
+from tenancy import current_shelter, is_home_shelter, shelter_filter, validate_shelter_id
 from .base import BaseModel
+from .breed import Breed
+from .payloads import EncodedPayload, collection_versions, payload_cache
+from .repository import breed_lookup_stages, dog_list_filter, get_repository
+from .recommendations import DogRecommender
+from .snapshot import DogSnapshot
+from .status_events import StatusHistory, initial_events, status_event
+from .write_behind import WriteBehindQueue
 
 # Define an Enum for dog status
 class AdoptionStatus(Enum):
@@ -12,16 +21,22 @@ class AdoptionStatus(Enum):
     ADOPTED = 'Adopted'
     PENDING = 'Pending'
 
+# Fields the dog list can be sorted by (prefix with '-' for descending)
+SORT_FIELDS = ('name', 'age', 'intake_date')
+
 class Dog(BaseModel):
     """Dog model for MongoDB"""
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name: str = kwargs.get('name', '')
+        self.shelter_id: str = kwargs.get('shelter_id') or current_shelter()
         self.breed_id: Optional[str] = kwargs.get('breed_id')
         self.age: Optional[int] = kwargs.get('age')
         self.gender: Optional[str] = kwargs.get('gender')
         self.description: Optional[str] = kwargs.get('description')
+        # GeoJSON point where the dog can be met, usually its shelter's coordinates
+        self.location: Optional[Dict[str, Any]] = kwargs.get('location')
         
         # Adoption status
         status_value = kwargs.get('status', AdoptionStatus.AVAILABLE)
@@ -35,8 +50,9 @@ class Dog(BaseModel):
         else:
             self.status = status_value
             
-        self.intake_date: datetime = kwargs.get('intake_date', datetime.utcnow())
-        self.adoption_date: Optional[datetime] = kwargs.get('adoption_date')
+        # Dates are stored as ISO strings
+        self.intake_date: datetime = self.parse_timestamp(kwargs.get('intake_date', datetime.utcnow()))
+        self.adoption_date: Optional[datetime] = self.parse_timestamp(kwargs.get('adoption_date'))
         
         # Validate the data
         self._validate()
@@ -44,6 +60,7 @@ class Dog(BaseModel):
     def _validate(self):
         """Validate dog data"""
         self.name = self.validate_string_length('Dog name', self.name, min_length=2)
+        validate_shelter_id(self.shelter_id)
         
         if self.gender and self.gender not in ['Male', 'Female', 'Unknown']:
             raise ValueError("Gender must be 'Male', 'Female', or 'Unknown'")
@@ -52,181 +69,406 @@ class Dog(BaseModel):
             self.description = self.validate_string_length(
                 'Description', self.description, min_length=10, allow_none=True
             )
+        
+        if self.location is not None:
+            self.location = self.validate_location(self.location)
+    
+    @staticmethod
+    def point(latitude: Any, longitude: Any) -> Dict[str, Any]:
+        """Build a GeoJSON point (longitude first), checking the coordinate ranges"""
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            raise ValueError("Latitude and longitude must be numbers")
+        if not -90 <= latitude <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        if not -180 <= longitude <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
+        return {'type': 'Point', 'coordinates': [longitude, latitude]}
+    
+    @classmethod
+    def validate_location(cls, location: Any) -> Dict[str, Any]:
+        """Validate a GeoJSON point as stored in the 2dsphere-indexed location field"""
+        if not isinstance(location, dict) or location.get('type') != 'Point':
+            raise ValueError("Location must be a GeoJSON Point")
+        coordinates = location.get('coordinates')
+        if not isinstance(coordinates, (list, tuple)) or len(coordinates) != 2:
+            raise ValueError("Location coordinates must be [longitude, latitude]")
+        return cls.point(coordinates[1], coordinates[0])
     
-    def save(self) -> 'Dog':
-        """Save the dog to the database"""
+    def save(self, defer: bool = False, check_conflicts: bool = False) -> 'Dog':
+        """Save the dog to the database
+        
+        Updates only write the fields changed since the dog was loaded, and are skipped when
+        nothing changed. With check_conflicts the update raises ConcurrentModificationError if
+        the dog was saved by someone else in the meantime. With defer=True an update is queued
+        and written in bulk by a background thread instead of blocking on MongoDB; new dogs are
+        always inserted directly. Status changes and new dogs are appended to the status history.
+        """
         self._validate()
-        self.update_timestamp()
+        previous_status = self._clean.get('status') if self._clean else None
         
-        collection = db.get_collection(Config.DOGS_COLLECTION)
+        if self._id and defer:
+            if not self.is_dirty():
+                return self
+            self.update_timestamp()
+            set_fields, unset_fields = self.changes()
+            # The queue stamps updated_at when the batch is written, not now
+            set_fields.pop('updated_at', None)
+            # Raises WriteBehindFull if the queue stays full; payload caches are invalidated on flush
+            write_behind.submit(self._id, {**set_fields, **{key: None for key in unset_fields}},
+                                shard_key=self.shard_key())
+            self.mark_clean()
+            self._record_status_change(previous_status)
+            return self
         
-        # Convert ObjectId breed_id to string if needed
-        doc_data = self.to_dict(include_id=False)
+        collection = db.get_collection(Config.DOGS_COLLECTION)
         
         if self._id:
             # Update existing dog
-            result = collection.update_one(
-                {'_id': self._id},
-                {'$set': doc_data}
-            )
-            if result.modified_count == 0:
-                raise ValueError("Dog not found or no changes made")
+            if not self._update_document(collection, check_conflicts):
+                return self
+            self._record_status_change(previous_status)
         else:
             # Insert new dog
-            result = collection.insert_one(doc_data)
+            self.update_timestamp()
+            result = collection.insert_one(self.to_dict(include_id=False))
             self._id = result.inserted_id
+            self.mark_clean()
+            status_history.record(initial_events(self._document()))
         
+        collection_versions.bump(Config.DOGS_COLLECTION)
         return self
     
+    def _document(self) -> Dict[str, Any]:
+        """The stored fields of the dog, with its _id"""
+        return {**self.to_dict(include_id=False), '_id': self._id}
+    
+    def _record_status_change(self, previous_status: Optional[str]):
+        """Append the transition of a saved update to the status history, if the status changed"""
+        status = self.status.value if self.status else None
+        if previous_status is None or status is None or status == previous_status:
+            return
+        status_history.record([status_event(self._document(), previous_status, status, self.updated_at)])
+    
     def delete(self) -> bool:
         """Delete the dog from the database"""
         if not self._id:
             return False
         
         collection = db.get_collection(Config.DOGS_COLLECTION)
-        result = collection.delete_one({'_id': self._id})
-        return result.deleted_count > 0
+        result = collection.delete_one({'_id': self._id, **self.shard_key()})
+        collection_versions.bump(Config.DOGS_COLLECTION)
+        
+        if result.deleted_count > 0:
+            # Leave a tombstone so incremental sync clients learn about the delete
+            tombstones = db.get_collection(Config.DOG_TOMBSTONES_COLLECTION)
+            tombstones.replace_one(
+                {'_id': self._id},
+                {'_id': self._id, **self.shard_key(), 'deleted_at': datetime.utcnow()},
+                upsert=True
+            )
+            return True
+        return False
     
     @classmethod
     def find_by_id(cls, dog_id: str) -> Optional['Dog']:
         """Find a dog by ID"""
         try:
             object_id = ObjectId(dog_id)
-            collection = db.get_collection(Config.DOGS_COLLECTION)
-            doc = collection.find_one({'_id': object_id})
-            
-            if doc:
-                return cls.from_dict(doc)
-            return None
-        except Exception:
+        except (InvalidId, TypeError):
             return None
+        
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        doc = collection.find_one(shelter_filter({'_id': object_id}), max_time_ms=db.max_time_ms())
+        
+        if doc:
+            return cls.from_dict(doc)
+        return None
     
     @classmethod
     def find_all(cls) -> List['Dog']:
         """Find all dogs"""
-        collection = db.get_collection(Config.DOGS_COLLECTION)
-        docs = collection.find().sort('name', 1)
+        return [cls.from_dict(doc) for doc in get_repository().find_dogs()]
+    
+    @staticmethod
+    def list_filter(status: Optional[AdoptionStatus] = None, breed_id: Optional[str] = None,
+                    min_age: Optional[int] = None, max_age: Optional[int] = None) -> Dict[str, Any]:
+        """Build the query for the dog list filters"""
+        return dog_list_filter(status, breed_id, min_age, max_age)
+    
+    @classmethod
+    def find_with_breed_info(cls, status: Optional[AdoptionStatus] = None, breed_id: Optional[str] = None,
+                             min_age: Optional[int] = None, max_age: Optional[int] = None,
+                             sort: str = 'name') -> List[Dict[str, Any]]:
+        """Find all dogs with breed information using aggregation, optionally filtered and sorted"""
+        if snapshot.enabled and snapshot.ready and is_home_shelter():
+            return snapshot.query(status, breed_id, min_age, max_age, sort)
         
-        return [cls.from_dict(doc) for doc in docs]
+        field = sort.lstrip('-')
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort dogs by '{field}'")
+        
+        return get_repository().find_dogs_with_breed(status, breed_id, min_age, max_age, sort)
     
     @classmethod
-    def find_with_breed_info(cls) -> List[Dict[str, Any]]:
-        """Find all dogs with breed information using aggregation"""
-        collection = db.get_collection(Config.DOGS_COLLECTION)
+    def stats(cls, status: Optional[AdoptionStatus] = None, breed_id: Optional[str] = None,
+              min_age: Optional[int] = None, max_age: Optional[int] = None) -> Dict[str, Any]:
+        """Count dogs by status and breed and summarize ages, for the same filters as the list"""
+        if snapshot.enabled and snapshot.ready and is_home_shelter():
+            return snapshot.stats(status, breed_id, min_age, max_age)
+        
+        result = get_repository().dog_stats(status, breed_id, min_age, max_age)
         
+        breed_names = Breed.names_by_id()
+        by_breed: Dict[str, int] = {}
+        for breed_id_value, count in result['by_breed_id'].items():
+            name = breed_names.get(breed_id_value, 'Unknown')
+            by_breed[name] = by_breed.get(name, 0) + count
+        
+        return {
+            'total': sum(result['by_status'].values()),
+            'by_status': result['by_status'],
+            'by_breed': by_breed,
+            'age': result['age']
+        }
+    
+    @classmethod
+    def find_nearby(cls, latitude: float, longitude: float, radius_km: float,
+                    status: Optional[AdoptionStatus] = AdoptionStatus.AVAILABLE, breed_id: Optional[str] = None,
+                    min_age: Optional[int] = None, max_age: Optional[int] = None,
+                    page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+        """Find dogs within radius_km of a point, nearest first, with breed names, one page at a time
+
+        Unlike the other dog queries this searches every shelter, since adopters look for dogs by
+        distance rather than by shelter.
+        """
+        collection = db.get_collection(Config.DOGS_COLLECTION)
         pipeline = [
             {
-                '$lookup': {
-                    'from': Config.BREEDS_COLLECTION,
-                    'localField': 'breed_id',
-                    'foreignField': '_id',
-                    'as': 'breed_info'
-                }
-            },
-            {
-                '$unwind': {
-                    'path': '$breed_info',
-                    'preserveNullAndEmptyArrays': True
-                }
-            },
-            {
-                '$project': {
-                    '_id': 1,
-                    'name': 1,
-                    'breed': '$breed_info.name',
-                    'age': 1,
-                    'gender': 1,
-                    'description': 1,
-                    'status': 1,
-                    'intake_date': 1,
-                    'adoption_date': 1
+                # Served by the (location 2dsphere, status) index; dogs without a location never match
+                '$geoNear': {
+                    'near': cls.point(latitude, longitude),
+                    'key': 'location',
+                    'distanceField': 'distance',
+                    'maxDistance': radius_km * 1000,
+                    'spherical': True,
+                    'query': dog_list_filter(status, breed_id, min_age, max_age, all_shelters=True)
                 }
             },
-            {
-                '$sort': {'name': 1}
-            }
+            # Dogs of one shelter share its coordinates, so ties are ordered by _id to keep pages stable
+            {'$sort': {'distance': 1, '_id': 1}},
+            {'$skip': (page - 1) * per_page},
+            # One more than a page, to tell whether another page follows
+            {'$limit': per_page + 1},
+            # Join breeds only for the dogs of this page
+            *breed_lookup_stages(('shelter_id', 'location', 'distance'))
         ]
+        docs = list(collection.aggregate(pipeline, maxTimeMS=db.max_time_ms()))
         
-        return list(collection.aggregate(pipeline))
+        return {
+            'dogs': [cls.nearby_item(doc) for doc in docs[:per_page]],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(docs) > per_page
+        }
+    
+    @staticmethod
+    def nearby_item(dog_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Format a dog found by distance for the nearby search"""
+        return {
+            'id': str(dog_data['_id']),
+            'name': dog_data['name'],
+            'breed': dog_data.get('breed', 'Unknown'),
+            'age': dog_data.get('age'),
+            'gender': dog_data.get('gender'),
+            'status': dog_data.get('status'),
+            'shelter_id': dog_data.get('shelter_id'),
+            'location': dog_data.get('location'),
+            'distance_km': round(dog_data['distance'] / 1000, 2)
+        }
     
     @classmethod
     def find_by_id_with_breed_info(cls, dog_id: str) -> Optional[Dict[str, Any]]:
         """Find a dog by ID with breed information"""
         try:
             object_id = ObjectId(dog_id)
-            collection = db.get_collection(Config.DOGS_COLLECTION)
-            
-            pipeline = [
-                {
-                    '$match': {'_id': object_id}
-                },
-                {
-                    '$lookup': {
-                        'from': Config.BREEDS_COLLECTION,
-                        'localField': 'breed_id',
-                        'foreignField': '_id',
-                        'as': 'breed_info'
-                    }
-                },
-                {
-                    '$unwind': {
-                        'path': '$breed_info',
-                        'preserveNullAndEmptyArrays': True
-                    }
-                },
-                {
-                    '$project': {
-                        '_id': 1,
-                        'name': 1,
-                        'breed': '$breed_info.name',
-                        'age': 1,
-                        'gender': 1,
-                        'description': 1,
-                        'status': 1,
-                        'intake_date': 1,
-                        'adoption_date': 1
-                    }
-                }
-            ]
-            
-            result = list(collection.aggregate(pipeline))
-            return result[0] if result else None
-            
-        except Exception:
+        except (InvalidId, TypeError):
             return None
+        
+        return get_repository().find_dog_with_breed(object_id)
+    
+    @staticmethod
+    def list_item(dog_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Format a dog with its breed name for the dog list"""
+        return {
+            'id': str(dog_data['_id']),
+            'name': dog_data['name'],
+            'breed': dog_data.get('breed', 'Unknown')
+        }
+    
+    @staticmethod
+    def detail_item(dog_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Format a dog with its breed name for the dog detail"""
+        return {
+            'id': str(dog_data['_id']),
+            'name': dog_data['name'],
+            'breed': dog_data.get('breed', 'Unknown'),
+            'age': dog_data.get('age'),
+            'description': dog_data.get('description'),
+            'gender': dog_data.get('gender'),
+            'status': dog_data.get('status', 'AVAILABLE')
+        }
+    
+    @classmethod
+    def detail_payload(cls, dog_id: str) -> Optional[EncodedPayload]:
+        """Get the pre-encoded detail record for a dog, or None if it does not exist"""
+        def build() -> Optional[EncodedPayload]:
+            dog_data = cls.find_by_id_with_breed_info(dog_id)
+            if not dog_data:
+                return None
+            
+            return EncodedPayload.from_data(cls.detail_item(dog_data))
+        
+        # The detail embeds the breed name, so a breed write invalidates it too
+        version = (
+            collection_versions.get(Config.DOGS_COLLECTION),
+            collection_versions.get(Config.BREEDS_COLLECTION)
+        )
+        return payload_cache.get_or_build(f'dogs:detail:{current_shelter()}:{dog_id}', version, build)
     
     @classmethod
     def find_by_breed_id(cls, breed_id: str) -> List['Dog']:
         """Find all dogs of a specific breed"""
         try:
             object_id = ObjectId(breed_id)
-            collection = db.get_collection(Config.DOGS_COLLECTION)
-            docs = collection.find({'breed_id': object_id}).sort('name', 1)
-            
-            return [cls.from_dict(doc) for doc in docs]
-        except Exception:
+        except (InvalidId, TypeError):
             return []
+        
+        return [cls.from_dict(doc) for doc in get_repository().find_dogs_by_breed(object_id)]
+    
+    @classmethod
+    def latest_update(cls) -> Optional[datetime]:
+        """Get the most recent updated_at across all dogs"""
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        doc = collection.find_one(shelter_filter({'updated_at': {'$ne': None}}), {'updated_at': 1}, sort=[('updated_at', -1)],
+                                  max_time_ms=db.max_time_ms())
+        return cls.parse_timestamp(doc['updated_at']) if doc else None
+    
+    @classmethod
+    def find_for_export(cls, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Stream every dog field, with the breed name resolved, in batches of raw documents"""
+        # The breed table is small, so resolve names in memory instead of a $lookup per dog
+        breed_names = Breed.names_by_id()
+        
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        # Exports stream for a long time, so they get their own (larger) budget instead of the request's
+        cursor = collection.find(
+            shelter_filter(cls.timestamp_range('updated_at', since, until)),
+            max_time_ms=db.max_time_ms(Config.EXPORT_MAX_TIME_SECONDS)
+        ).batch_size(batch_size)
+        
+        try:
+            batch: List[Dict[str, Any]] = []
+            for doc in cursor:
+                breed_id = doc.get('breed_id')
+                doc['breed'] = breed_names.get(str(breed_id)) if breed_id else None
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            cursor.close()
+    
+    @classmethod
+    def find_changed_since(cls, since: Optional[datetime], after_id: Optional[ObjectId] = None,
+                           limit: int = 500) -> List[Dict[str, Any]]:
+        """Find dogs updated at or after since, oldest first, with breed names resolved
+        
+        Dogs updated at exactly since are only returned if their _id sorts after after_id, so a
+        page can resume in the middle of a bulk write that gave many dogs the same timestamp.
+        """
+        query = cls.timestamp_range('updated_at', since, inclusive=after_id is None)
+        if since is not None and after_id is not None:
+            query = {'$or': [query, {'updated_at': {'$in': [since.isoformat(), since]}, '_id': {'$gt': after_id}}]}
+        query = shelter_filter(query)
+        
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        docs = list(collection.find(query, max_time_ms=db.max_time_ms()).sort([('updated_at', 1), ('_id', 1)]).limit(limit))
+        
+        if docs:
+            breed_names = Breed.names_by_id()
+            for doc in docs:
+                breed_id = doc.get('breed_id')
+                doc['breed'] = breed_names.get(str(breed_id)) if breed_id else None
+        return docs
+    
+    @classmethod
+    def find_deleted_since(cls, since: Optional[datetime], exclude_ids: List[ObjectId] = None,
+                           limit: int = 500) -> List[Dict[str, Any]]:
+        """Find tombstones of dogs deleted at or after since, oldest first"""
+        query: Dict[str, Any] = shelter_filter()
+        if since is not None:
+            query['deleted_at'] = {'$gte': since}
+        if exclude_ids:
+            query['_id'] = {'$nin': exclude_ids}
+        
+        collection = db.get_collection(Config.DOG_TOMBSTONES_COLLECTION)
+        return list(collection.find(query, max_time_ms=db.max_time_ms()).sort([('deleted_at', 1), ('_id', 1)]).limit(limit))
     
     @classmethod
     def count(cls) -> int:
         """Count total number of dogs"""
-        collection = db.get_collection(Config.DOGS_COLLECTION)
-        return collection.count_documents({})
+        return get_repository().count_dogs()
     
     def to_dict(self, include_id: bool = True) -> Dict[str, Any]:
         """Convert dog to dictionary"""
         result = super().to_dict(include_id)
         result.update({
+            'shelter_id': self.shelter_id,
             'name': self.name,
             'breed_id': str(self.breed_id) if self.breed_id else None,
             'age': self.age,
             'gender': self.gender,
             'description': self.description,
+            'location': self.location,
             'status': self.status.value if self.status else None,
             'intake_date': self.intake_date.isoformat() if self.intake_date else None,
             'adoption_date': self.adoption_date.isoformat() if self.adoption_date else None
         })
         return result
     
+    def shard_key(self) -> Dict[str, Any]:
+        """The shelter the dog is stored under (as loaded, in case it is being moved)"""
+        stored = self._clean.get('shelter_id') if self._clean else None
+        return {'shelter_id': stored or self.shelter_id}
+    
     def __repr__(self):
-        return f'<Dog {self.name}, ID: {self.id}, Status: {self.status.value if self.status else "Unknown"}>'
\ No newline at end of file
+        return f'<Dog {self.name}, ID: {self.id}, Status: {self.status.value if self.status else "Unknown"}>'
+
+# Optional in-memory columnar snapshot answering list queries and stats; started when SNAPSHOT_ENABLED is set
+snapshot = DogSnapshot([status.value for status in AdoptionStatus])
+
+# Optional adopter-match scoring over a per-dog feature matrix; started when RECOMMENDATIONS_ENABLED is set
+recommender = DogRecommender([status.value for status in AdoptionStatus], Config.RECOMMENDATION_KEYWORDS)
+
+# Append-only status history with daily rollups, behind /api/stats/timeline
+status_history = StatusHistory(
+    [status.value for status in AdoptionStatus],
+    lambda: db.get_collection(Config.DOG_STATUS_EVENTS_COLLECTION),
+    lambda: db.get_collection(Config.DOG_STATUS_ROLLUPS_COLLECTION)
+)
+
+# Deferred dog updates from Dog.save(defer=True), coalesced per dog and flushed in bulk
+write_behind = WriteBehindQueue(
+    lambda: db.get_collection(Config.DOGS_COLLECTION),
+    max_pending=Config.WRITE_BEHIND_MAX_PENDING,
+    batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=Config.WRITE_BEHIND_FLUSH_SECONDS,
+    enqueue_timeout=Config.WRITE_BEHIND_ENQUEUE_TIMEOUT,
+    on_flush=lambda: collection_versions.bump(Config.DOGS_COLLECTION),
+    timestamp_field='updated_at'
+)
@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+from database import DatabaseBusyError
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+def encode_json(data: Any) -> bytes:
+    """Serialize data to compact JSON bytes"""
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+class EncodedPayload:
+    """A JSON response body encoded once, with gzip and brotli variants"""
+
+    def __init__(self, body: bytes):
+        self.body: bytes = body
+        self.gzip: bytes = gzip.compress(body, compresslevel=6, mtime=0)
+        self.br: Optional[bytes] = brotli.compress(body, quality=5) if brotli else None
+        self.etag: str = hashlib.blake2b(body, digest_size=12).hexdigest()
+
+    @classmethod
+    def from_data(cls, data: Any) -> 'EncodedPayload':
+        """Encode data as JSON and build the compressed variants"""
+        return cls(encode_json(data))
+
+    def select(self, accepted: Iterable[str]) -> Tuple[bytes, Optional[str]]:
+        """Pick the smallest variant the client accepts, returning (body, content_encoding)"""
+        accepted = set(accepted)
+        if self.br is not None and 'br' in accepted:
+            return self.br, 'br'
+        if 'gzip' in accepted:
+            return self.gzip, 'gzip'
+        return self.body, None
+
+class CollectionVersions:
+    """In-process version counters bumped by every write to a collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def get(self, collection_name: str) -> int:
+        """Get the current version of a collection"""
+        return self._versions.get(collection_name, 0)
+
+    def bump(self, collection_name: str) -> int:
+        """Invalidate payloads built from a collection"""
+        with self._lock:
+            version = self._versions.get(collection_name, 0) + 1
+            self._versions[collection_name] = version
+            return version
+
+class PayloadCache:
+    """LRU cache of encoded payloads, tagged with the collection versions they were built from"""
+
+    def __init__(self, max_entries: int = 256, max_age: float = 0, stale_on: Tuple[type, ...] = ()):
+        self.max_entries = max_entries
+        # Writes from other processes do not bump our versions, so optionally cap entry age too
+        self.max_age = max_age
+        # Errors from the builder that are answered with the outdated entry, if there is one
+        self.stale_on = stale_on
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[Any, float, EncodedPayload]]' = OrderedDict()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._stale_hits: int = 0
+
+    def get_or_build(self, key: str, version: Any,
+                     builder: Callable[[], Optional[EncodedPayload]]) -> Optional[EncodedPayload]:
+        """Return the cached payload for key at version, building it on a miss
+
+        If the builder fails with one of the stale_on errors, an outdated entry is served instead.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, built_at, payload = entry
+                if entry_version == version and (not self.max_age or now - built_at < self.max_age):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return payload
+            self._misses += 1
+
+        try:
+            payload = builder()
+        except self.stale_on:
+            if entry is None:
+                raise
+            with self._lock:
+                self._stale_hits += 1
+            return entry[2]
+        if payload is None:
+            return None
+
+        with self._lock:
+            self._entries[key] = (version, now, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return payload
+
+    def clear(self):
+        """Drop every cached payload and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._stale_hits = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'stale_hits': self._stale_hits
+            }
+
+# Shared by the models; configured by init_db
+collection_versions = CollectionVersions()
+# While MongoDB is unreachable, slow or behind an open circuit breaker, serve the last good payload
+payload_cache = PayloadCache(stale_on=(DatabaseBusyError, ConnectionFailure, ExecutionTimeout))
@@ -0,0 +1,299 @@
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import Config
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it recommendations stay disabled
+    np = None
+
+# Relative weight of each preference in the match score
+WEIGHTS = {'age': 1.0, 'gender': 1.0, 'breed': 1.5, 'keywords': 2.0}
+
+NO_CODE = -1
+
+_WORD = re.compile(r'[a-z]+(?:-[a-z]+)*')
+
+def tokenize(text: Optional[str]) -> set:
+    """Lowercase words of a description or keyword query"""
+    return set(_WORD.findall(text.lower())) if text else set()
+
+def count_bits(masks: 'np.ndarray') -> 'np.ndarray':
+    """Count the set bits of each uint64 mask (np.bitwise_count only exists from numpy 2.0)"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    return np.unpackbits(np.ascontiguousarray(masks).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1, dtype=np.uint8)
+
+class DogRecommender:
+    """Ranks dogs for an adopter's preferences from a per-dog feature matrix
+
+    Each dog has a fixed row holding its age, gender, breed and status codes and a bitmask of the
+    description keywords it mentions. Rows are updated in place from the incremental sync API,
+    so a refresh costs as much as the changes since the previous one.
+    """
+
+    # Feature columns: (attribute, dtype, value of an empty row)
+    COLUMNS = (
+        ('ages', 'float32', float('nan')),
+        ('genders', 'int16', NO_CODE),
+        ('breeds', 'int32', NO_CODE),
+        ('statuses', 'int8', NO_CODE),
+        ('keyword_masks', 'uint64', 0),
+        ('active', 'bool', False)
+    )
+
+    def __init__(self, status_values: List[str], keywords: Iterable[str]):
+        self.enabled = False
+        self.refresh_interval: float = 5.0
+        self.page_size: int = 10000
+
+        self._status_codes = {value: code for code, value in enumerate(status_values)}
+        self._gender_codes: Dict[str, int] = {}
+        self._breed_codes: Dict[str, int] = {}
+        self._breed_names: List[str] = []
+        # Keywords beyond the 64 bits of the mask are ignored
+        self.keywords: List[str] = [keyword.strip().lower() for keyword in keywords if keyword.strip()][:64]
+        self._keyword_bits = {keyword: 1 << bit for bit, keyword in enumerate(self.keywords)}
+
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._allocate(0)
+
+        self._token = None
+        self._loaded = False
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.refreshed_at: Optional[float] = None
+        self.last_refresh_ms: Optional[float] = None
+        self.refresh_errors: int = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial load has finished"""
+        return self._loaded
+
+    def _allocate(self, capacity: int):
+        """Create empty feature columns"""
+        if np is not None:
+            for name, dtype, fill in self.COLUMNS:
+                setattr(self, name, np.full(capacity, fill, dtype=dtype))
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.names: List[Optional[str]] = [None] * capacity
+
+    def _grow(self, needed: int):
+        """At least double the capacity of every column once needed rows no longer fit"""
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        for name, dtype, fill in self.COLUMNS:
+            grown = np.full(new_capacity, fill, dtype=dtype)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+        self.ids.extend([None] * (new_capacity - capacity))
+        self.names.extend([None] * (new_capacity - capacity))
+
+    def start(self, refresh_interval: float = 5.0, page_size: int = 10000):
+        """Enable recommendations and keep the feature matrix refreshed from a background thread"""
+        if np is None:
+            logging.warning("numpy is not installed; dog recommendations stay disabled")
+            return
+
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.enabled = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='dog-recommender', daemon=True)
+            self._thread.start()
+
+    def mark_stale(self):
+        """Refresh as soon as possible, e.g. after a change stream event"""
+        self._wake.set()
+
+    def _run(self):
+        """Refresh loop"""
+        while self.enabled:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                logging.error(f"Failed to refresh dog recommendations: {e}")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def refresh(self):
+        """Apply every change since the last refresh (a full load the first time)"""
+        # Imported here because dog_sync builds on the models package
+        from dog_sync import SyncToken, changes_since
+
+        started = time.perf_counter()
+        while True:
+            result = changes_since(self._token, self.page_size, timedelta(days=Config.TOMBSTONE_TTL_DAYS))
+            if result['reset']:
+                # Our watermark is older than the tombstones: start over with a full load
+                with self._lock:
+                    self._rows, self._free, self._size = {}, [], 0
+                    self._allocate(0)
+                self._token = None
+                continue
+
+            self.apply(result['changes'], result['deleted'])
+            self._token = SyncToken.decode(result['next'])
+            if not result['has_more']:
+                break
+
+        self._loaded = True
+        self.refreshed_at = time.time()
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    def _code(self, codes: Dict[str, int], value: Optional[str]) -> int:
+        """Get the code of a categorical value, registering it on first sight"""
+        if not value:
+            return NO_CODE
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def keyword_mask(self, words: Iterable[str]) -> int:
+        """Bitmask of the known keywords among words"""
+        mask = 0
+        for word in words:
+            mask |= self._keyword_bits.get(word, 0)
+        return mask
+
+    def apply(self, changes: List[Dict[str, Any]], deleted: Iterable[str] = ()):
+        """Write changed dogs into their rows (new dogs take a free or new row) and free deleted rows"""
+        deleted = set(deleted)
+        changes = [change for change in changes if change['id'] not in deleted]
+        with self._lock:
+            for dog_id in deleted:
+                row = self._rows.pop(dog_id, None)
+                if row is not None:
+                    self.active[row] = False
+                    self.ids[row] = self.names[row] = None
+                    self._free.append(row)
+
+            rows = []
+            for change in changes:
+                row = self._rows.get(change['id'])
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = self._size
+                        self._size += 1
+                    self._rows[change['id']] = row
+                rows.append(row)
+            if not rows:
+                return
+
+            self._grow(self._size)
+            rows = np.array(rows, dtype=np.int64)
+
+            ages = [change.get('age') for change in changes]
+            self.ages[rows] = [age if isinstance(age, (int, float)) else np.nan for age in ages]
+            self.genders[rows] = [self._code(self._gender_codes, change.get('gender')) for change in changes]
+            self.statuses[rows] = [self._status_codes.get(change.get('status'), NO_CODE) for change in changes]
+            self.keyword_masks[rows] = [self.keyword_mask(tokenize(change.get('description'))) for change in changes]
+            breed_codes = []
+            for change in changes:
+                code = self._code(self._breed_codes, change.get('breed_id'))
+                if code == len(self._breed_names):
+                    self._breed_names.append(change.get('breed') or 'Unknown')
+                elif code != NO_CODE and change.get('breed'):
+                    self._breed_names[code] = change['breed']
+                breed_codes.append(code)
+            self.breeds[rows] = breed_codes
+            self.active[rows] = True
+            for row, change in zip(rows.tolist(), changes):
+                self.ids[row] = change['id']
+                self.names[row] = change.get('name')
+
+    def recommend(self, status: Optional[str] = 'Available', min_age: Optional[int] = None,
+                  max_age: Optional[int] = None, gender: Optional[str] = None,
+                  breed_ids: Iterable[str] = (), keywords: Iterable[str] = (),
+                  limit: int = 10) -> List[Dict[str, Any]]:
+        """Score every dog against the preferences and return the best matches, best first
+
+        status is a hard filter; the other preferences add to a score between 0 and 1. Dogs
+        outside the age range lose score with their distance from it.
+        """
+        keyword_mask = self.keyword_mask(word for keyword in keywords for word in tokenize(keyword))
+
+        with self._lock:
+            # Codes are registered by apply(), so look them up under the same lock
+            breed_codes = [self._breed_codes[breed_id] for breed_id in breed_ids if breed_id in self._breed_codes]
+            size = self._size
+            candidates = self.active[:size].copy()
+            if status is not None:
+                candidates &= self.statuses[:size] == self._status_codes.get(status, NO_CODE - 1)
+
+            scores = np.zeros(size, dtype=np.float32)
+            total_weight = 0.0
+            if min_age is not None or max_age is not None:
+                ages = self.ages[:size]
+                low = -np.inf if min_age is None else min_age
+                high = np.inf if max_age is None else max_age
+                distance = np.maximum(low - ages, 0) + np.maximum(ages - high, 0)
+                # Missing ages give nan and score nothing
+                scores += WEIGHTS['age'] * np.nan_to_num(1 / (1 + distance), nan=0.0)
+                total_weight += WEIGHTS['age']
+            if gender:
+                scores += WEIGHTS['gender'] * (self.genders[:size] == self._gender_codes.get(gender, NO_CODE - 1))
+                total_weight += WEIGHTS['gender']
+            if breed_ids:
+                scores += WEIGHTS['breed'] * np.isin(self.breeds[:size], breed_codes)
+                total_weight += WEIGHTS['breed']
+            if keyword_mask:
+                matched = count_bits(self.keyword_masks[:size] & np.uint64(keyword_mask))
+                scores += WEIGHTS['keywords'] * matched / bin(keyword_mask).count('1')
+                total_weight += WEIGHTS['keywords']
+            if total_weight:
+                scores /= total_weight
+
+            candidate_rows = np.flatnonzero(candidates)
+            if len(candidate_rows) == 0 or limit <= 0:
+                return []
+            candidate_scores = scores[candidate_rows]
+            k = min(limit, len(candidate_rows))
+            # argpartition finds the top k in linear time; only those k are sorted
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top], kind='stable')]
+            rows = candidate_rows[top]
+
+            status_values = list(self._status_codes)
+            gender_values = list(self._gender_codes)
+            return [
+                {
+                    'id': self.ids[row],
+                    'name': self.names[row],
+                    'breed': self._breed_names[self.breeds[row]] if self.breeds[row] != NO_CODE else 'Unknown',
+                    'age': None if np.isnan(self.ages[row]) else int(self.ages[row]),
+                    'gender': gender_values[self.genders[row]] if self.genders[row] != NO_CODE else None,
+                    'status': status_values[self.statuses[row]] if self.statuses[row] != NO_CODE else None,
+                    'score': round(float(scores[row]), 4)
+                }
+                for row in rows.tolist()
+            ]
+
+    def info(self) -> Dict[str, Any]:
+        """Get recommender state for /metrics"""
+        return {
+            'enabled': self.enabled,
+            'ready': self.ready,
+            'rows': len(self._rows),
+            'capacity': len(self.ids),
+            'keywords': len(self.keywords),
+            'refreshed_at': self.refreshed_at,
+            'last_refresh_ms': self.last_refresh_ms,
+            'refresh_errors': self.refresh_errors
+        }
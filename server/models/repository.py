@@ -0,0 +1,394 @@
+"""Storage backends behind the Dog and Breed finders
+
+MongoRepository is the default. SQLiteRepository answers the same finders from an embedded,
+read-only SQLite file kept up to date by utils/sync_sqlite.py, for edge nodes without MongoDB.
+Writes always go to MongoDB through the models. Dog finders only see the current shelter.
+"""
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from database import db
+from config import Config
+from tenancy import current_shelter, shelter_filter
+
+# Columns of the dog list and detail, in the shape of the MongoDB breed join
+DOG_FIELDS = ('name', 'age', 'gender', 'description', 'status', 'intake_date', 'adoption_date')
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS breeds (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS dogs (
+    id TEXT PRIMARY KEY,
+    shelter_id TEXT,
+    name TEXT NOT NULL,
+    breed_id TEXT,
+    age INTEGER,
+    gender TEXT,
+    description TEXT,
+    status TEXT,
+    intake_date TEXT,
+    adoption_date TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Created after SQLITE_SCHEMA (and after files from before shelters gained the shelter_id column)
+SQLITE_INDEXES = """
+DROP INDEX IF EXISTS dogs_name;
+DROP INDEX IF EXISTS dogs_breed_name;
+DROP INDEX IF EXISTS dogs_status_name;
+DROP INDEX IF EXISTS dogs_age;
+CREATE INDEX IF NOT EXISTS dogs_shelter_name ON dogs (shelter_id, name);
+CREATE INDEX IF NOT EXISTS dogs_shelter_breed_name ON dogs (shelter_id, breed_id, name);
+CREATE INDEX IF NOT EXISTS dogs_shelter_status_name ON dogs (shelter_id, status, name);
+CREATE INDEX IF NOT EXISTS dogs_shelter_age ON dogs (shelter_id, age);
+CREATE INDEX IF NOT EXISTS breeds_name ON breeds (name);
+"""
+
+def breed_lookup_stages(extra_fields: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """Aggregation stages joining the breed name onto each dog, keeping the list fields and extra_fields"""
+    return [
+        {
+            # to_dict() stores breed_id as a string; convert it so the join matches breed _ids
+            '$addFields': {
+                'breed_id': {
+                    '$convert': {'input': '$breed_id', 'to': 'objectId', 'onError': '$breed_id', 'onNull': None}
+                }
+            }
+        },
+        {
+            '$lookup': {
+                'from': Config.BREEDS_COLLECTION,
+                'localField': 'breed_id',
+                'foreignField': '_id',
+                'as': 'breed_info'
+            }
+        },
+        {
+            '$unwind': {
+                'path': '$breed_info',
+                'preserveNullAndEmptyArrays': True
+            }
+        },
+        {
+            '$project': {
+                '_id': 1,
+                'name': 1,
+                'breed': '$breed_info.name',
+                'age': 1,
+                'gender': 1,
+                'description': 1,
+                'status': 1,
+                'intake_date': 1,
+                'adoption_date': 1,
+                **{field: 1 for field in extra_fields}
+            }
+        }
+    ]
+
+def dog_list_filter(status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                    max_age: Optional[int] = None, all_shelters: bool = False) -> Dict[str, Any]:
+    """Build the MongoDB query for the dog list filters, in the current shelter unless all_shelters"""
+    query: Dict[str, Any] = {} if all_shelters else shelter_filter()
+    if status is not None:
+        query['status'] = status.value
+    if breed_id is not None:
+        # breed_id may be stored as a string or an ObjectId
+        candidates: List[Any] = [breed_id]
+        if ObjectId.is_valid(breed_id):
+            candidates.append(ObjectId(breed_id))
+        query['breed_id'] = {'$in': candidates}
+    if min_age is not None or max_age is not None:
+        query['age'] = {}
+        if min_age is not None:
+            query['age']['$gte'] = min_age
+        if max_age is not None:
+            query['age']['$lte'] = max_age
+    return query
+
+def open_sqlite(path: str, readonly: bool = True) -> sqlite3.Connection:
+    """Open a SQLite dog database; the writer switches it to WAL so readers never block it"""
+    if readonly:
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        connection.execute('PRAGMA query_only = ON')
+        connection.execute('PRAGMA mmap_size = 268435456')
+    else:
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.executescript(SQLITE_SCHEMA)
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(dogs)')}
+        if 'shelter_id' not in columns:
+            # Copies made before shelters: add the column and drop the token so the next sync refills it
+            with connection:
+                connection.execute('ALTER TABLE dogs ADD COLUMN shelter_id TEXT')
+                connection.execute('DELETE FROM sync_state')
+        connection.executescript(SQLITE_INDEXES)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+class Repository(ABC):
+    """Read side of the Dog and Breed models"""
+
+    name = 'base'
+
+    @abstractmethod
+    def find_dogs(self) -> List[Dict[str, Any]]:
+        """Get every dog document, sorted by name"""
+
+    @abstractmethod
+    def find_dogs_with_breed(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                             max_age: Optional[int] = None, sort: str = 'name') -> List[Dict[str, Any]]:
+        """Get the filtered dog list with breed names, sorted by a SORT_FIELDS key (prefix '-' for descending)"""
+
+    @abstractmethod
+    def find_dog_with_breed(self, dog_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """Get one dog with its breed name"""
+
+    @abstractmethod
+    def find_dogs_by_breed(self, breed_id: ObjectId) -> List[Dict[str, Any]]:
+        """Get the dog documents of a breed, sorted by name"""
+
+    @abstractmethod
+    def count_dogs(self) -> int:
+        """Count every dog"""
+
+    @abstractmethod
+    def dog_stats(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                  max_age: Optional[int] = None) -> Dict[str, Any]:
+        """Count the filtered dogs by status and by breed_id (as a string) and get their age min, max and mean"""
+
+    @abstractmethod
+    def find_breeds(self) -> List[Dict[str, Any]]:
+        """Get every breed document, sorted by name"""
+
+    @abstractmethod
+    def count_breeds(self) -> int:
+        """Count every breed"""
+
+class MongoRepository(Repository):
+    """Finders backed by the MongoDB collections"""
+
+    name = 'mongodb'
+
+    def find_dogs(self) -> List[Dict[str, Any]]:
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        return list(collection.find(shelter_filter(), max_time_ms=db.max_time_ms()).sort('name', 1))
+
+    def find_dogs_with_breed(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                             max_age: Optional[int] = None, sort: str = 'name') -> List[Dict[str, Any]]:
+        field, direction = sort.lstrip('-'), -1 if sort.startswith('-') else 1
+        sort_spec = {field: direction}
+        if field != 'name':
+            sort_spec['name'] = 1
+
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        pipeline = [{'$match': dog_list_filter(status, breed_id, min_age, max_age)}]
+        if field == 'name':
+            # Sort before the join so the name index can be used
+            pipeline.append({'$sort': sort_spec})
+            pipeline.extend(breed_lookup_stages())
+        else:
+            pipeline.extend(breed_lookup_stages())
+            pipeline.append({'$sort': sort_spec})
+
+        return list(collection.aggregate(pipeline, maxTimeMS=db.max_time_ms()))
+
+    def find_dog_with_breed(self, dog_id: ObjectId) -> Optional[Dict[str, Any]]:
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        pipeline = [{'$match': shelter_filter({'_id': dog_id})}] + breed_lookup_stages()
+
+        result = list(collection.aggregate(pipeline, maxTimeMS=db.max_time_ms()))
+        return result[0] if result else None
+
+    def find_dogs_by_breed(self, breed_id: ObjectId) -> List[Dict[str, Any]]:
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        # breed_id may be stored as a string or an ObjectId
+        query = shelter_filter({'breed_id': {'$in': [breed_id, str(breed_id)]}})
+        return list(collection.find(query, max_time_ms=db.max_time_ms()).sort('name', 1))
+
+    def count_dogs(self) -> int:
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        return collection.count_documents(shelter_filter(), maxTimeMS=db.max_time_ms())
+
+    def dog_stats(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                  max_age: Optional[int] = None) -> Dict[str, Any]:
+        collection = db.get_collection(Config.DOGS_COLLECTION)
+        pipeline = [
+            {'$match': dog_list_filter(status, breed_id, min_age, max_age)},
+            {
+                '$facet': {
+                    'by_status': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+                    'by_breed': [{'$group': {'_id': {'$toString': '$breed_id'}, 'count': {'$sum': 1}}}],
+                    'age': [
+                        {'$match': {'age': {'$type': 'number'}}},
+                        {'$group': {
+                            '_id': None,
+                            'min': {'$min': '$age'},
+                            'max': {'$max': '$age'},
+                            'mean': {'$avg': '$age'}
+                        }}
+                    ]
+                }
+            }
+        ]
+        result = next(collection.aggregate(pipeline, maxTimeMS=db.max_time_ms()))
+        age = result['age'][0] if result['age'] else {}
+        return {
+            'by_status': {group['_id']: group['count'] for group in result['by_status']},
+            'by_breed_id': {group['_id']: group['count'] for group in result['by_breed']},
+            'age': {'min': age.get('min'), 'max': age.get('max'), 'mean': age.get('mean')}
+        }
+
+    def find_breeds(self) -> List[Dict[str, Any]]:
+        collection = db.get_collection(Config.BREEDS_COLLECTION)
+        return list(collection.find(max_time_ms=db.max_time_ms()).sort('name', 1))
+
+    def count_breeds(self) -> int:
+        collection = db.get_collection(Config.BREEDS_COLLECTION)
+        return collection.count_documents({}, maxTimeMS=db.max_time_ms())
+
+class SQLiteRepository(Repository):
+    """Read-only finders backed by an embedded SQLite file, one connection per thread"""
+
+    name = 'sqlite'
+
+    # Fixed SQL text with bound parameters, so each connection's statement cache reuses the prepared plans
+    SELECT_DOGS = 'SELECT * FROM dogs WHERE shelter_id = ? ORDER BY name'
+    SELECT_DOGS_WITH_BREED = (
+        'SELECT dogs.id, dogs.name, breeds.name AS breed, dogs.age, dogs.gender, dogs.description, '
+        'dogs.status, dogs.intake_date, dogs.adoption_date '
+        'FROM dogs LEFT JOIN breeds ON breeds.id = dogs.breed_id WHERE dogs.shelter_id = ?'
+    )
+    SELECT_DOGS_BY_BREED = 'SELECT * FROM dogs WHERE shelter_id = ? AND breed_id = ? ORDER BY name'
+    SELECT_STATUS_COUNTS = 'SELECT dogs.status, COUNT(*) FROM dogs WHERE dogs.shelter_id = ?{} GROUP BY dogs.status'
+    SELECT_BREED_COUNTS = 'SELECT dogs.breed_id, COUNT(*) FROM dogs WHERE dogs.shelter_id = ?{} GROUP BY dogs.breed_id'
+    SELECT_AGE_SUMMARY = (
+        'SELECT MIN(dogs.age), MAX(dogs.age), AVG(dogs.age) FROM dogs '
+        'WHERE dogs.shelter_id = ? AND dogs.age IS NOT NULL{}'
+    )
+    SORT_COLUMNS = {'name': 'dogs.name', 'age': 'dogs.age', 'intake_date': 'dogs.intake_date'}
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's read-only connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = open_sqlite(self.path)
+        return connection
+
+    @staticmethod
+    def _document(row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a dogs or breeds row to the document MongoDB would return"""
+        doc = dict(row)
+        doc['_id'] = ObjectId(doc.pop('id'))
+        return doc
+
+    def find_dogs(self) -> List[Dict[str, Any]]:
+        return [self._document(row) for row in self._connection().execute(self.SELECT_DOGS, (current_shelter(),))]
+
+    @staticmethod
+    def _filter(status, breed_id: Optional[str], min_age: Optional[int],
+                max_age: Optional[int]) -> Tuple[str, List[Any]]:
+        """SQL conditions (to append after the shelter condition) and parameters of the dog list filters"""
+        conditions: List[str] = []
+        params: List[Any] = [current_shelter()]
+        if status is not None:
+            conditions.append('dogs.status = ?')
+            params.append(status.value)
+        if breed_id is not None:
+            conditions.append('dogs.breed_id = ?')
+            params.append(breed_id)
+        if min_age is not None:
+            conditions.append('dogs.age >= ?')
+            params.append(min_age)
+        if max_age is not None:
+            conditions.append('dogs.age <= ?')
+            params.append(max_age)
+        return ''.join(f' AND {condition}' for condition in conditions), params
+
+    def find_dogs_with_breed(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                             max_age: Optional[int] = None, sort: str = 'name') -> List[Dict[str, Any]]:
+        conditions, params = self._filter(status, breed_id, min_age, max_age)
+        field = sort.lstrip('-')
+        order = f"{self.SORT_COLUMNS[field]} {'DESC' if sort.startswith('-') else 'ASC'}"
+        if field != 'name':
+            order += ', dogs.name ASC'
+
+        sql = self.SELECT_DOGS_WITH_BREED + conditions + ' ORDER BY ' + order
+
+        rows = self._connection().execute(sql, params)
+        return [{'_id': row['id'], 'breed': row['breed'], **{key: row[key] for key in DOG_FIELDS}} for row in rows]
+
+    def find_dog_with_breed(self, dog_id: ObjectId) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            self.SELECT_DOGS_WITH_BREED + ' AND dogs.id = ?', (current_shelter(), str(dog_id))
+        ).fetchone()
+        if row is None:
+            return None
+        return {'_id': row['id'], 'breed': row['breed'], **{key: row[key] for key in DOG_FIELDS}}
+
+    def find_dogs_by_breed(self, breed_id: ObjectId) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(self.SELECT_DOGS_BY_BREED, (current_shelter(), str(breed_id)))
+        return [self._document(row) for row in rows]
+
+    def count_dogs(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM dogs WHERE shelter_id = ?', (current_shelter(),)).fetchone()[0]
+
+    def dog_stats(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+                  max_age: Optional[int] = None) -> Dict[str, Any]:
+        conditions, params = self._filter(status, breed_id, min_age, max_age)
+        connection = self._connection()
+        by_status = connection.execute(self.SELECT_STATUS_COUNTS.format(conditions), params).fetchall()
+        by_breed = connection.execute(self.SELECT_BREED_COUNTS.format(conditions), params).fetchall()
+        age_min, age_max, age_mean = connection.execute(self.SELECT_AGE_SUMMARY.format(conditions), params).fetchone()
+        return {
+            'by_status': {row[0]: row[1] for row in by_status},
+            'by_breed_id': {row[0]: row[1] for row in by_breed},
+            'age': {'min': age_min, 'max': age_max, 'mean': age_mean}
+        }
+
+    def find_breeds(self) -> List[Dict[str, Any]]:
+        rows = self._connection().execute('SELECT * FROM breeds ORDER BY name')
+        return [self._document(row) for row in rows]
+
+    def count_breeds(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM breeds').fetchone()[0]
+
+_repository: Repository = MongoRepository()
+
+def get_repository() -> Repository:
+    """Get the backend the model finders read from"""
+    return _repository
+
+def set_repository(repository: Repository):
+    """Switch the backend the model finders read from"""
+    global _repository
+    _repository = repository
+
+def configure_repository(config: Config) -> Repository:
+    """Select the backend named by REPOSITORY_BACKEND"""
+    if config.REPOSITORY_BACKEND == 'sqlite':
+        set_repository(SQLiteRepository(config.SQLITE_PATH))
+    elif config.REPOSITORY_BACKEND == 'mongodb':
+        set_repository(MongoRepository())
+    else:
+        raise ValueError(f"Unknown REPOSITORY_BACKEND '{config.REPOSITORY_BACKEND}'")
+    return _repository
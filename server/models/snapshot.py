@@ -0,0 +1,402 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from .snapshot_file import StringHeap, read_file, write_file
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it the snapshot stays disabled
+    np = None
+
+# Sentinels for missing values in the numeric columns
+NO_AGE = -1
+NO_CODE = -1
+NO_TIMESTAMP = -(2 ** 63)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _to_epoch_us(value: Optional[str]) -> int:
+    """Convert an ISO timestamp to microseconds since the epoch"""
+    if not value:
+        return NO_TIMESTAMP
+    delta = datetime.fromisoformat(value) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+class _Columns:
+    """One immutable version of the columnar dog data"""
+
+    FIELDS = (
+        'ids', 'names', 'breed_codes', 'ages', 'statuses', 'genders', 'descriptions',
+        'intake', 'intake_dates', 'adoption_dates'
+    )
+
+    # Lookup and ordering indexes, derived from the fields but stored in snapshot files
+    INDEXES = ('id_order', 'sorted_ids', 'name_order')
+
+    def __init__(self, ids, names, breed_codes, ages, statuses, genders, descriptions,
+                 intake, intake_dates, adoption_dates, id_order=None, sorted_ids=None, name_order=None):
+        # String fields are object arrays, or StringHeaps when mapped from a snapshot file
+        self.ids = ids                    # S24 ObjectId hex strings
+        self.names = names
+        self.breed_codes = breed_codes    # int32 index into DogSnapshot breed tables
+        self.ages = ages                  # int16, NO_AGE when missing
+        self.statuses = statuses          # int8 index into the status values
+        self.genders = genders
+        self.descriptions = descriptions
+        self.intake = intake              # int64 epoch microseconds, for sorting
+        self.intake_dates = intake_dates  # ISO strings, for output
+        self.adoption_dates = adoption_dates
+
+        self.size = len(ids)
+        # Lookup by id, and the default (name) ordering
+        self.id_order = id_order if id_order is not None else np.argsort(ids, kind='stable')
+        self.sorted_ids = sorted_ids if sorted_ids is not None else ids[self.id_order]
+        # Sorting fixed-width unicode is several times faster than sorting Python objects
+        self.name_order = name_order if name_order is not None else np.argsort(names.astype(str), kind='stable')
+
+    def field(self, name: str) -> 'np.ndarray':
+        """Get a field as a numpy array, decoding mapped strings"""
+        values = getattr(self, name)
+        return values.to_array() if isinstance(values, StringHeap) else values
+
+    def take(self, name: str, order) -> List[Any]:
+        """Get the values of a field at the given rows"""
+        values = getattr(self, name)
+        return values.take(order) if isinstance(values, StringHeap) else values[order].tolist()
+
+    def positions(self, ids) -> 'np.ndarray':
+        """Get the row of each id, or -1 for ids that are not in the snapshot"""
+        if self.size == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        index = np.clip(np.searchsorted(self.sorted_ids, ids), 0, self.size - 1)
+        return np.where(self.sorted_ids[index] == ids, self.id_order[index], -1)
+
+class DogSnapshot:
+    """In-memory columnar copy of the dogs collection, queried with vectorized masks"""
+
+    def __init__(self, status_values: List[str]):
+        self.enabled = False
+        self.refresh_interval: float = 5.0
+        self.page_size: int = 10000
+
+        self._status_values = list(status_values)
+        self._status_codes = {value: code for code, value in enumerate(self._status_values)}
+        self._breed_codes: Dict[str, int] = {}
+        self._breed_names: List[str] = []
+
+        self._columns: Optional[_Columns] = None
+        self._token = None
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.refreshed_at: Optional[float] = None
+        self.last_refresh_ms: Optional[float] = None
+        self.refresh_errors: int = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial load has finished"""
+        return self._columns is not None
+
+    def start(self, refresh_interval: float = 5.0, page_size: int = 10000,
+              path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Enable the snapshot and keep it refreshed from a background thread
+
+        If path names a snapshot file it is mapped first, so the worker is ready immediately
+        and only fetches deltas from MongoDB; its metadata is returned.
+        """
+        if np is None:
+            logging.warning("numpy is not installed; the in-memory dog snapshot stays disabled")
+            return None
+
+        metadata = None
+        if path and os.path.exists(path):
+            try:
+                metadata = self.load(path)
+                logging.info(f"Mapped dog snapshot {path} ({self._columns.size} dogs)")
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Ignoring dog snapshot file {path}: {e}")
+
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.enabled = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='dog-snapshot', daemon=True)
+            self._thread.start()
+        return metadata
+
+    def save(self, path: str, breeds: Optional[List[Dict[str, Any]]] = None):
+        """Write the current snapshot, and optionally the breed table, to a snapshot file"""
+        with self._refresh_lock:
+            columns = self._columns
+            if columns is None:
+                raise RuntimeError("The dog snapshot has not been loaded")
+
+            fields = {}
+            for name in _Columns.FIELDS + _Columns.INDEXES:
+                values = getattr(columns, name)
+                if not isinstance(values, StringHeap) and values.dtype == object:
+                    values = StringHeap.from_values(values)
+                fields[name] = values
+
+            write_file(path, {
+                'token': self._token.encode() if self._token else None,
+                'status_values': self._status_values,
+                'breed_ids': sorted(self._breed_codes, key=self._breed_codes.get),
+                'breed_names': self._breed_names,
+                'breeds': breeds,
+                'written_at': time.time()
+            }, fields)
+
+    def load(self, path: str) -> Dict[str, Any]:
+        """Map a snapshot file written by save(), returning its metadata
+
+        Raises ValueError if the file cannot be used; later refreshes only fetch the changes
+        made since the file was written.
+        """
+        metadata, fields = read_file(path)
+        if metadata['status_values'] != self._status_values:
+            raise ValueError(f"{path} was written for different adoption statuses")
+
+        with self._refresh_lock:
+            self._breed_names = list(metadata['breed_names'])
+            self._breed_codes = {breed_id: code for code, breed_id in enumerate(metadata['breed_ids'])}
+            self._token = self._decode(metadata['token']) if metadata['token'] else None
+            self._columns = _Columns(**fields)
+            self.refreshed_at = metadata['written_at']
+        return metadata
+
+    def mark_stale(self):
+        """Refresh as soon as possible, e.g. after a change stream event"""
+        self._wake.set()
+
+    def _run(self):
+        """Refresh loop"""
+        while self.enabled:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                logging.error(f"Failed to refresh the dog snapshot: {e}")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def refresh(self):
+        """Apply every change since the last refresh (a full load the first time)"""
+        # Imported here because dog_sync builds on the models package
+        from dog_sync import changes_since
+
+        with self._refresh_lock:
+            started = time.perf_counter()
+            token = self._token
+            # Requests keep reading the current columns until the new version is swapped in
+            columns = self._columns
+            changes: Dict[str, Dict[str, Any]] = {}
+            deleted: set = set()
+
+            while True:
+                result = changes_since(token, self.page_size, timedelta(days=Config.TOMBSTONE_TTL_DAYS))
+                if result['reset']:
+                    # Our watermark is older than the tombstones: start over with a full load
+                    token, columns, changes, deleted = None, None, {}, set()
+                    continue
+
+                for change in result['changes']:
+                    changes[change['id']] = change
+                deleted.update(result['deleted'])
+                token = self._decode(result['next'])
+                if not result['has_more']:
+                    break
+
+            if changes or deleted or columns is None:
+                self._columns = self._apply(columns, list(changes.values()), deleted)
+            self._refresh_breed_names()
+            self._token = token
+            self.refreshed_at = time.time()
+            self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def _decode(token: str):
+        from dog_sync import SyncToken
+        return SyncToken.decode(token)
+
+    def _refresh_breed_names(self):
+        """Reload the names of the known breeds, so renamed breeds are picked up"""
+        from .breed import Breed
+        names = Breed.names_by_id()
+        # None for breeds that no longer exist, which the $lookup would not find either
+        self._breed_names = [names.get(breed_id) for breed_id in sorted(self._breed_codes, key=self._breed_codes.get)]
+
+    def _breed_code(self, breed_id: Optional[str], breed_name: Optional[str]) -> int:
+        """Get the code of a breed, registering it on first sight"""
+        if not breed_id:
+            return NO_CODE
+        code = self._breed_codes.get(breed_id)
+        if code is None:
+            code = len(self._breed_names)
+            self._breed_codes[breed_id] = code
+            self._breed_names.append(breed_name or 'Unknown')
+        return code
+
+    def _build_rows(self, changes: List[Dict[str, Any]]) -> Dict[str, 'np.ndarray']:
+        """Convert changed dogs into column arrays"""
+        ages = [change.get('age') for change in changes]
+        return {
+            'ids': np.array([change['id'] for change in changes], dtype='S24'),
+            'names': np.array([change.get('name') or '' for change in changes], dtype=object),
+            'breed_codes': np.array(
+                [self._breed_code(change.get('breed_id'), change.get('breed')) for change in changes],
+                dtype=np.int32
+            ),
+            'ages': np.array([age if isinstance(age, int) else NO_AGE for age in ages], dtype=np.int16),
+            'statuses': np.array(
+                [self._status_codes.get(change.get('status'), NO_CODE) for change in changes], dtype=np.int8
+            ),
+            'genders': np.array([change.get('gender') for change in changes], dtype=object),
+            'descriptions': np.array([change.get('description') for change in changes], dtype=object),
+            'intake': np.array([_to_epoch_us(change.get('intake_date')) for change in changes], dtype=np.int64),
+            'intake_dates': np.array([change.get('intake_date') for change in changes], dtype=object),
+            'adoption_dates': np.array([change.get('adoption_date') for change in changes], dtype=object)
+        }
+
+    def _apply(self, columns: Optional[_Columns], changes: List[Dict[str, Any]], deleted: set) -> _Columns:
+        """Build a new column version with changes applied and deleted dogs removed"""
+        changes = [change for change in changes if change['id'] not in deleted]
+        rows = self._build_rows(changes)
+
+        if columns is None:
+            return _Columns(**rows)
+
+        # Updated dogs are overwritten in place (on copies), new dogs are appended
+        positions = columns.positions(rows['ids'])
+        updated = positions >= 0
+        keep = np.ones(columns.size, dtype=bool)
+        if deleted:
+            deleted_positions = columns.positions(np.array(sorted(deleted), dtype='S24'))
+            keep[deleted_positions[deleted_positions >= 0]] = False
+
+        merged = {}
+        for field in _Columns.FIELDS:
+            values = columns.field(field).copy()
+            values[positions[updated]] = rows[field][updated]
+            merged[field] = np.concatenate([values[keep], rows[field][~updated]])
+        return _Columns(**merged)
+
+    def _mask(self, columns: _Columns, status, breed_id: Optional[str],
+              min_age: Optional[int], max_age: Optional[int]) -> 'np.ndarray':
+        """Vectorized equivalent of Dog.list_filter"""
+        mask = np.ones(columns.size, dtype=bool)
+        if status is not None:
+            mask &= columns.statuses == self._status_codes.get(status.value, NO_CODE - 1)
+        if breed_id is not None:
+            mask &= columns.breed_codes == self._breed_codes.get(breed_id, NO_CODE - 1)
+        if min_age is not None or max_age is not None:
+            mask &= columns.ages != NO_AGE
+            if min_age is not None:
+                mask &= columns.ages >= min_age
+            if max_age is not None:
+                mask &= columns.ages <= max_age
+        return mask
+
+    def query(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+              max_age: Optional[int] = None, sort: str = 'name') -> List[Dict[str, Any]]:
+        """Answer Dog.find_with_breed_info from the snapshot"""
+        columns = self._columns
+        field, descending = sort.lstrip('-'), sort.startswith('-')
+        mask = self._mask(columns, status, breed_id, min_age, max_age)
+
+        # Walk the name ordering, so a stable sort on another key breaks ties by name
+        order = columns.name_order[mask[columns.name_order]]
+        if field == 'name':
+            if descending:
+                order = order[::-1]
+        elif field in ('age', 'intake_date'):
+            keys = (columns.ages if field == 'age' else columns.intake)[order].astype(np.float64)
+            order = order[np.argsort(-keys if descending else keys, kind='stable')]
+        else:
+            raise ValueError(f"Cannot sort dogs by '{field}'")
+
+        ids = columns.take('ids', order)
+        names = columns.take('names', order)
+        breed_codes = columns.take('breed_codes', order)
+        ages = columns.take('ages', order)
+        statuses = columns.take('statuses', order)
+        genders = columns.take('genders', order)
+        descriptions = columns.take('descriptions', order)
+        intake_dates = columns.take('intake_dates', order)
+        adoption_dates = columns.take('adoption_dates', order)
+
+        breed_names = self._breed_names
+        status_values = self._status_values
+        dogs = []
+        for i in range(len(ids)):
+            dog = {'_id': ids[i].decode('ascii'), 'name': names[i]}
+            breed = breed_names[breed_codes[i]] if breed_codes[i] != NO_CODE else None
+            if breed is not None:
+                # Like the $lookup, dogs without a known breed have no breed field
+                dog['breed'] = breed
+            dog['age'] = ages[i] if ages[i] != NO_AGE else None
+            dog['gender'] = genders[i]
+            dog['description'] = descriptions[i]
+            dog['status'] = status_values[statuses[i]] if statuses[i] != NO_CODE else None
+            dog['intake_date'] = intake_dates[i]
+            dog['adoption_date'] = adoption_dates[i]
+            dogs.append(dog)
+        return dogs
+
+    def stats(self, status=None, breed_id: Optional[str] = None, min_age: Optional[int] = None,
+              max_age: Optional[int] = None) -> Dict[str, Any]:
+        """Answer Dog.stats from the snapshot"""
+        columns = self._columns
+        mask = self._mask(columns, status, breed_id, min_age, max_age)
+
+        statuses = columns.statuses[mask]
+        status_counts = np.bincount(statuses[statuses != NO_CODE], minlength=len(self._status_values))
+        by_status = {
+            self._status_values[code]: int(count) for code, count in enumerate(status_counts) if count
+        }
+        unknown_status = int(np.count_nonzero(statuses == NO_CODE))
+        if unknown_status:
+            by_status[None] = unknown_status
+
+        breed_codes = columns.breed_codes[mask]
+        breed_counts = np.bincount(breed_codes[breed_codes != NO_CODE], minlength=len(self._breed_names))
+        by_breed: Dict[str, int] = {}
+        for code, count in enumerate(breed_counts):
+            if count:
+                name = self._breed_names[code] or 'Unknown'
+                by_breed[name] = by_breed.get(name, 0) + int(count)
+        unknown_breed = int(np.count_nonzero(breed_codes == NO_CODE))
+        if unknown_breed:
+            by_breed['Unknown'] = by_breed.get('Unknown', 0) + unknown_breed
+
+        ages = columns.ages[mask]
+        ages = ages[ages != NO_AGE]
+        return {
+            'total': int(np.count_nonzero(mask)),
+            'by_status': by_status,
+            'by_breed': by_breed,
+            'age': {
+                'min': int(ages.min()) if ages.size else None,
+                'max': int(ages.max()) if ages.size else None,
+                'mean': float(ages.mean()) if ages.size else None
+            }
+        }
+
+    def info(self) -> Dict[str, Any]:
+        """Get snapshot counters"""
+        columns = self._columns
+        return {
+            'enabled': self.enabled,
+            'ready': columns is not None,
+            'rows': columns.size if columns is not None else 0,
+            'refreshed_at': self.refreshed_at,
+            'last_refresh_ms': self.last_refresh_ms,
+            'refresh_errors': self.refresh_errors
+        }
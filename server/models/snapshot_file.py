@@ -0,0 +1,143 @@
+"""Versioned binary snapshot file, memory-mapped by every worker.
+
+Layout (little endian):
+    magic (8 bytes) | format version (uint32) | header length (uint32) | JSON header | columns
+
+The JSON header holds snapshot metadata and, for every column, its dtype, byte offset and
+element count. Columns are fixed-width arrays aligned to 8 bytes, so they are mapped with
+numpy.frombuffer without copying. String columns are stored as a heap of UTF-8 bytes plus an
+offsets column and a null mask.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it the snapshot stays disabled
+    np = None
+
+MAGIC = b'DOGSNAP\x00'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 8
+
+class StringHeap:
+    """A read-only column of optional strings stored as offsets into a UTF-8 heap"""
+
+    def __init__(self, offsets: 'np.ndarray', data: 'np.ndarray', nulls: 'np.ndarray'):
+        self.offsets = offsets  # int64, one more than the number of strings
+        self.data = data        # uint8 heap
+        self.nulls = nulls      # bool
+        self._heap = memoryview(data)
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    @classmethod
+    def from_values(cls, values) -> 'StringHeap':
+        """Encode a sequence of strings (or None) into a heap"""
+        encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        nulls = np.array([value is None for value in values], dtype=bool)
+        return cls(offsets, data, nulls)
+
+    def take(self, indices) -> List[Optional[str]]:
+        """Decode the strings at the given rows"""
+        offsets = self.offsets[indices].tolist()
+        ends = self.offsets[np.asarray(indices) + 1].tolist()
+        nulls = self.nulls[indices].tolist()
+        heap = self._heap
+        return [
+            None if null else str(heap[start:end], 'utf-8')
+            for start, end, null in zip(offsets, ends, nulls)
+        ]
+
+    def to_array(self) -> 'np.ndarray':
+        """Decode every string into an object array"""
+        return np.array(self.take(np.arange(len(self))), dtype=object)
+
+def _aligned(position: int) -> int:
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+def write_file(path: str, metadata: Dict[str, Any], columns: Dict[str, Any]):
+    """Write columns (numpy arrays or StringHeaps) and metadata, atomically replacing path"""
+    arrays: Dict[str, 'np.ndarray'] = {}
+    strings: List[str] = []
+    for name, column in columns.items():
+        if isinstance(column, StringHeap):
+            strings.append(name)
+            arrays[f'{name}.offsets'] = column.offsets
+            arrays[f'{name}.data'] = column.data
+            arrays[f'{name}.nulls'] = column.nulls
+        else:
+            arrays[name] = np.ascontiguousarray(column)
+
+    # The header stores absolute offsets, so lay the columns out after a header of known size
+    def header_bytes(start: int) -> Tuple[bytes, Dict[str, Dict[str, Any]]]:
+        table, position = {}, start
+        for name, array in arrays.items():
+            table[name] = {'dtype': array.dtype.str, 'offset': position, 'length': len(array)}
+            position = _aligned(position + array.nbytes)
+        header = json.dumps({'metadata': metadata, 'columns': table, 'strings': strings}).encode('utf-8')
+        return header, table
+
+    start = 0
+    while True:
+        header, table = header_bytes(start)
+        needed = _aligned(_PREAMBLE.size + len(header))
+        if needed <= start:
+            break
+        start = needed
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.dogsnap-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            file.write(header)
+            for name, array in arrays.items():
+                file.write(b'\x00' * (table[name]['offset'] - file.tell()))
+                file.write(array.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        # Workers that already mapped the old file keep reading it until they remap
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def read_file(path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Map a snapshot file, returning (metadata, columns) without copying column data
+
+    Raises ValueError if the file is not a snapshot or was written by another format version.
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < _PREAMBLE.size:
+        raise ValueError(f"{path} is not a dog snapshot file")
+    magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a dog snapshot file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+    arrays = {
+        name: np.frombuffer(buffer, dtype=np.dtype(entry['dtype']), count=entry['length'], offset=entry['offset'])
+        for name, entry in header['columns'].items()
+    }
+
+    columns: Dict[str, Any] = {}
+    for name in header['strings']:
+        columns[name] = StringHeap(
+            arrays.pop(f'{name}.offsets'), arrays.pop(f'{name}.data'), arrays.pop(f'{name}.nulls')
+        )
+    columns.update(arrays)
+    return header['metadata'], columns
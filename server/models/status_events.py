@@ -0,0 +1,221 @@
+"""Dog status history: an append-only event log with daily rollups
+
+Every adoption status transition is appended to a time-series collection, so history is never
+overwritten, and counted into one rollup document per shelter, breed and UTC day. Timelines
+read only the rollups of the requested days, so their cost does not grow with the history.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+from database import db
+from tenancy import current_shelter
+from .base import BaseModel
+from .breed import Breed
+
+# Units the timeline can be bucketed by
+INTERVALS = ('day', 'week', 'month')
+
+def day_start(at: datetime) -> datetime:
+    """Truncate a timestamp to the start of its UTC day"""
+    return datetime(at.year, at.month, at.day)
+
+def interval_start(day: datetime, interval: str) -> datetime:
+    """Get the start of the day, week (from Monday) or month a day falls in"""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+def status_event(dog: Dict[str, Any], from_status: Optional[str], to_status: str,
+                 at: datetime) -> Dict[str, Any]:
+    """Build the event of a dog entering to_status (from_status is None for an intake)"""
+    event: Dict[str, Any] = {
+        'at': at,
+        # '' rather than null for dogs without a breed: $merge cannot match rollups on null keys
+        'meta': {'shelter_id': dog.get('shelter_id'), 'breed_id': str(dog['breed_id']) if dog.get('breed_id') else ''},
+        'dog_id': dog['_id'],
+        'from': from_status,
+        'to': to_status
+    }
+    intake_date = BaseModel.parse_timestamp(dog.get('intake_date'))
+    if to_status == 'Adopted' and from_status is not None and intake_date is not None:
+        event['days_in_shelter'] = round(max((at - intake_date).total_seconds(), 0) / 86400, 2)
+    return event
+
+def initial_events(dog: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Events of a newly stored dog: its intake, and its adoption if it arrives already adopted"""
+    intake_date = BaseModel.parse_timestamp(dog.get('intake_date')) or datetime.utcnow()
+    adoption_date = BaseModel.parse_timestamp(dog.get('adoption_date'))
+    status = dog.get('status') or 'Available'
+    if status == 'Adopted' and adoption_date is not None:
+        return [
+            status_event(dog, None, 'Available', intake_date),
+            status_event(dog, 'Available', 'Adopted', adoption_date)
+        ]
+    return [status_event(dog, None, status, intake_date)]
+
+class StatusHistory:
+    """Appends status events and answers timelines from their daily rollups"""
+
+    def __init__(self, status_values: List[str], get_events: Callable[[], Collection],
+                 get_rollups: Callable[[], Collection]):
+        self.status_values = status_values
+        self._get_events = get_events
+        self._get_rollups = get_rollups
+        self.recorded: int = 0
+        self.failed: int = 0
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def rollup_update(event: Dict[str, Any]) -> UpdateOne:
+        """Count one event into the rollup of its shelter, breed and day"""
+        increments: Dict[str, Any] = {f"entered.{event['to']}": 1}
+        if event['from'] is None:
+            increments['intakes'] = 1
+        if 'days_in_shelter' in event:
+            increments['days_to_adoption_total'] = event['days_in_shelter']
+            increments['days_to_adoption_count'] = 1
+        key = {
+            'shelter_id': event['meta']['shelter_id'],
+            'breed_id': event['meta']['breed_id'],
+            'day': day_start(event['at'])
+        }
+        return UpdateOne(key, {'$inc': increments}, upsert=True)
+
+    def record(self, events: List[Dict[str, Any]]):
+        """Append events and count them into the rollups; failures are logged, not raised
+
+        The dog write has already succeeded, so a history outage must not fail it.
+        """
+        if not events:
+            return
+        try:
+            self._get_events().insert_many(events, ordered=False)
+            self._get_rollups().bulk_write([self.rollup_update(event) for event in events], ordered=False)
+            self.recorded += len(events)
+        except PyMongoError as e:
+            self.failed += len(events)
+            self.last_error = str(e)
+            logging.error(f"Failed to record {len(events)} dog status events: {e}")
+
+    def timeline(self, start: datetime, end: datetime, interval: str = 'week',
+                 breed_id: Optional[str] = None) -> Dict[str, Any]:
+        """Count intakes and status changes per interval between two days, plus adoptions per breed"""
+        if interval not in INTERVALS:
+            raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+        match: Dict[str, Any] = {'shelter_id': current_shelter(), 'day': {'$gte': start, '$lt': end}}
+        if breed_id is not None:
+            match['breed_id'] = breed_id
+        sums: Dict[str, Any] = {
+            'intakes': {'$sum': '$intakes'},
+            'days_total': {'$sum': '$days_to_adoption_total'},
+            'days_count': {'$sum': '$days_to_adoption_count'},
+            **{f'entered_{value}': {'$sum': f'$entered.{value}'} for value in self.status_values}
+        }
+        pipeline = [
+            # Served by the (shelter_id, day, breed_id) index: one document per breed and day in range
+            {'$match': match},
+            {
+                '$facet': {
+                    # Summed per day here and per interval below: $dateTrunc needs MongoDB 5.0
+                    'days': [{'$group': {'_id': '$day', **sums}}],
+                    'by_breed': [{'$group': {'_id': '$breed_id', **sums}}]
+                }
+            }
+        ]
+        result = next(self._get_rollups().aggregate(pipeline, maxTimeMS=db.max_time_ms()))
+
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+        for group in result['days']:
+            start_of_bucket = interval_start(group['_id'], interval)
+            bucket = buckets.get(start_of_bucket)
+            if bucket is None:
+                buckets[start_of_bucket] = dict(group, _id=start_of_bucket)
+            else:
+                for name, value in group.items():
+                    if name != '_id':
+                        bucket[name] += value
+
+        breed_names = Breed.names_by_id()
+        by_breed = [
+            {'breed_id': group['_id'] or None, 'breed': breed_names.get(group['_id'], 'Unknown'), **self._totals(group)}
+            for group in result['by_breed']
+        ]
+        by_breed.sort(key=lambda group: (-group['entered'].get('Adopted', 0), group['breed']))
+        return {
+            'interval': interval,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'buckets': [{'start': start_of_bucket.isoformat(), **self._totals(buckets[start_of_bucket])} for start_of_bucket in sorted(buckets)],
+            'by_breed': by_breed
+        }
+
+    def _totals(self, group: Dict[str, Any]) -> Dict[str, Any]:
+        """Format the sums of one timeline group"""
+        return {
+            'intakes': group['intakes'],
+            'entered': {value: group[f'entered_{value}'] for value in self.status_values},
+            'avg_days_to_adoption': round(group['days_total'] / group['days_count'], 1) if group['days_count'] else None
+        }
+
+    def rebuild_rollups(self, start: datetime, end: datetime):
+        """Recompute the current shelter's rollups of whole days between start and end from the event log
+
+        Each rollup with events is replaced in place, so events recorded meanwhile for other
+        shelters or days are not lost. Rollups of days left without any event are kept.
+        """
+        start, end = day_start(start), day_start(end) + timedelta(days=1)
+        # The start of the UTC day, without $dateTrunc (MongoDB 5.0) for the regular events collection
+        day = {'$dateFromString': {'dateString': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$at'}}, 'timezone': 'UTC'}}
+        key = {'shelter_id': '$meta.shelter_id', 'breed_id': '$meta.breed_id', 'day': day}
+        pipeline = [
+            {'$match': {'meta.shelter_id': current_shelter(), 'at': {'$gte': start, '$lt': end}}},
+            {
+                '$group': {
+                    '_id': {**key, 'to': '$to'},
+                    'count': {'$sum': 1},
+                    'intakes': {'$sum': {'$cond': [{'$eq': ['$from', None]}, 1, 0]}},
+                    'days_total': {'$sum': '$days_in_shelter'},
+                    'days_count': {'$sum': {'$cond': [{'$eq': [{'$type': '$days_in_shelter'}, 'missing']}, 0, 1]}}
+                }
+            },
+            {
+                '$group': {
+                    '_id': {name: f'$_id.{name}' for name in key},
+                    'entered': {'$push': {'k': '$_id.to', 'v': '$count'}},
+                    'intakes': {'$sum': '$intakes'},
+                    'days_to_adoption_total': {'$sum': '$days_total'},
+                    'days_to_adoption_count': {'$sum': '$days_count'}
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    **{name: f'$_id.{name}' for name in key},
+                    'entered': {'$arrayToObject': '$entered'},
+                    'intakes': 1,
+                    'days_to_adoption_total': 1,
+                    'days_to_adoption_count': 1
+                }
+            },
+            {
+                '$merge': {
+                    'into': self._get_rollups().name,
+                    'on': ['shelter_id', 'day', 'breed_id'],
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert'
+                }
+            }
+        ]
+        self._get_events().aggregate(pipeline)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get recorder counters for /metrics"""
+        return {'recorded': self.recorded, 'failed': self.failed, 'last_error': self.last_error}
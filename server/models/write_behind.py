@@ -0,0 +1,225 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+class WriteBehindFull(Exception):
+    """Raised when the write-behind queue stays full for longer than the enqueue timeout"""
+
+class WriteBehindQueue:
+    """Bounded queue of field updates, coalesced per document and flushed in bulk by a worker thread
+
+    With timestamp_field, each batch sets that field to the time it is written rather than the
+    time the updates were queued, so readers filtering on it cannot pass over deferred updates.
+    """
+
+    def __init__(self, get_collection: Callable[[], Collection], max_pending: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 0.5, enqueue_timeout: float = 1.0,
+                 on_flush: Optional[Callable[[], None]] = None, timestamp_field: Optional[str] = None):
+        self._get_collection = get_collection
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._on_flush = on_flush
+        self.timestamp_field = timestamp_field
+
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._changed = threading.Condition(self._lock)
+        # Document _id -> fields to $set (None: to $unset), in first-enqueued order
+        self._pending: 'OrderedDict[Any, Dict[str, Any]]' = OrderedDict()
+        # Document _id -> shard key fields added to its update filter
+        self._shard_keys: Dict[Any, Dict[str, Any]] = {}
+        self._in_flight: int = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.submitted: int = 0
+        self.coalesced: int = 0
+        self.written: int = 0
+        self.batches: int = 0
+        self.rejected: int = 0
+        self.failed_writes: int = 0
+        self.flush_errors: int = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        """Start the flush worker if it is not running yet"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        # Daemon threads die with the interpreter, so drain the queue first
+        atexit.register(self.stop)
+
+    def submit(self, doc_id: Any, fields: Dict[str, Any], shard_key: Optional[Dict[str, Any]] = None):
+        """Queue fields to $set on a document, merging them into any update already pending for it
+
+        Fields whose value is None are removed with $unset.
+
+        shard_key fields are added to the update filter so the write is routed to one shard.
+
+        Blocks while the queue is full and raises WriteBehindFull after enqueue_timeout.
+        """
+        self.start()
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._lock:
+            while doc_id not in self._pending and len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise WriteBehindFull(f"Write-behind queue is full ({self.max_pending} pending documents)")
+                self._not_full.wait(remaining)
+
+            self.submitted += 1
+            if shard_key:
+                self._shard_keys[doc_id] = shard_key
+            pending = self._pending.get(doc_id)
+            if pending is None:
+                self._pending[doc_id] = dict(fields)
+            else:
+                # Last write wins on each field
+                pending.update(fields)
+                self.coalesced += 1
+            if len(self._pending) >= self.batch_size:
+                self._changed.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been written, returning False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._changed.notify_all()
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining if remaining is not None else self.flush_interval)
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending writes and stop the worker"""
+        self.flush(timeout)
+        with self._lock:
+            self._stopping = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _take_batch(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Remove up to batch_size pending updates (called with the lock held)"""
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False))
+        self._in_flight = len(batch)
+        self._not_full.notify_all()
+        return batch
+
+    def _requeue(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        """Put a failed batch back, keeping newer pending values (called with the lock held)"""
+        for doc_id, fields in reversed(batch):
+            newer = self._pending.pop(doc_id, None)
+            if newer is not None:
+                fields.update(newer)
+            self._pending[doc_id] = fields
+            self._pending.move_to_end(doc_id, last=False)
+
+    def _run(self):
+        """Flush loop"""
+        backoff = self.flush_interval
+        while True:
+            with self._lock:
+                if not self._pending and not self._stopping:
+                    self._changed.wait(self.flush_interval)
+                if not self._pending:
+                    if self._stopping:
+                        return
+                    continue
+                batch = self._take_batch()
+
+            requeue = False
+            try:
+                self._write(batch)
+                backoff = self.flush_interval
+            except PyMongoError as e:
+                # Transient failure (e.g. no primary): keep the updates and retry after a pause
+                requeue = True
+                self.flush_errors += 1
+                self.last_error = str(e)
+                logging.warning(f"Write-behind flush failed, retrying {len(batch)} updates: {e}")
+            except Exception as e:
+                # Anything else must not kill the worker and lose the queued updates
+                requeue = True
+                self.flush_errors += 1
+                self.last_error = str(e)
+                logging.error(f"Write-behind flush failed unexpectedly, retrying {len(batch)} updates: {e}")
+
+            with self._lock:
+                if requeue:
+                    self._requeue(batch)
+                else:
+                    for doc_id, _ in batch:
+                        if doc_id not in self._pending:
+                            self._shard_keys.pop(doc_id, None)
+                self._in_flight = 0
+                self._changed.notify_all()
+
+            if requeue:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+
+    def _write(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        """Write one batch with an unordered bulk_write"""
+        written_at = {self.timestamp_field: datetime.utcnow().isoformat()} if self.timestamp_field else {}
+        operations = []
+        for doc_id, fields in batch:
+            update: Dict[str, Any] = {'$set': {
+                **{key: value for key, value in fields.items() if value is not None},
+                **written_at
+            }}
+            unset_fields = {key: '' for key, value in fields.items() if value is None}
+            if unset_fields:
+                update['$unset'] = unset_fields
+            operations.append(UpdateOne({'_id': doc_id, **self._shard_keys.get(doc_id, {})}, update))
+        try:
+            self._get_collection().bulk_write(operations, ordered=False)
+            failed = 0
+        except BulkWriteError as e:
+            # Per-document errors (e.g. validation) will not succeed on retry, so count and drop them
+            errors = e.details.get('writeErrors', [])
+            failed = len(errors)
+            self.last_error = errors[0].get('errmsg') if errors else str(e)
+            logging.error(f"Write-behind dropped {failed} of {len(batch)} updates: {self.last_error}")
+
+        self.batches += 1
+        self.written += len(batch) - failed
+        self.failed_writes += failed
+        if self._on_flush is not None:
+            self._on_flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue counters"""
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'pending': len(self._pending),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'batches': self.batches,
+                'rejected': self.rejected,
+                'failed_writes': self.failed_writes,
+                'flush_errors': self.flush_errors,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,274 @@
+"""Query plan checks: summarize explain output and flag plans that scan too much
+
+summarize_explain() reduces the executionStats explain of a find or aggregate (plain, slot-based
+or sharded) to its plan stages, indexes and examined/returned counts, and plan_problems() flags
+collection scans and queries that examine many more keys or documents than they return.
+
+utils/explain_queries.py runs these checks on every model query against a seeded database.
+At runtime, PlanSampler re-explains a sample of live queries on a background thread and logs
+plans that are flagged or that changed since the last sample of the same query shape.
+"""
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from pymongo import monitoring
+
+# Commands whose plans are checked
+EXPLAINED_COMMANDS = ('find', 'aggregate')
+# Pipeline stages that write or never finish, so they are not re-run by explain
+_UNEXPLAINED_STAGES = ('$merge', '$out', '$changeStream')
+# Command fields of the session or transaction that explain does not accept
+_SESSION_FIELDS = ('lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern')
+# Join strategies (slot-based $lookup) that scan the foreign collection
+_SCANNING_JOINS = ('NestedLoopJoin', 'HashJoin')
+
+def explainable(command: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a find or aggregate command without the fields explain rejects"""
+    return {
+        key: value for key, value in command.items()
+        if not key.startswith('$') and key not in _SESSION_FIELDS
+    }
+
+def query_shape(command: Dict[str, Any]) -> str:
+    """Describe a command with its values replaced, so repeats of the same query share a shape"""
+    def shape(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: shape(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [shape(item) for item in value[:1]]
+        return '?'
+
+    name = next(iter(command))
+    if name == 'aggregate':
+        described = {'pipeline': [shape(stage) if '$match' in stage else next(iter(stage)) for stage in command.get('pipeline', [])]}
+    else:
+        described = {'filter': shape(command.get('filter', {})), 'sort': list(command.get('sort', {}))}
+    return f"{name} {command[name]} {json.dumps(described, sort_keys=True)}"
+
+def _plan_stages(plan: Any, summary: Dict[str, Any]):
+    """Collect the stage names and indexes of a winning plan tree"""
+    if isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, summary)
+        return
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        summary['stages'].append(plan['stage'])
+        if plan.get('strategy') in _SCANNING_JOINS:
+            summary['collection_scans'] += 1
+    if plan.get('indexName') and plan['indexName'] not in summary['indexes']:
+        summary['indexes'].append(plan['indexName'])
+    for key, value in plan.items():
+        if key not in ('rejectedPlans', 'slotBasedPlan'):
+            _plan_stages(value, summary)
+
+def _collect(explain: Dict[str, Any], summary: Dict[str, Any]):
+    """Add one explain document (of a shard, a cursor stage or a whole query) to the summary"""
+    if 'queryPlanner' in explain:
+        _plan_stages(explain['queryPlanner'].get('winningPlan', {}), summary)
+    stats = explain.get('executionStats')
+    if stats:
+        summary['returned'] += stats.get('nReturned', 0)
+        summary['keys_examined'] += stats.get('totalKeysExamined', 0)
+        summary['docs_examined'] += stats.get('totalDocsExamined', 0)
+        summary['execution_ms'] = max(summary['execution_ms'], stats.get('executionTimeMillis', 0))
+
+    # Aggregations the query layer cannot run whole: a $cursor stage, then one entry per stage
+    for stage in explain.get('stages', []):
+        if '$cursor' in stage:
+            _collect(stage['$cursor'], summary)
+            continue
+        summary['stages'].append(next(key for key in stage if key.startswith('$')))
+        summary['keys_examined'] += stage.get('totalKeysExamined', 0)
+        summary['docs_examined'] += stage.get('totalDocsExamined', 0)
+        summary['collection_scans'] += stage.get('collectionScans', 0)
+        for index in stage.get('indexesUsed', []):
+            if index not in summary['indexes']:
+                summary['indexes'].append(index)
+
+    # Aggregations on a sharded cluster report each shard separately
+    if isinstance(explain.get('shards'), dict):
+        for shard in explain['shards'].values():
+            _collect(shard, summary)
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an executionStats explain of a find or aggregate to its plan and examined counts"""
+    summary: Dict[str, Any] = {
+        'stages': [],
+        'indexes': [],
+        'keys_examined': 0,
+        'docs_examined': 0,
+        'returned': 0,
+        'collection_scans': 0,
+        'execution_ms': 0
+    }
+    _collect(explain, summary)
+    return summary
+
+def plan_problems(summary: Dict[str, Any], max_examined_ratio: float) -> List[str]:
+    """List what is wrong with a plan: collection scans, or examining too much for what it returns"""
+    problems = []
+    if 'COLLSCAN' in summary['stages'] or summary['collection_scans']:
+        problems.append('collection scan')
+    returned = max(summary['returned'], 1)
+    for counter in ('keys_examined', 'docs_examined'):
+        ratio = summary[counter] / returned
+        if ratio > max_examined_ratio:
+            problems.append(f"{counter.replace('_', ' ')} {summary[counter]} for {summary['returned']} returned ({ratio:.0f}x)")
+    return problems
+
+def plan_signature(summary: Dict[str, Any]) -> str:
+    """The plan of a summary, without its counts, to notice when a query changes plans"""
+    return f"{'>'.join(summary['stages'])} [{', '.join(summary['indexes'])}]"
+
+class CommandRecorder(monitoring.CommandListener):
+    """Collects the find and aggregate commands sent while recording
+
+    Register it with pymongo.monitoring.register() before the client is created.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @contextmanager
+    def recording(self) -> Iterator[List[Dict[str, Any]]]:
+        """Collect the commands this thread sends inside the block"""
+        commands: List[Dict[str, Any]] = []
+        self._local.commands = commands
+        try:
+            yield commands
+        finally:
+            self._local.commands = None
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        commands = getattr(self._local, 'commands', None)
+        if commands is not None and event.command_name in EXPLAINED_COMMANDS:
+            commands.append(explainable(copy.deepcopy(event.command)))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+class PlanSampler(monitoring.CommandListener):
+    """Re-explains a random sample of live queries in the background and logs plan regressions
+
+    Explaining with executionStats runs the query again, so keep sample_rate small. Samples
+    beyond max_pending waiting explains are dropped rather than delaying the queries.
+    """
+
+    def __init__(self, explain: Callable[[str, Dict[str, Any]], Dict[str, Any]], sample_rate: float = 0.0,
+                 max_examined_ratio: float = 10.0, max_pending: int = 16, max_shapes: int = 500):
+        self._explain = explain
+        self.sample_rate = sample_rate
+        self.max_examined_ratio = max_examined_ratio
+        self.max_shapes = max_shapes
+        self._pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Last plan seen per query shape
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self.sampled: int = 0
+        self.dropped: int = 0
+        self.explained: int = 0
+        self.flagged: int = 0
+        self.changed: int = 0
+        self.failed_explains: int = 0
+
+    def configure(self, sample_rate: float, max_examined_ratio: float):
+        """Set the share of queries to sample (0 disables) and the examined/returned limit"""
+        self.sample_rate = sample_rate
+        self.max_examined_ratio = max_examined_ratio
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        # Runs on the query's own thread: only decide and enqueue
+        if self.sample_rate <= 0 or event.command_name not in EXPLAINED_COMMANDS:
+            return
+        if random.random() >= self.sample_rate:
+            return
+        command = event.command
+        if any(key in stage for stage in command.get('pipeline', []) for key in _UNEXPLAINED_STAGES):
+            return
+        try:
+            self._pending.put_nowait((event.database_name, explainable(copy.deepcopy(command))))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.sampled += 1
+        self._ensure_worker()
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='plan-sampler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            database_name, command = self._pending.get()
+            try:
+                self.check(database_name, command)
+            finally:
+                self._pending.task_done()
+
+    def check(self, database_name: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Explain one command, log it if its plan is flagged or changed, and return its summary"""
+        try:
+            summary = summarize_explain(self._explain(database_name, command))
+        except Exception as e:
+            with self._lock:
+                self.failed_explains += 1
+            logging.warning(f"Failed to explain a sampled query: {e}")
+            return None
+
+        shape = query_shape(command)
+        signature = plan_signature(summary)
+        problems = plan_problems(summary, self.max_examined_ratio)
+        with self._lock:
+            self.explained += 1
+            previous = self._plans.get(shape)
+            if previous is None and len(self._plans) >= self.max_shapes:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[shape] = {'plan': signature, 'problems': problems}
+            changed = previous is not None and previous['plan'] != signature
+            if changed:
+                self.changed += 1
+            if problems:
+                self.flagged += 1
+
+        if changed:
+            logging.warning(f"Query plan changed for {shape}: {previous['plan']} -> {signature}")
+        # Flagged plans are logged when first seen and after each change, not on every sample
+        if problems and (previous is None or changed):
+            logging.warning(f"Slow query plan for {shape}: {signature}; {'; '.join(problems)}")
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        """Get sampler counters and the currently flagged query shapes for /metrics"""
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'sampled': self.sampled,
+                'dropped': self.dropped,
+                'explained': self.explained,
+                'flagged': self.flagged,
+                'plan_changes': self.changed,
+                'failed_explains': self.failed_explains,
+                'flagged_shapes': {shape: plan for shape, plan in self._plans.items() if plan['problems']}
+            }
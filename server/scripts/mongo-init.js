@@ -6,11 +6,27 @@ db = db.getSiblingDB('dogshelter');
 
 // Create an index on the breeds collection for unique names
 db.breeds.createIndex({ "name": 1 }, { unique: true });
+// Case-insensitive lookups by name
+db.breeds.createIndex({ "name": 1 }, { name: "name_ci", collation: { locale: "en", strength: 2 } });
 
-// Create indexes on the dogs collection for better performance
-db.dogs.createIndex({ "name": 1 });
-db.dogs.createIndex({ "breed_id": 1 });
-db.dogs.createIndex({ "status": 1 });
-db.dogs.createIndex({ "age": 1 });
+// Create indexes on the dogs collection for better performance; every dog query filters on
+// shelter_id, and { shelter_id: 1, _id: 1 } backs the recommended shard key
+db.dogs.createIndex({ "shelter_id": 1, "_id": 1 });
+db.dogs.createIndex({ "shelter_id": 1, "name": 1 });
+db.dogs.createIndex({ "shelter_id": 1, "breed_id": 1, "name": 1 });
+db.dogs.createIndex({ "shelter_id": 1, "status": 1, "name": 1 });
+db.dogs.createIndex({ "shelter_id": 1, "age": 1 });
+db.dogs.createIndex({ "shelter_id": 1, "updated_at": 1, "_id": 1 });
+// Nearby search spans every shelter
+db.dogs.createIndex({ "location": "2dsphere", "status": 1 });
+
+// Tombstones of deleted dogs for incremental sync, expired after 30 days
+db.dog_tombstones.createIndex({ "deleted_at": 1 }, { expireAfterSeconds: 30 * 24 * 60 * 60 });
+db.dog_tombstones.createIndex({ "shelter_id": 1, "deleted_at": 1, "_id": 1 });
+
+// Dog status history: a time-series event log and one rollup per shelter, day and breed
+db.createCollection("dog_status_events", { timeseries: { timeField: "at", metaField: "meta", granularity: "hours" } });
+db.dog_status_events.createIndex({ "meta.shelter_id": 1, "at": 1 });
+db.dog_status_rollups.createIndex({ "shelter_id": 1, "day": 1, "breed_id": 1 }, { unique: true });
 
 print('MongoDB initialization completed for dogshelter database');
@@ -0,0 +1,37 @@
+#!/bin/bash
+
+# Start a single-node MongoDB replica set on localhost for change stream development and tests
+# Usage: ./scripts/start_replica_set.sh [port] [data-dir]
+# Stop it with: mongosh --port <port> --eval 'db.getSiblingDB("admin").shutdownServer()'
+
+set -e
+
+GREEN='\033[0;32m'
+RED='\033[0;31m'
+NC='\033[0m' # No Color
+
+PORT="${1:-27018}"
+DATA_DIR="${2:-/tmp/dogshelter-rs0}"
+
+if ! command -v mongod &> /dev/null || ! command -v mongosh &> /dev/null; then
+    echo -e "${RED}mongod and mongosh are required. See README_MONGODB.md for installation.${NC}"
+    exit 1
+fi
+
+mkdir -p "$DATA_DIR"
+mongod --replSet rs0 --port "$PORT" --bind_ip localhost --dbpath "$DATA_DIR" \
+    --logpath "$DATA_DIR/mongod.log" --fork
+
+# Initiate the replica set (no-op if it already exists)
+mongosh --quiet --port "$PORT" --eval "
+try {
+    rs.status();
+} catch (e) {
+    rs.initiate({ _id: 'rs0', members: [{ _id: 0, host: 'localhost:$PORT' }] });
+}
+while (!db.hello().isWritablePrimary) { sleep(100); }
+"
+
+echo -e "${GREEN}Replica set rs0 is running on localhost:$PORT${NC}"
+echo "export MONGODB_URI=\"mongodb://localhost:$PORT/?replicaSet=rs0\""
+echo "export MONGODB_REPLSET_URI=\"mongodb://localhost:$PORT/?replicaSet=rs0\""
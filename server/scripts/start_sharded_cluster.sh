@@ -0,0 +1,69 @@
+#!/bin/bash
+
+# Start a local sharded cluster (a mongos, a config server and two shards, each a single-node
+# replica set) with the dogs collection sharded on { shelter_id: 1, _id: 1 }. Shelters sorting
+# before "south" live on shard1 and the rest on shard2, so tests can check query targeting.
+# Usage: ./scripts/start_sharded_cluster.sh [mongos-port] [data-dir] [database]
+# Stop it with: pkill -f "$DATA_DIR" (mongod and mongos processes log under the data dir)
+
+set -e
+
+GREEN='\033[0;32m'
+RED='\033[0;31m'
+NC='\033[0m' # No Color
+
+PORT="${1:-27200}"
+DATA_DIR="${2:-/tmp/dogshelter-sharded}"
+DATABASE="${3:-dogshelter_sharded}"
+CONFIG_PORT=$((PORT + 1))
+SHARD1_PORT=$((PORT + 2))
+SHARD2_PORT=$((PORT + 3))
+
+if ! command -v mongod &> /dev/null || ! command -v mongos &> /dev/null || ! command -v mongosh &> /dev/null; then
+    echo -e "${RED}mongod, mongos and mongosh are required. See README_MONGODB.md for installation.${NC}"
+    exit 1
+fi
+
+# Start a single-node replica set and wait until it has a primary
+start_replica_set() {
+    local name="$1" port="$2" role="$3"
+    mkdir -p "$DATA_DIR/$name"
+    mongod "$role" --replSet "$name" --port "$port" --bind_ip localhost --dbpath "$DATA_DIR/$name" \
+        --logpath "$DATA_DIR/$name/mongod.log" --fork
+    mongosh --quiet --port "$port" --eval "
+    try {
+        rs.status();
+    } catch (e) {
+        rs.initiate({ _id: '$name', members: [{ _id: 0, host: 'localhost:$port' }] });
+    }
+    while (!db.hello().isWritablePrimary) { sleep(100); }
+    "
+}
+
+start_replica_set cfg "$CONFIG_PORT" --configsvr
+start_replica_set shard1 "$SHARD1_PORT" --shardsvr
+start_replica_set shard2 "$SHARD2_PORT" --shardsvr
+
+mongos --configdb "cfg/localhost:$CONFIG_PORT" --port "$PORT" --bind_ip localhost \
+    --logpath "$DATA_DIR/mongos.log" --fork
+
+mongosh --quiet --port "$PORT" --eval "
+const ns = '$DATABASE.dogs';
+if (!db.adminCommand({ listShards: 1 }).shards.length) {
+    sh.addShard('shard1/localhost:$SHARD1_PORT');
+    sh.addShard('shard2/localhost:$SHARD2_PORT');
+}
+sh.enableSharding('$DATABASE', 'shard1');
+db.getSiblingDB('$DATABASE').dogs.createIndex({ shelter_id: 1, _id: 1 });
+if (!db.getSiblingDB('config').collections.findOne({ _id: ns })) {
+    sh.shardCollection(ns, { shelter_id: 1, _id: 1 });
+    // Pin the chunks so the balancer does not move the shelters while tests run
+    sh.disableBalancing(ns);
+    sh.splitAt(ns, { shelter_id: 'south', _id: MinKey });
+    sh.moveChunk(ns, { shelter_id: 'south', _id: MinKey }, 'shard2');
+}
+"
+
+echo -e "${GREEN}Sharded cluster is running; mongos on localhost:$PORT${NC}"
+echo "export MONGODB_SHARDED_URI=\"mongodb://localhost:$PORT/\""
+echo "export MONGODB_SHARDED_DATABASE=\"$DATABASE\""
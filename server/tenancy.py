@@ -0,0 +1,57 @@
+"""Which shelter the current request or background job works on
+
+Dogs belong to one shelter. shelter_id leads the dogs shard key and every dogs index, so each
+dog query filters on it and mongos routes the query to the one shard holding that shelter.
+Breeds are shared by all shelters.
+"""
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, Optional
+
+from config import Config
+
+# Request header naming the shelter (the shelter_id query parameter takes precedence)
+SHELTER_HEADER = 'X-Shelter-Id'
+
+# Recommended shard key for the dogs collection; see "Multiple Shelters" in README_MONGODB.md
+DOGS_SHARD_KEY = {'shelter_id': 1, '_id': 1}
+
+_shelter: ContextVar[Optional[str]] = ContextVar('shelter_id', default=None)
+
+_VALID_SHELTER_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def validate_shelter_id(shelter_id: Any) -> str:
+    """Check a shelter id, raising ValueError if it is malformed"""
+    if not isinstance(shelter_id, str) or not _VALID_SHELTER_ID.match(shelter_id):
+        raise ValueError("shelter_id must be 1-64 letters, digits, '-' or '_'")
+    return shelter_id
+
+def current_shelter() -> str:
+    """Get the shelter of the current request, or SHELTER_ID outside one"""
+    return _shelter.get() or Config.SHELTER_ID
+
+def is_home_shelter() -> bool:
+    """Whether the current shelter is the one this node keeps in-memory copies of"""
+    return current_shelter() == Config.SHELTER_ID
+
+def start_shelter(shelter_id: str) -> Token:
+    """Scope the current context to a shelter, returning a token for clear_shelter()"""
+    return _shelter.set(validate_shelter_id(shelter_id))
+
+def clear_shelter(token: Token):
+    """Restore the shelter that was current before start_shelter()"""
+    _shelter.reset(token)
+
+@contextmanager
+def use_shelter(shelter_id: str) -> Iterator[None]:
+    """Run a block, e.g. a job or a streamed response, against a shelter"""
+    token = start_shelter(shelter_id)
+    try:
+        yield
+    finally:
+        clear_shelter(token)
+
+def shelter_filter(query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Prefix a dogs query with the current shelter, so it targets a single shard"""
+    return {'shelter_id': current_shelter(), **(query or {})}
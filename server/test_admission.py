@@ -0,0 +1,172 @@
+import unittest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, Response, jsonify
+
+from admission import Admission, ConcurrencyLimiter, MemoryBucketStore, RateLimiter
+from config import TestingConfig
+from database import DatabaseBusyError, MongoDB
+
+class AdmissionConfig(TestingConfig):
+    """Testing configuration with tight limits"""
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_PER_SECOND = 1
+    RATE_LIMIT_BURST = 2
+    ROUTE_CONCURRENCY_LIMIT = 1
+    ADMISSION_QUEUE_TIMEOUT = 0
+    RATE_LIMIT_API_KEYS = ['greedy', 'polite', 'first', 'second']
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_refills_over_time(self):
+        """Test that a client can burst, is then limited, and recovers as tokens refill"""
+        # Arrange
+        store = MemoryBucketStore()
+
+        # Act
+        first = store.take('client', 1, 2, now=100.0)
+        second = store.take('client', 1, 2, now=100.0)
+        third = store.take('client', 1, 2, now=100.0)
+        later = store.take('client', 1, 2, now=101.5)
+
+        # Assert
+        self.assertEqual([first[0], second[0], third[0], later[0]], [True, True, False, True])
+        self.assertAlmostEqual(later[1], 0.5)
+
+    def test_least_recently_used_clients_are_evicted(self):
+        """Test that the number of tracked clients stays bounded"""
+        store = MemoryBucketStore(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            store.take(key, 1, 1, now=0.0)
+
+        self.assertEqual(len(store), 2)
+
+    def test_store_errors_fail_open(self):
+        """Test that requests are allowed when the shared store is unavailable"""
+        # Arrange
+        store = MagicMock()
+        store.take.side_effect = ConnectionError('redis is down')
+        limiter = RateLimiter(1, 1, store)
+
+        # Act
+        allowed, retry_after = limiter.check('client')
+
+        # Assert
+        self.assertTrue(allowed)
+        self.assertEqual(limiter.stats()['store_errors'], 1)
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        """Set up a small app with admission control"""
+        app = Flask(__name__)
+        self.admission = Admission(app, AdmissionConfig)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+        @app.route('/dogs')
+        def dogs():
+            return jsonify([])
+
+        @app.route('/stream')
+        def stream():
+            return Response(iter(['a', 'b']), mimetype='text/plain')
+
+        @app.route('/slow')
+        def slow():
+            self.entered.set()
+            self.release.wait(1)
+            return jsonify([])
+
+        self.client = app.test_client()
+
+    def test_clients_over_their_rate_get_429(self):
+        """Test that each API key has its own bucket and excess requests get Retry-After"""
+        # Act
+        statuses = [self.client.get('/dogs', headers={'X-API-Key': 'greedy'}).status_code for _ in range(3)]
+        limited = self.client.get('/dogs', headers={'X-API-Key': 'greedy'})
+        other = self.client.get('/dogs', headers={'X-API-Key': 'polite'})
+
+        # Assert
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(limited.status_code, 429)
+        self.assertEqual(limited.headers['Retry-After'], '1')
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(self.admission.stats()['rate_limit']['limited'], 2)
+
+    def test_unknown_api_keys_share_the_address_bucket(self):
+        """Test that sending a new made-up key with every request does not escape the limit"""
+        # Act
+        statuses = [self.client.get('/dogs', headers={'X-API-Key': f'made-up-{i}'}).status_code for i in range(3)]
+        known = self.client.get('/dogs', headers={'X-API-Key': 'polite'})
+
+        # Assert
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(known.status_code, 200)
+
+    def test_busy_route_sheds_with_503(self):
+        """Test that a route at its concurrency limit rejects new requests"""
+        # Arrange
+        worker = threading.Thread(target=lambda: self.client.get('/slow', headers={'X-API-Key': 'first'}))
+        worker.start()
+        self.assertTrue(self.entered.wait(1))
+
+        # Act
+        shed = self.client.get('/slow', headers={'X-API-Key': 'second'})
+        other_route = self.client.get('/dogs', headers={'X-API-Key': 'second'})
+        self.release.set()
+        worker.join(1)
+
+        # Assert
+        self.assertEqual(shed.status_code, 503)
+        self.assertIn('Retry-After', shed.headers)
+        self.assertEqual(other_route.status_code, 200)
+        self.assertEqual(self.admission.stats()['concurrency']['shed'], {'/slow': 1})
+        self.assertEqual(self.admission.stats()['concurrency']['active'], {'/slow': 0, '/dogs': 0})
+
+    def test_streamed_responses_hold_their_slot_until_closed(self):
+        """Test that a streamed response keeps its route slot while the body is being sent"""
+        # Act
+        response = self.client.get('/stream', headers={'X-API-Key': 'first'}, buffered=False)
+        while_streaming = self.client.get('/stream', headers={'X-API-Key': 'second'})
+        body = response.get_data(as_text=True)
+        response.close()
+
+        # Assert
+        self.assertEqual(body, 'ab')
+        self.assertEqual(while_streaming.status_code, 503)
+        self.assertEqual(self.admission.stats()['concurrency']['active'], {'/stream': 0})
+
+class TestQuerySlots(unittest.TestCase):
+    def test_in_flight_queries_are_capped(self):
+        """Test that query_slot raises DatabaseBusyError once every slot is taken"""
+        # Arrange
+        database = MongoDB()
+        database.set_query_limit(1, timeout=0.01)
+
+        # Act / Assert
+        with database.query_slot():
+            self.assertEqual(database.query_stats()['in_flight'], 1)
+            with self.assertRaises(DatabaseBusyError):
+                with database.query_slot():
+                    pass
+        with database.query_slot():
+            pass
+
+        self.assertEqual(database.query_stats(), {'limited': True, 'in_flight': 0, 'rejected': 1})
+
+    def test_concurrency_limiter_releases_slots(self):
+        """Test that a released slot can be taken again"""
+        limiter = ConcurrencyLimiter(1)
+
+        self.assertTrue(limiter.acquire('/dogs'))
+        self.assertFalse(limiter.acquire('/dogs'))
+        limiter.release('/dogs')
+        self.assertTrue(limiter.acquire('/dogs'))
+
+if __name__ == '__main__':
+    unittest.main()
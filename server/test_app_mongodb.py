@@ -1,5 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import gzip
 import json
 import os
 import sys
@@ -11,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 with patch('database.MongoDB.init_app'):
     from app import app
     from models.dog import AdoptionStatus
+    from models.payloads import payload_cache
 
 class TestApp(unittest.TestCase):
     def setUp(self):
@@ -18,6 +20,7 @@ class TestApp(unittest.TestCase):
         self.app = app.test_client()
         self.app.testing = True
         app.config['TESTING'] = True
+        payload_cache.clear()
     
     def _create_mock_dog_document(self, dog_id, name, breed):
         """Helper method to create a mock MongoDB dog document"""
@@ -97,7 +100,55 @@ class TestApp(unittest.TestCase):
         self.assertTrue(isinstance(data, list))
         self.assertEqual(len(data), 1)
         self.assertEqual(set(data[0].keys()), {'id', 'name', 'breed'})
-    
+
+    @patch('models.dog.Dog.find_with_breed_info')
+    def test_get_dogs_filters(self, mock_find_with_breed):
+        """Test that query string filters and sort are passed to the model"""
+        # Arrange
+        mock_find_with_breed.return_value = []
+
+        # Act
+        response = self.app.get('/api/dogs?status=AVAILABLE&min_age=2&max_age=8&sort=-age')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        mock_find_with_breed.assert_called_once_with(
+            sort='-age', status=AdoptionStatus.AVAILABLE, min_age=2, max_age=8
+        )
+
+    @patch('models.dog.Dog.find_with_breed_info')
+    def test_get_dogs_invalid_filters(self, mock_find_with_breed):
+        """Test that invalid filters are rejected before querying"""
+        # Act
+        bad_status = self.app.get('/api/dogs?status=Lost')
+        bad_age = self.app.get('/api/dogs?min_age=old')
+        bad_sort = self.app.get('/api/dogs?sort=description')
+
+        # Assert
+        self.assertEqual(bad_status.status_code, 400)
+        self.assertEqual(bad_age.status_code, 400)
+        self.assertEqual(bad_sort.status_code, 400)
+        mock_find_with_breed.assert_not_called()
+
+    @patch('models.dog.Dog.stats')
+    def test_get_dog_stats(self, mock_stats):
+        """Test the dog stats endpoint"""
+        # Arrange
+        mock_stats.return_value = {
+            'total': 1,
+            'by_status': {'Available': 1},
+            'by_breed': {'Labrador': 1},
+            'age': {'min': 3, 'max': 3, 'mean': 3.0}
+        }
+
+        # Act
+        response = self.app.get('/api/dogs/stats?status=Available')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['total'], 1)
+        mock_stats.assert_called_once_with(status=AdoptionStatus.AVAILABLE)
+
     @patch('models.dog.Dog.find_by_id_with_breed_info')
     def test_get_dog_success(self, mock_find_by_id):
         """Test successful retrieval of a specific dog"""
@@ -174,6 +225,54 @@ class TestApp(unittest.TestCase):
         self.assertEqual(data[1]['name'], "German Shepherd")
         self.assertEqual(data[1]['description'], "Intelligent breed")
     
+    @patch('models.dog.Dog.find_by_id_with_breed_info')
+    def test_get_dog_served_from_payload_cache(self, mock_find_by_id):
+        """Test that repeated requests reuse the pre-encoded dog record"""
+        # Arrange
+        dog_id = "507f1f77bcf86cd799439011"
+        mock_find_by_id.return_value = self._create_mock_dog_document(dog_id, "Buddy", "Labrador")
+        
+        # Act
+        first = self.app.get(f'/api/dogs/{dog_id}')
+        second = self.app.get(f'/api/dogs/{dog_id}')
+        
+        # Assert
+        self.assertEqual(first.data, second.data)
+        mock_find_by_id.assert_called_once_with(dog_id)
+    
+    @patch('models.breed.Breed.find_all')
+    def test_get_breeds_content_encoding(self, mock_find_all):
+        """Test that breeds are served gzip-encoded when the client accepts it"""
+        # Arrange
+        mock_breed = MagicMock()
+        mock_breed.id = "507f1f77bcf86cd799439013"
+        mock_breed.name = "Labrador"
+        mock_breed.description = "Friendly breed"
+        mock_find_all.return_value = [mock_breed]
+        
+        # Act
+        response = self.app.get('/api/breeds', headers={'Accept-Encoding': 'gzip'})
+        
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        data = json.loads(gzip.decompress(response.data))
+        self.assertEqual(data[0]['name'], "Labrador")
+    
+    @patch('app.dog_events')
+    def test_dog_events_requires_replica_set(self, mock_dog_events):
+        """Test that the events endpoint fails fast without change stream support"""
+        # Arrange
+        mock_dog_events.unsupported = True
+        
+        # Act
+        response = self.app.get('/api/dogs/events')
+        
+        # Assert
+        self.assertEqual(response.status_code, 503)
+        mock_dog_events.subscribe.assert_not_called()
+    
     @patch('models.breed.Breed.count')
     @patch('models.dog.Dog.count')
     def test_health_check_success(self, mock_dog_count, mock_breed_count):
@@ -193,6 +292,23 @@ class TestApp(unittest.TestCase):
         self.assertEqual(data['database'], 'connected')
         self.assertEqual(data['breeds_count'], 5)
         self.assertEqual(data['dogs_count'], 20)
+    
+    @patch('models.dog.Dog.find_with_breed_info')
+    def test_metrics_reports_coalescing(self, mock_find_with_breed):
+        """Test that the metrics endpoint exposes coalescing counters"""
+        # Arrange
+        mock_find_with_breed.return_value = []
+        self.app.get('/api/dogs')
+        
+        # Act
+        response = self.app.get('/metrics')
+        
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertIn('coalescing', data)
+        self.assertGreaterEqual(data['coalescing']['executed'], 1)
+        self.assertEqual(data['coalescing']['in_flight'], 0)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Add the server and benchmarks directories to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+with patch('database.MongoDB.init_app'):
+    from bench_models import CASES, compare, measure, stored_dogs
+
+def make_results(relative_speed, peak_bytes_per_doc):
+    """Build results with one case at 1000 documents"""
+    return {'results': {'dog_init': {'1000': {
+        'docs_per_sec': relative_speed * 1000, 'relative_speed': relative_speed, 'peak_bytes_per_doc': peak_bytes_per_doc
+    }}}}
+
+class TestModelBenchmarks(unittest.TestCase):
+    def test_every_case_runs(self):
+        """Test that each case processes its documents, and that one is measured"""
+        docs = stored_dogs(3)
+
+        for name, case in CASES.items():
+            with self.subTest(case=name):
+                self.assertTrue(case(docs)())
+        metrics = measure(CASES['dog_to_dict'](docs), 3, repeat=3, min_time=0.001)
+        self.assertGreater(metrics['docs_per_sec'], 0)
+        self.assertGreater(metrics['peak_bytes_per_doc'], 0)
+
+    def test_compare_against_baseline(self):
+        """Test that only changes beyond the threshold in the wrong direction are regressions"""
+        # Arrange
+        baseline = make_results(100, 200)
+
+        # Act
+        faster = compare(make_results(150, 150), baseline, 0.25)
+        within = compare(make_results(80, 240), baseline, 0.25)
+        slower = compare(make_results(70, 260), baseline, 0.25)
+        new_case = compare(make_results(1, 1), {'results': {}}, 0.25)
+        single_doc = compare({'results': {'dog_init': {'1': make_results(1, 1000)['results']['dog_init']['1000']}}},
+                             {'results': {'dog_init': {'1': baseline['results']['dog_init']['1000']}}}, 0.25)
+
+        # Assert
+        self.assertEqual(faster, [])
+        self.assertEqual(within, [])
+        self.assertEqual(len(slower), 2)
+        self.assertIn('relative_speed', slower[0])
+        self.assertIn('peak_bytes_per_doc', slower[1])
+        self.assertEqual(new_case, [])
+        self.assertEqual(single_doc, [])
+
+if __name__ == '__main__':
+    unittest.main()
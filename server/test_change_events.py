@@ -0,0 +1,183 @@
+import unittest
+import os
+import sys
+import time
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from change_events import ChangeEvent, ChangeStreamBroadcaster, Subscription
+
+class FakeChangeStream:
+    """Minimal stand-in for a pymongo ChangeStream"""
+
+    def __init__(self, changes):
+        self._changes = list(changes)
+        self.resume_token = None
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+    def try_next(self):
+        if not self._changes:
+            time.sleep(0.01)
+            return None
+        change = self._changes.pop(0)
+        self.resume_token = change['_id']
+        return change
+
+class FakeCollection:
+    def __init__(self, changes):
+        self.changes = changes
+        self.watch_calls = []
+
+    def watch(self, pipeline, **kwargs):
+        self.watch_calls.append(kwargs)
+        return FakeChangeStream(self.changes)
+
+def make_change(token, operation, dog_id, **document):
+    change = {
+        '_id': {'_data': token},
+        'operationType': operation,
+        'documentKey': {'_id': dog_id}
+    }
+    if operation != 'delete':
+        change['fullDocument'] = dict(document, _id=dog_id)
+    return change
+
+class TestChangeStreamBroadcaster(unittest.TestCase):
+    def test_to_event_formats_inserts_updates_and_deletes(self):
+        """Test conversion of change documents to client events"""
+        # Arrange
+        dog_id = ObjectId()
+        broadcaster = ChangeStreamBroadcaster(lambda: None, resolve_breed=lambda breed_id: 'Labrador')
+
+        # Act
+        insert = broadcaster.to_event(make_change('01', 'insert', dog_id, name='Buddy', status='Available', breed_id=ObjectId()))
+        update = broadcaster.to_event(make_change('02', 'update', dog_id, name='Buddy', status='Adopted'))
+        delete = broadcaster.to_event(make_change('03', 'delete', dog_id))
+
+        # Assert
+        self.assertEqual((insert.type, insert.id), ('insert', '01'))
+        self.assertEqual(insert.data, {'id': str(dog_id), 'name': 'Buddy', 'status': 'Available', 'breed': 'Labrador'})
+        self.assertEqual(update.data['status'], 'Adopted')
+        self.assertEqual(delete.data, {'id': str(dog_id)})
+        self.assertEqual(delete.encode(), f'id: 03\nevent: delete\ndata: {{"id":"{dog_id}"}}\n\n')
+
+    def test_publish_fans_out_to_every_subscriber(self):
+        """Test that one event reaches every connected client and listener"""
+        # Arrange
+        broadcaster = ChangeStreamBroadcaster(lambda: None)
+        broadcaster.start = lambda: None
+        seen = []
+        broadcaster.add_listener(seen.append)
+        first = broadcaster.subscribe()
+        second = broadcaster.subscribe()
+        event = ChangeEvent('01', 'delete', {'id': '1'})
+
+        # Act
+        broadcaster.publish(event)
+
+        # Assert
+        self.assertIs(first.get(timeout=1), event)
+        self.assertIs(second.get(timeout=1), event)
+        self.assertEqual(seen, [event])
+
+    def test_reconnect_replays_missed_events(self):
+        """Test that Last-Event-ID replays events from the history"""
+        # Arrange
+        broadcaster = ChangeStreamBroadcaster(lambda: None)
+        broadcaster.start = lambda: None
+        for token in ['01', '02', '03']:
+            broadcaster.publish(ChangeEvent(token, 'delete', {'id': token}))
+
+        # Act
+        resumed = broadcaster.subscribe(last_event_id='01')
+        unknown = broadcaster.subscribe(last_event_id='00')
+
+        # Assert
+        self.assertEqual([resumed.get(timeout=1).id, resumed.get(timeout=1).id], ['02', '03'])
+        self.assertIsNone(resumed.get(timeout=0.01))
+        self.assertIs(unknown.get(timeout=1), Subscription.RESET)
+
+    def test_slow_subscriber_is_dropped(self):
+        """Test that a client that stops reading is reset instead of buffering forever"""
+        # Arrange
+        broadcaster = ChangeStreamBroadcaster(lambda: None, queue_size=2)
+        broadcaster.start = lambda: None
+        slow = broadcaster.subscribe()
+
+        # Act
+        for token in ['01', '02', '03']:
+            broadcaster.publish(ChangeEvent(token, 'delete', {'id': token}))
+
+        # Assert
+        self.assertIs(slow.get(timeout=1), Subscription.RESET)
+        self.assertEqual(broadcaster.stats()['subscribers'], 0)
+        self.assertEqual(broadcaster.stats()['subscribers_dropped'], 1)
+
+    def test_watcher_publishes_changes(self):
+        """Test that the watcher thread fans out changes from the stream"""
+        # Arrange
+        dog_id = ObjectId()
+        collection = FakeCollection([make_change('01', 'update', dog_id, name='Buddy', status='Pending')])
+        broadcaster = ChangeStreamBroadcaster(lambda: collection, max_await_ms=10)
+
+        # Act
+        subscription = broadcaster.subscribe()
+        event = subscription.get(timeout=2)
+        broadcaster.stop()
+
+        # Assert
+        self.assertEqual(event.data['status'], 'Pending')
+        self.assertEqual(collection.watch_calls[0]['full_document'], 'updateLookup')
+
+    def test_disabled_broadcaster_does_not_watch(self):
+        """Test that subscribing does not start the watcher when change streams are off"""
+        # Arrange
+        collection = FakeCollection([])
+        broadcaster = ChangeStreamBroadcaster(lambda: collection, enabled=False)
+
+        # Act
+        broadcaster.subscribe()
+
+        # Assert
+        self.assertFalse(broadcaster.stats()['running'])
+        self.assertEqual(collection.watch_calls, [])
+
+@unittest.skipUnless(os.getenv('MONGODB_REPLSET_URI'), 'requires a local replica-set mongod (scripts/start_replica_set.sh)')
+class TestChangeStreamReplicaSet(unittest.TestCase):
+    def test_status_change_arrives_within_a_second(self):
+        """Test end to end against a real change stream"""
+        from pymongo import MongoClient
+
+        client = MongoClient(os.environ['MONGODB_REPLSET_URI'])
+        collection = client['dogshelter_test']['dogs']
+        broadcaster = ChangeStreamBroadcaster(lambda: collection)
+        try:
+            subscription = broadcaster.subscribe()
+            time.sleep(0.5)  # let the watcher open its cursor
+
+            dog_id = collection.insert_one({'name': 'Buddy', 'status': 'Available'}).inserted_id
+            started = time.monotonic()
+            collection.update_one({'_id': dog_id}, {'$set': {'status': 'Adopted'}})
+            collection.delete_one({'_id': dog_id})
+
+            events = [subscription.get(timeout=2) for _ in range(3)]
+            elapsed = time.monotonic() - started
+        finally:
+            broadcaster.stop()
+            client.close()
+
+        self.assertEqual([event.type for event in events], ['insert', 'update', 'delete'])
+        self.assertEqual(events[1].data['status'], 'Adopted')
+        self.assertLess(elapsed, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
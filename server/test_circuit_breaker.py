@@ -0,0 +1,186 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo.errors import AutoReconnect, ConnectionFailure, ExecutionTimeout
+
+from database import CircuitBreaker, CircuitOpenError, DatabaseBusyError, DeadlineExceeded, MongoDB, _BreakerListener
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+    from models import Dog
+    from models.payloads import EncodedPayload, PayloadCache, payload_cache
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker opens at the threshold and a success resets the count"""
+        # Arrange
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        # Act
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        still_closed = breaker.state
+        breaker.record_failure()
+
+        # Assert
+        self.assertEqual(still_closed, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.check()
+        self.assertGreater(raised.exception.retry_after, 59)
+        self.assertEqual(breaker.stats()['trips'], 1)
+
+    def test_half_open_probe(self):
+        """Test that calls are let through after the reset timeout and one failure reopens the breaker"""
+        # Arrange
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        # Act
+        breaker.check()
+        half_open = breaker.state
+        breaker.record_failure()
+
+        # Assert
+        self.assertEqual(half_open, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.stats()['trips'], 2)
+
+    def test_half_open_lets_one_probe_through(self):
+        """Test that only one call probes a half-open breaker until it reports back"""
+        # Arrange
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        # Act
+        breaker.check()
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+        breaker.record_success()
+        breaker.check()
+
+        # Assert
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_max_time_expiry_is_not_a_failure(self):
+        """Test that a query exceeding maxTimeMS does not count towards opening the breaker"""
+        # Arrange
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        listener = _BreakerListener(breaker)
+
+        # Act
+        listener.failed(MagicMock(failure={'code': 50, 'errmsg': 'operation exceeded time limit'}))
+        still_closed = breaker.state
+        listener.failed(MagicMock(failure={'errtype': 'AutoReconnect'}))
+
+        # Assert
+        self.assertEqual(still_closed, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_superseded_dog_indexes_are_dropped(self):
+        """Test that index creation drops the single-field dog indexes the compound ones replace"""
+        # Arrange
+        manager = MongoDB()
+        collection = MagicMock()
+        collection.index_information.return_value = {'_id_': {}, 'name_1': {}, 'updated_at_1__id_1': {}}
+        manager.get_collection = MagicMock(return_value=collection)
+
+        # Act
+        manager._create_indexes()
+
+        # Assert
+        dropped = [call.args[0] for call in collection.drop_index.call_args_list]
+        self.assertEqual(dropped, ['name_1', 'updated_at_1__id_1'])
+
+    def test_open_error_is_a_connection_failure(self):
+        """Test that code retrying transient PyMongo errors also retries an open circuit"""
+        self.assertTrue(issubclass(CircuitOpenError, ConnectionFailure))
+        self.assertTrue(issubclass(CircuitOpenError, DatabaseBusyError))
+
+class TestDeadlines(unittest.TestCase):
+    def setUp(self):
+        self.database = MongoDB()
+
+    def test_max_time_is_capped_by_the_deadline(self):
+        """Test that queries get the default budget, or what is left of the deadline if less"""
+        with self.database.deadline(0.2):
+            budget = self.database.max_time_ms()
+            self.assertLessEqual(budget, 200)
+            self.assertGreater(budget, 100)
+            with self.database.deadline(10):
+                self.assertLessEqual(self.database.max_time_ms(), 200)
+
+        self.assertEqual(self.database.max_time_ms(), 5000)
+        self.assertEqual(self.database.max_time_ms(30), 30000)
+
+    def test_expired_deadline_raises(self):
+        """Test that no query is started once the deadline has passed"""
+        with self.database.deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                self.database.max_time_ms()
+
+    def test_server_timeouts_become_deadline_errors(self):
+        """Test that a query killed by maxTimeMS surfaces as DeadlineExceeded"""
+        with self.assertRaises(DeadlineExceeded):
+            with self.database.query_slot():
+                raise ExecutionTimeout('operation exceeded time limit', 50)
+
+class TestFailFast(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        payload_cache.clear()
+
+    @patch('models.dog.db')
+    def test_find_by_id_propagates_database_errors(self, mock_db):
+        """Test that only invalid IDs are treated as not found"""
+        # Arrange
+        mock_db.get_collection.return_value.find_one.side_effect = AutoReconnect('connection reset')
+
+        # Act / Assert
+        self.assertIsNone(Dog.find_by_id('not-an-id'))
+        with self.assertRaises(AutoReconnect):
+            Dog.find_by_id('507f1f77bcf86cd799439011')
+
+    def test_stale_payload_served_while_database_is_down(self):
+        """Test that an outdated payload is served when the rebuild fails with a database error"""
+        # Arrange
+        cache = PayloadCache(stale_on=(ConnectionFailure,))
+        cache.get_or_build('breeds:list', 1, lambda: EncodedPayload.from_data(['Labrador']))
+
+        def failing_build():
+            raise CircuitOpenError('MongoDB is unavailable')
+
+        # Act
+        payload = cache.get_or_build('breeds:list', 2, failing_build)
+
+        # Assert
+        self.assertEqual(payload.body, b'["Labrador"]')
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+        with self.assertRaises(CircuitOpenError):
+            cache.get_or_build('dogs:detail:1', 1, failing_build)
+
+    @patch('models.dog.Dog.find_with_breed_info')
+    def test_open_circuit_returns_503(self, mock_find_with_breed):
+        """Test that routes fail fast with 503 and Retry-After while the circuit is open"""
+        # Arrange
+        mock_find_with_breed.side_effect = CircuitOpenError('MongoDB is unavailable', retry_after=4.2)
+
+        # Act
+        response = self.client.get('/api/dogs')
+
+        # Assert
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import threading
+import time
+import os
+import sys
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.datastructures import MultiDict
+
+from coalescing import RequestCoalescer
+
+class TestRequestCoalescer(unittest.TestCase):
+    def _run_concurrently(self, coalescer, key, fn, callers):
+        """Helper method to call coalescer.do from several threads at once"""
+        results = []
+        errors = []
+
+        def worker():
+            try:
+                results.append(coalescer.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def _wait_for_coalesced(self, coalescer, count):
+        """Helper method to wait until the expected number of callers are waiting"""
+        deadline = time.monotonic() + 5
+        while coalescer.stats()['coalesced'] < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that identical concurrent calls run the function once"""
+        # Arrange
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return b'[]'
+
+        # Act
+        threads, results, errors = self._run_concurrently(coalescer, '/api/dogs', fn, 5)
+        self._wait_for_coalesced(coalescer, 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [])
+        self.assertEqual([result for result, _ in results], [b'[]'] * 5)
+        self.assertTrue(all(shared for _, shared in results))
+
+        stats = coalescer.stats()
+        self.assertEqual(stats['executed'], 1)
+        self.assertEqual(stats['coalesced'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_errors_propagate_to_waiters(self):
+        """Test that a failing leader raises the same error for every caller"""
+        # Arrange
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+
+        def fn():
+            release.wait(5)
+            raise RuntimeError("database unavailable")
+
+        # Act
+        threads, results, errors = self._run_concurrently(coalescer, '/api/dogs', fn, 3)
+        self._wait_for_coalesced(coalescer, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(str(e) == "database unavailable" for e in errors))
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Test that a finished call does not serve later requests"""
+        coalescer = RequestCoalescer()
+
+        first, first_shared = coalescer.do('/api/breeds', lambda: 1)
+        second, second_shared = coalescer.do('/api/breeds', lambda: 2)
+
+        self.assertEqual((first, second), (1, 2))
+        self.assertFalse(first_shared or second_shared)
+        self.assertEqual(coalescer.stats()['executed'], 2)
+
+    def test_disabled_coalescer_calls_through(self):
+        """Test that a disabled coalescer never records in-flight calls"""
+        coalescer = RequestCoalescer(enabled=False)
+
+        result, shared = coalescer.do('/api/dogs', lambda: 'ok')
+
+        self.assertEqual(result, 'ok')
+        self.assertFalse(shared)
+        self.assertEqual(coalescer.stats()['executed'], 0)
+
+    def test_make_key_normalizes_parameter_order(self):
+        """Test that parameter order does not change the key"""
+        first = RequestCoalescer.make_key('/api/dogs', MultiDict([('status', 'Available'), ('breed', 'Pug')]))
+        second = RequestCoalescer.make_key('/api/dogs', MultiDict([('breed', 'Pug'), ('status', 'Available')]))
+
+        self.assertEqual(first, second)
+        self.assertEqual(RequestCoalescer.make_key('/api/dogs', MultiDict()), '/api/dogs')
+
+if __name__ == '__main__':
+    unittest.main()
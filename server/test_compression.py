@@ -0,0 +1,79 @@
+import unittest
+import gzip
+import os
+import sys
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, Response
+
+from compression import Compression
+from config import TestingConfig
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        """Set up a small app with the compression hook"""
+        app = Flask(__name__)
+        self.compression = Compression(app, TestingConfig)
+        self.compression.min_size = 100
+
+        @app.route('/large')
+        def large():
+            return Response(b'{"name":"Buddy"}' * 50, mimetype='application/json')
+
+        @app.route('/small')
+        def small():
+            return Response(b'{}', mimetype='application/json')
+
+        @app.route('/html')
+        def html():
+            return Response(b'<p>dog</p>' * 100, mimetype='text/html')
+
+        @app.route('/stream')
+        def stream():
+            return Response((b'{"id":%d}\n' % i for i in range(100)), mimetype='application/json')
+
+        @app.route('/encoded')
+        def encoded():
+            return Response(gzip.compress(b'{}' * 100), mimetype='application/json',
+                            headers={'Content-Encoding': 'gzip'})
+
+        self.client = app.test_client()
+
+    def test_large_json_is_compressed(self):
+        """Test that JSON above the size threshold is gzip-encoded"""
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), b'{"name":"Buddy"}' * 50)
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+
+    def test_thresholds_are_respected(self):
+        """Test that small bodies, other content types and clients without gzip are untouched"""
+        small = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        html = self.client.get('/html', headers={'Accept-Encoding': 'gzip'})
+        identity = self.client.get('/large')
+
+        self.assertNotIn('Content-Encoding', small.headers)
+        self.assertNotIn('Content-Encoding', html.headers)
+        self.assertNotIn('Content-Encoding', identity.headers)
+        self.assertIn('Accept-Encoding', identity.headers['Vary'])
+
+    def test_streamed_response_is_compressed_incrementally(self):
+        """Test that streamed bodies are compressed chunk by chunk"""
+        response = self.client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        expected = b''.join(b'{"id":%d}\n' % i for i in range(100))
+        self.assertEqual(gzip.decompress(response.data), expected)
+
+    def test_precompressed_response_is_passed_through(self):
+        """Test that responses that already carry Content-Encoding are not compressed twice"""
+        response = self.client.get('/encoded', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(gzip.decompress(response.data), b'{}' * 100)
+
+if __name__ == '__main__':
+    unittest.main()
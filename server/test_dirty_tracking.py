@@ -0,0 +1,159 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from models import Breed, ConcurrentModificationError, Dog
+
+LOADED_AT = '2024-01-01T00:00:00'
+
+class TestDirtyTracking(unittest.TestCase):
+    def setUp(self):
+        """Load a dog and a breed as they come back from MongoDB"""
+        self.dog = Dog.from_dict({
+            '_id': ObjectId(),
+            'shelter_id': 'north',
+            'name': 'Buddy',
+            'breed_id': str(ObjectId()),
+            'age': 3,
+            'gender': 'Male',
+            'description': 'A friendly dog',
+            'status': 'Available',
+            'intake_date': '2023-12-01T00:00:00',
+            'created_at': LOADED_AT,
+            'updated_at': LOADED_AT
+        })
+        self.breed = Breed.from_dict({
+            '_id': ObjectId(),
+            'name': 'Labrador',
+            'description': 'A friendly breed',
+            'created_at': LOADED_AT,
+            'updated_at': LOADED_AT
+        })
+        self.collection = MagicMock()
+        self.collection.update_one.return_value.matched_count = 1
+
+    @patch('models.dog.db')
+    def test_save_sets_only_changed_fields(self, mock_db):
+        """Test that an update only writes the changed field and updated_at"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+        self.dog.description = 'A very friendly dog'
+
+        # Act
+        self.dog.save()
+
+        # Assert
+        query, update = self.collection.update_one.call_args.args
+        self.assertEqual(query, {'_id': self.dog._id, 'shelter_id': 'north'})
+        self.assertEqual(set(update), {'$set'})
+        self.assertEqual(set(update['$set']), {'description', 'updated_at'})
+        self.assertEqual(update['$set']['description'], 'A very friendly dog')
+
+    @patch('models.dog.db')
+    def test_save_without_changes_skips_the_write(self, mock_db):
+        """Test that saving an unchanged dog does not hit the database"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+
+        # Act
+        self.dog.save()
+        self.dog.description = 'A very friendly dog'
+        self.dog.save()
+        self.dog.save()
+
+        # Assert
+        self.assertEqual(self.collection.update_one.call_count, 1)
+
+    @patch('models.dog.db')
+    def test_cleared_fields_are_unset(self, mock_db):
+        """Test that fields set to None are removed with $unset"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+        self.dog.age = None
+
+        # Act
+        self.dog.save()
+
+        # Assert
+        _, update = self.collection.update_one.call_args.args
+        self.assertEqual(update['$unset'], {'age': ''})
+        self.assertNotIn('age', update['$set'])
+
+    @patch('models.dog.db')
+    def test_missing_dog_raises(self, mock_db):
+        """Test that updating a deleted dog raises ValueError"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+        self.collection.update_one.return_value.matched_count = 0
+        self.dog.age = 4
+
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            self.dog.save()
+
+    @patch('models.dog.db')
+    def test_concurrent_modification(self, mock_db):
+        """Test optimistic concurrency on updated_at"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+        self.collection.update_one.return_value.matched_count = 0
+        self.collection.count_documents.return_value = 1
+        self.dog.age = 4
+
+        # Act
+        with self.assertRaises(ConcurrentModificationError):
+            self.dog.save(check_conflicts=True)
+
+        # Assert
+        query, _ = self.collection.update_one.call_args.args
+        self.assertEqual(query, {'_id': self.dog._id, 'shelter_id': 'north', 'updated_at': LOADED_AT})
+
+    @patch('models.dog.db')
+    def test_repeated_saves_with_conflict_checks(self, mock_db):
+        """Test that each save filters on the updated_at the previous save wrote"""
+        # Arrange
+        stored = {'updated_at': LOADED_AT}
+
+        def update_one(query, update):
+            matched = query['updated_at'] == stored['updated_at']
+            if matched:
+                stored.update(update['$set'])
+            return MagicMock(matched_count=int(matched))
+
+        mock_db.get_collection.return_value = self.collection
+        self.collection.update_one.side_effect = update_one
+
+        # Act
+        self.dog.age = 4
+        self.dog.save(check_conflicts=True)
+        self.dog.age = 5
+        self.dog.save(check_conflicts=True)
+
+        # Assert
+        self.assertEqual(self.collection.update_one.call_count, 2)
+        self.assertEqual(stored['age'], 5)
+        self.assertIsInstance(stored['updated_at'], str)
+
+    @patch('models.breed.db')
+    def test_breed_save_sets_only_changed_fields(self, mock_db):
+        """Test that Breed.save also writes only changed fields"""
+        # Arrange
+        mock_db.get_collection.return_value = self.collection
+        self.breed.name = 'Labrador Retriever'
+
+        # Act
+        self.breed.save()
+
+        # Assert
+        _, update = self.collection.update_one.call_args.args
+        self.assertEqual(set(update['$set']), {'name', 'updated_at'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import csv
+import io
+import os
+import sys
+from datetime import datetime
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+
+from dog_export import FORMATS, export_csv, pa
+
+def make_batches():
+    """Helper function to create two batches of raw dog documents"""
+    breed_id = ObjectId()
+    return [
+        [
+            {'_id': ObjectId(), 'name': 'Buddy', 'breed_id': str(breed_id), 'breed': 'Labrador',
+             'age': 3, 'gender': 'Male', 'description': 'A friendly dog', 'status': 'Available',
+             'intake_date': '2024-01-02T03:04:05', 'adoption_date': None,
+             'created_at': '2024-01-02T03:04:05', 'updated_at': datetime(2024, 2, 1)}
+        ],
+        [
+            {'_id': ObjectId(), 'name': 'Max', 'breed_id': None, 'breed': None, 'age': 5,
+             'status': 'Adopted', 'updated_at': '2024-03-01T00:00:00'}
+        ]
+    ]
+
+class TestDogExport(unittest.TestCase):
+    def test_csv_streams_one_chunk_per_batch(self):
+        """Test that CSV is produced batch by batch with every column"""
+        chunks = list(export_csv(make_batches()))
+
+        self.assertEqual(len(chunks), 2)
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual([row['name'] for row in rows], ['Buddy', 'Max'])
+        self.assertEqual(rows[0]['breed'], 'Labrador')
+        self.assertEqual(rows[0]['updated_at'], '2024-02-01T00:00:00')
+        self.assertEqual(rows[1]['intake_date'], '')
+
+    def test_empty_csv_has_header(self):
+        """Test that an empty export still has a header row"""
+        self.assertEqual(b''.join(export_csv([])).decode('utf-8').strip(), ','.join(
+            ['id', 'name', 'breed_id', 'breed', 'age', 'gender', 'description', 'status',
+             'intake_date', 'adoption_date', 'created_at', 'updated_at']))
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_columnar_formats_round_trip(self):
+        """Test that Arrow IPC and Parquet exports read back as tables"""
+        import pyarrow.parquet as pq
+
+        arrow = pa.ipc.open_stream(b''.join(FORMATS['arrow'].writer(make_batches()))).read_all()
+        parquet = pq.read_table(io.BytesIO(b''.join(FORMATS['parquet'].writer(make_batches()))))
+
+        for table in (arrow, parquet):
+            self.assertEqual(table.num_rows, 2)
+            self.assertEqual(table.column('name').to_pylist(), ['Buddy', 'Max'])
+            self.assertEqual(table.column('updated_at').to_pylist()[0], datetime(2024, 2, 1))
+
+class TestExportEndpoint(unittest.TestCase):
+    def setUp(self):
+        """Set up test client"""
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+
+    @patch('models.dog.Dog.find_for_export')
+    @patch('models.dog.Dog.latest_update')
+    def test_incremental_export(self, mock_latest_update, mock_find_for_export):
+        """Test that since, the watermark and batch_size are passed to the model"""
+        # Arrange
+        watermark = datetime(2024, 3, 1)
+        mock_latest_update.return_value = watermark
+        mock_find_for_export.return_value = iter(make_batches())
+
+        # Act
+        response = self.app.get('/api/dogs/export?format=csv&since=2024-01-01T00:00:00&batch_size=500')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(response.headers['X-Export-Watermark'], watermark.isoformat())
+        mock_find_for_export.assert_called_once_with(datetime(2024, 1, 1), watermark, 500)
+        self.assertEqual(len(response.data.decode('utf-8').strip().splitlines()), 3)
+
+    def test_invalid_parameters(self):
+        """Test that bad formats and timestamps are rejected"""
+        self.assertEqual(self.app.get('/api/dogs/export?format=xlsx').status_code, 400)
+        self.assertEqual(self.app.get('/api/dogs/export?since=yesterday').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from models.dog import AdoptionStatus
+    from models.snapshot import DogSnapshot, np
+    from models.snapshot_file import StringHeap
+
+LAB_ID = str(ObjectId())
+PUG_ID = str(ObjectId())
+
+def _change(name, breed_id, breed, age, status, intake_date=None):
+    """Build a dog in the shape returned by the sync API"""
+    return {
+        'id': str(ObjectId()),
+        'name': name,
+        'breed_id': breed_id,
+        'breed': breed,
+        'age': age,
+        'gender': 'Male',
+        'description': 'A friendly dog',
+        'status': status.value,
+        'intake_date': intake_date,
+        'adoption_date': None
+    }
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestDogSnapshot(unittest.TestCase):
+    def setUp(self):
+        """Build a snapshot of a few dogs"""
+        self.snapshot = DogSnapshot([status.value for status in AdoptionStatus])
+        self.dogs = [
+            _change('Max', LAB_ID, 'Labrador', 5, AdoptionStatus.AVAILABLE, '2024-01-03T00:00:00'),
+            _change('Buddy', LAB_ID, 'Labrador', 3, AdoptionStatus.AVAILABLE, '2024-01-01T00:00:00'),
+            _change('Luna', PUG_ID, 'Pug', 5, AdoptionStatus.ADOPTED, '2024-01-02T00:00:00'),
+            _change('Daisy', PUG_ID, 'Pug', None, AdoptionStatus.PENDING)
+        ]
+        self.snapshot._columns = self.snapshot._apply(None, self.dogs, set())
+
+    def test_query_sorted_by_name(self):
+        """Test that the default ordering matches the name sort of the aggregation"""
+        # Act
+        result = self.snapshot.query()
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in result], ['Buddy', 'Daisy', 'Luna', 'Max'])
+        self.assertEqual(result[0]['_id'], self.dogs[1]['id'])
+        self.assertEqual(result[0]['breed'], 'Labrador')
+        self.assertIsNone(result[1]['age'])
+
+    def test_query_filters(self):
+        """Test status, breed and age filters"""
+        # Act
+        available = self.snapshot.query(status=AdoptionStatus.AVAILABLE)
+        pugs = self.snapshot.query(breed_id=PUG_ID)
+        older = self.snapshot.query(min_age=4)
+        unknown_breed = self.snapshot.query(breed_id=str(ObjectId()))
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in available], ['Buddy', 'Max'])
+        self.assertEqual([dog['name'] for dog in pugs], ['Daisy', 'Luna'])
+        self.assertEqual([dog['name'] for dog in older], ['Luna', 'Max'])
+        self.assertEqual(unknown_breed, [])
+
+    def test_query_sort_breaks_ties_by_name(self):
+        """Test descending sorts keep name order for equal keys"""
+        # Act
+        by_age = self.snapshot.query(min_age=0, sort='-age')
+        by_intake = self.snapshot.query(sort='intake_date')
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in by_age], ['Luna', 'Max', 'Buddy'])
+        self.assertEqual([dog['name'] for dog in by_intake], ['Daisy', 'Buddy', 'Luna', 'Max'])
+
+    def test_query_rejects_unknown_sort(self):
+        """Test that unsupported sort fields raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.snapshot.query(sort='description')
+
+    def test_stats(self):
+        """Test counts by status and breed and the age summary"""
+        # Act
+        result = self.snapshot.stats()
+
+        # Assert
+        self.assertEqual(result['total'], 4)
+        self.assertEqual(result['by_status'], {'Available': 2, 'Adopted': 1, 'Pending': 1})
+        self.assertEqual(result['by_breed'], {'Labrador': 2, 'Pug': 2})
+        self.assertEqual(result['age'], {'min': 3, 'max': 5, 'mean': 13 / 3})
+
+    def test_apply_updates_inserts_and_deletes(self):
+        """Test that a delta replaces changed dogs, appends new ones and drops deleted ones"""
+        # Arrange
+        updated = dict(self.dogs[0], status=AdoptionStatus.ADOPTED.value)
+        inserted = _change('Rocky', LAB_ID, 'Labrador', 1, AdoptionStatus.AVAILABLE)
+        deleted = {self.dogs[2]['id']}
+
+        # Act
+        self.snapshot._columns = self.snapshot._apply(self.snapshot._columns, [updated, inserted], deleted)
+
+        # Assert
+        result = self.snapshot.query()
+        self.assertEqual([dog['name'] for dog in result], ['Buddy', 'Daisy', 'Max', 'Rocky'])
+        self.assertEqual(result[2]['status'], AdoptionStatus.ADOPTED.value)
+
+    def test_query_omits_missing_breeds(self):
+        """Test that dogs without a breed have no breed field, like the aggregation"""
+        # Arrange
+        stray = _change('Scout', None, None, 2, AdoptionStatus.AVAILABLE)
+        self.snapshot._columns = self.snapshot._apply(self.snapshot._columns, [stray], set())
+
+        # Act
+        result = self.snapshot.query(min_age=2, max_age=2)
+
+        # Assert
+        self.assertEqual(result[0]['name'], 'Scout')
+        self.assertNotIn('breed', result[0])
+
+    @patch('models.breed.Breed.names_by_id', return_value={LAB_ID: 'Labrador Retriever', PUG_ID: 'Pug'})
+    @patch('dog_sync.changes_since')
+    def test_refresh_picks_up_renamed_breeds(self, mock_changes_since, mock_names_by_id):
+        """Test that a refresh reloads breed names even when no dog changed"""
+        # Arrange
+        from dog_sync import SyncToken
+        mock_changes_since.return_value = {'reset': False, 'changes': [], 'deleted': [], 'next': SyncToken().encode(), 'has_more': False}
+
+        # Act
+        self.snapshot.refresh()
+
+        # Assert
+        self.assertEqual(self.snapshot.query(breed_id=LAB_ID)[0]['breed'], 'Labrador Retriever')
+        self.assertEqual(self.snapshot.stats()['by_breed'], {'Labrador Retriever': 2, 'Pug': 2})
+
+    @patch('models.breed.Breed.names_by_id', return_value={})
+    @patch('dog_sync.changes_since')
+    def test_refresh_pages_through_changes(self, mock_changes_since, mock_names_by_id):
+        """Test that refresh loads every page and keeps the last token"""
+        # Arrange
+        from dog_sync import SyncToken
+        snapshot = DogSnapshot([status.value for status in AdoptionStatus])
+        mock_changes_since.side_effect = [
+            {'reset': False, 'changes': self.dogs[:2], 'deleted': [], 'next': SyncToken().encode(), 'has_more': True},
+            {'reset': False, 'changes': self.dogs[2:], 'deleted': [], 'next': SyncToken().encode(), 'has_more': False}
+        ]
+
+        # Act
+        snapshot.refresh()
+
+        # Assert
+        self.assertTrue(snapshot.ready)
+        self.assertEqual(snapshot.info()['rows'], 4)
+        self.assertEqual(mock_changes_since.call_count, 2)
+
+    @patch('models.breed.Breed.names_by_id', return_value={})
+    @patch('dog_sync.changes_since')
+    def test_reset_keeps_serving_until_reloaded(self, mock_changes_since, mock_names_by_id):
+        """Test that requests during a full reload still read the previous snapshot"""
+        # Arrange
+        from dog_sync import SyncToken
+        served_during_reload = []
+
+        def changes_since(token, page_size, tombstone_ttl):
+            served_during_reload.append([dog['name'] for dog in self.snapshot.query()])
+            if mock_changes_since.call_count == 1:
+                return {'reset': True, 'changes': [], 'deleted': [], 'next': None, 'has_more': False}
+            return {'reset': False, 'changes': self.dogs[:1], 'deleted': [], 'next': SyncToken().encode(), 'has_more': False}
+
+        mock_changes_since.side_effect = changes_since
+
+        # Act
+        self.snapshot.refresh()
+
+        # Assert
+        self.assertEqual(served_during_reload, [['Buddy', 'Daisy', 'Luna', 'Max']] * 2)
+        self.assertEqual([dog['name'] for dog in self.snapshot.query()], ['Max'])
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestDogSnapshotFile(unittest.TestCase):
+    def setUp(self):
+        """Build a snapshot and a scratch directory for its file"""
+        self.snapshot = DogSnapshot([status.value for status in AdoptionStatus])
+        self.dogs = [
+            _change('Max', LAB_ID, 'Labrador', 5, AdoptionStatus.AVAILABLE, '2024-01-03T00:00:00'),
+            _change('Bäcker', PUG_ID, 'Pug', None, AdoptionStatus.PENDING)
+        ]
+        self.snapshot._columns = self.snapshot._apply(None, self.dogs, set())
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'dogs.snap')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Test that a mapped file answers queries like the snapshot that wrote it"""
+        # Arrange
+        breeds = [{'id': LAB_ID, 'name': 'Labrador', 'description': None}]
+        self.snapshot.save(self.path, breeds=breeds)
+        mapped = DogSnapshot([status.value for status in AdoptionStatus])
+
+        # Act
+        metadata = mapped.load(self.path)
+
+        # Assert
+        self.assertEqual(metadata['breeds'], breeds)
+        self.assertIsInstance(mapped._columns.names, StringHeap)
+        self.assertEqual(mapped.query(), self.snapshot.query())
+        self.assertEqual(mapped.stats(), self.snapshot.stats())
+
+    def test_deltas_apply_to_mapped_file(self):
+        """Test that changes fetched after mapping are merged into the mapped columns"""
+        # Arrange
+        self.snapshot.save(self.path)
+        mapped = DogSnapshot([status.value for status in AdoptionStatus])
+        mapped.load(self.path)
+        inserted = _change('Rocky', LAB_ID, 'Labrador', 1, AdoptionStatus.AVAILABLE)
+
+        # Act
+        mapped._columns = mapped._apply(mapped._columns, [inserted], {self.dogs[0]['id']})
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in mapped.query()], ['Bäcker', 'Rocky'])
+        self.assertEqual(mapped.query(breed_id=LAB_ID)[0]['breed'], 'Labrador')
+
+    def test_rejects_other_files(self):
+        """Test that files that are not snapshots raise ValueError"""
+        # Arrange
+        with open(self.path, 'wb') as file:
+            file.write(b'not a snapshot file')
+
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            DogSnapshot([status.value for status in AdoptionStatus]).load(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
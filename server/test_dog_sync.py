@@ -0,0 +1,188 @@
+import unittest
+import base64
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+
+from dog_sync import SyncToken, changes_since
+
+class TestSyncToken(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that a token decodes to the same watermarks"""
+        dog_id = ObjectId()
+        token = SyncToken(datetime(2024, 1, 2, 3, 4, 5, 6), dog_id, datetime(2024, 1, 1), [])
+
+        decoded = SyncToken.decode(token.encode())
+
+        self.assertEqual(decoded.updated_at, token.updated_at)
+        self.assertEqual(decoded.updated_after_id, dog_id)
+        self.assertEqual(decoded.deleted_at, token.deleted_at)
+
+    def test_older_token_with_updated_ids(self):
+        """Test that tokens listing the dogs sent at the watermark continue after the last one"""
+        first, second = ObjectId(), ObjectId()
+        data = {'u': '2024-01-01T00:00:00', 'ui': [str(first), str(second)], 'd': None, 'di': []}
+        token = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+        self.assertEqual(SyncToken.decode(token).updated_after_id, second)
+
+    def test_malformed_token(self):
+        """Test that garbage tokens raise ValueError"""
+        with self.assertRaises(ValueError):
+            SyncToken.decode('not-a-token')
+
+class TestChangesSince(unittest.TestCase):
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_next_token_skips_dogs_at_the_watermark(self, mock_changed, mock_deleted):
+        """Test that dogs sharing the last timestamp are excluded from the next page"""
+        # Arrange
+        first, second = ObjectId(), ObjectId()
+        mock_changed.return_value = [
+            {'_id': first, 'name': 'Buddy', 'updated_at': '2024-01-01T00:00:00'},
+            {'_id': second, 'name': 'Max', 'updated_at': '2024-01-01T00:00:00'}
+        ]
+        mock_deleted.return_value = [{'_id': ObjectId(), 'deleted_at': datetime(2024, 1, 2)} for _ in range(2)]
+
+        # Act
+        result = changes_since(None, 2, timedelta(days=30))
+
+        # Assert
+        self.assertEqual([change['name'] for change in result['changes']], ['Buddy', 'Max'])
+        self.assertEqual(len(result['deleted']), 2)
+        self.assertTrue(result['has_more'])
+
+        token = SyncToken.decode(result['next'])
+        self.assertEqual(token.updated_at, datetime(2024, 1, 1))
+        self.assertEqual(token.updated_after_id, second)
+        self.assertEqual(token.deleted_at, datetime(2024, 1, 2))
+
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_bulk_write_at_one_timestamp(self, mock_changed, mock_deleted):
+        """Test that paging through many dogs sharing updated_at keeps the token the same size"""
+        # Arrange
+        dog_ids = sorted(ObjectId() for _ in range(6))
+        mock_changed.side_effect = [
+            [{'_id': dog_id, 'updated_at': '2024-01-01T00:00:00'} for dog_id in dog_ids[start:start + 2]]
+            for start in range(0, 6, 2)
+        ]
+        mock_deleted.return_value = []
+
+        # Act
+        tokens = []
+        token = None
+        for _ in range(3):
+            token = SyncToken.decode(changes_since(token, 2, timedelta(days=30))['next'])
+            tokens.append(token)
+
+        # Assert
+        self.assertEqual([call.args[1] for call in mock_changed.call_args_list], [None, dog_ids[1], dog_ids[3]])
+        self.assertEqual(tokens[-1].updated_after_id, dog_ids[5])
+        self.assertEqual(len({len(token.encode()) for token in tokens}), 1)
+
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_delete_watermark_follows_the_clock(self, mock_changed, mock_deleted):
+        """Test that a shelter without deletes never has its token expire"""
+        # Arrange
+        mock_changed.return_value = []
+        mock_deleted.return_value = []
+        token = SyncToken(datetime(2024, 1, 1), None, datetime.utcnow() - timedelta(days=29), [])
+
+        # Act
+        result = changes_since(token, 100, timedelta(days=30))
+
+        # Assert
+        next_token = SyncToken.decode(result['next'])
+        self.assertLess(datetime.utcnow() - next_token.deleted_at, timedelta(minutes=5))
+        self.assertEqual(next_token.updated_at, datetime(2024, 1, 1))
+
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_update_watermark_lags_the_clock(self, mock_changed, mock_deleted):
+        """Test that recently saved dogs are sent without moving the watermark past them"""
+        # Arrange
+        recent = datetime.utcnow() - timedelta(seconds=5)
+        mock_changed.return_value = [
+            {'_id': ObjectId(), 'name': 'Buddy', 'updated_at': '2024-01-01T00:00:00'},
+            {'_id': ObjectId(), 'name': 'Max', 'updated_at': recent.isoformat()}
+        ]
+        mock_deleted.return_value = []
+
+        # Act
+        result = changes_since(SyncToken(datetime(2024, 1, 1), None, datetime.utcnow(), []), 2, timedelta(days=30))
+
+        # Assert
+        next_token = SyncToken.decode(result['next'])
+        self.assertEqual([change['name'] for change in result['changes']], ['Buddy', 'Max'])
+        self.assertLess(next_token.updated_at, recent)
+        self.assertIsNone(next_token.updated_after_id)
+        self.assertFalse(result['has_more'])
+
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_delete_watermark_waits_for_a_full_page(self, mock_changed, mock_deleted):
+        """Test that the delete watermark only jumps ahead once every tombstone has been read"""
+        # Arrange
+        mock_changed.return_value = []
+        mock_deleted.return_value = [{'_id': ObjectId(), 'deleted_at': datetime(2024, 1, 2)}]
+
+        # Act
+        result = changes_since(SyncToken(deleted_at=datetime(2024, 1, 1)), 1, timedelta(days=36500))
+
+        # Assert
+        self.assertEqual(SyncToken.decode(result['next']).deleted_at, datetime(2024, 1, 2))
+
+    @patch('models.dog.Dog.find_changed_since')
+    def test_expired_token_requires_reset(self, mock_changed):
+        """Test that a token older than the tombstone TTL forces a full resync"""
+        token = SyncToken(datetime(2020, 1, 1), [], datetime(2020, 1, 1), [])
+
+        result = changes_since(token, 100, timedelta(days=30))
+
+        self.assertTrue(result['reset'])
+        mock_changed.assert_not_called()
+
+class TestChangesEndpoint(unittest.TestCase):
+    def setUp(self):
+        """Set up test client"""
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+
+    @patch('models.dog.Dog.find_deleted_since')
+    @patch('models.dog.Dog.find_changed_since')
+    def test_get_changes(self, mock_changed, mock_deleted):
+        """Test the changes endpoint passes the token watermarks to the model"""
+        # Arrange
+        mock_changed.return_value = []
+        mock_deleted.return_value = []
+        token = SyncToken(datetime(2024, 1, 1), [], datetime.utcnow(), [])
+
+        # Act
+        response = self.app.get(f'/api/dogs/changes?since={token.encode()}&limit=10')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual((data['changes'], data['deleted'], data['has_more']), ([], [], False))
+        mock_changed.assert_called_once_with(datetime(2024, 1, 1), None, 10)
+
+    def test_invalid_token(self):
+        """Test that an invalid token is rejected"""
+        response = self.app.get('/api/dogs/changes?since=bogus')
+
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from utils.ingest import Checkpoint, ingest, read_records, record_id, validate_dogs
+
+class TestValidation(unittest.TestCase):
+    def test_validate_dogs(self):
+        """Test that valid rows become documents and invalid rows become errors"""
+        # Arrange
+        breed_id = str(ObjectId())
+        rows = [
+            (0, {'Name': 'Buddy', 'Age': '3', 'Gender': 'Male', 'Breed': 'Labrador'}),
+            (1, {'Name': 'Max', 'Age': 'three'}),
+            (2, {'Name': 'Luna', 'Breed': 'Unicorn'})
+        ]
+
+        # Act
+        docs, errors = validate_dogs(rows, {'source': 'test', 'breed_ids': {'labrador': breed_id}})
+
+        # Assert
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(docs[0]['name'], 'Buddy')
+        self.assertEqual(docs[0]['age'], 3)
+        self.assertEqual(docs[0]['breed_id'], breed_id)
+        self.assertEqual(docs[0]['_id'], record_id({}, 'test', 0))
+        self.assertEqual(len(errors), 2)
+
+    def test_validate_dog_coordinates(self):
+        """Test that latitude and longitude columns become a GeoJSON location"""
+        # Arrange
+        rows = [
+            (0, {'Name': 'Buddy', 'Latitude': '47.61', 'Longitude': '-122.33'}),
+            (1, {'Name': 'Max', 'Latitude': '147.61', 'Longitude': '-122.33'})
+        ]
+
+        # Act
+        docs, errors = validate_dogs(rows, {'source': 'test'})
+
+        # Assert
+        self.assertEqual(docs[0]['location'], {'type': 'Point', 'coordinates': [-122.33, 47.61]})
+        self.assertEqual(len(errors), 1)
+
+    def test_record_ids_are_stable(self):
+        """Test that re-reading a source yields the same ids"""
+        self.assertEqual(record_id({}, 'dogs.csv', 7), record_id({}, 'dogs.csv', 7))
+        self.assertNotEqual(record_id({}, 'dogs.csv', 7), record_id({}, 'dogs.csv', 8))
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        """Create a scratch directory for input and checkpoint files"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.directory.name, 'dogs.checkpoint.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_ndjson(self):
+        """Test that NDJSON files are streamed record by record"""
+        # Arrange
+        path = os.path.join(self.directory.name, 'dogs.ndjson')
+        with open(path, 'w') as file:
+            file.write('{"name": "Buddy"}\n\n{"name": "Max"}\n')
+
+        # Act
+        records = list(read_records(path))
+
+        # Assert
+        self.assertEqual(records, [{'name': 'Buddy'}, {'name': 'Max'}])
+
+    @patch('utils.ingest._insert')
+    def test_ingest_writes_chunks(self, mock_insert):
+        """Test that every chunk of valid documents is inserted"""
+        # Arrange
+        mock_insert.side_effect = lambda collection_name, docs: (len(docs), 0, 0)
+        records = [{'name': f'Dog {i}', 'age': str(i)} for i in range(5)]
+
+        # Act
+        progress = ingest('dogs', records, 'test', chunk_size=2, validators=0, writers=2)
+
+        # Assert
+        self.assertEqual(progress.read, 5)
+        self.assertEqual(progress.written, 5)
+        self.assertEqual(mock_insert.call_count, 3)
+
+    @patch('utils.ingest._insert')
+    def test_ingest_resumes_from_checkpoint(self, mock_insert):
+        """Test that chunks recorded in the checkpoint are skipped"""
+        # Arrange
+        mock_insert.side_effect = lambda collection_name, docs: (len(docs), 0, 0)
+        checkpoint = Checkpoint(self.checkpoint_path, 'test', 2)
+        checkpoint.mark(0)
+        checkpoint.mark(2)
+        records = [{'name': f'Dog {i}'} for i in range(6)]
+
+        # Act
+        progress = ingest('dogs', records, 'test', chunk_size=2, validators=0, writers=1,
+                          checkpoint_path=self.checkpoint_path)
+
+        # Assert
+        self.assertEqual(progress.skipped, 4)
+        self.assertEqual(progress.written, 2)
+        self.assertEqual([doc['name'] for doc in mock_insert.call_args.args[1]], ['Dog 2', 'Dog 3'])
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    @patch('utils.ingest._insert')
+    def test_chunks_with_failed_writes_are_retried(self, mock_insert):
+        """Test that a chunk with failed writes is left out of the checkpoint"""
+        # Arrange
+        mock_insert.side_effect = lambda collection_name, docs: (1, 0, 1) if docs[0]['name'] == 'Dog 2' else (len(docs), 0, 0)
+        records = [{'name': f'Dog {i}'} for i in range(6)]
+
+        # Act
+        progress = ingest('dogs', records, 'test', chunk_size=2, validators=0, writers=1,
+                          checkpoint_path=self.checkpoint_path)
+
+        # Assert
+        self.assertEqual(progress.failed, 1)
+        checkpoint = Checkpoint(self.checkpoint_path, 'test', 2)
+        self.assertEqual([checkpoint.is_done(chunk_index) for chunk_index in range(3)], [True, False, True])
+
+    def test_checkpoint_compacts_contiguous_chunks(self):
+        """Test that the checkpoint keeps a watermark plus out-of-order chunks"""
+        # Arrange
+        checkpoint = Checkpoint(self.checkpoint_path, 'test', 100)
+
+        # Act
+        for chunk_index in (1, 0, 3):
+            checkpoint.mark(chunk_index)
+        reloaded = Checkpoint(self.checkpoint_path, 'test', 100)
+        other_source = Checkpoint(self.checkpoint_path, 'other', 100)
+
+        # Assert
+        self.assertEqual(reloaded.watermark, 2)
+        self.assertEqual(reloaded.completed, {3})
+        self.assertTrue(reloaded.is_done(3))
+        self.assertFalse(reloaded.is_done(2))
+        self.assertFalse(other_source.is_done(0))
+
+if __name__ == '__main__':
+    unittest.main()
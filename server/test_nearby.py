@@ -0,0 +1,84 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+    from models.dog import AdoptionStatus, Dog
+    from models.payloads import payload_cache
+
+SEATTLE = {'type': 'Point', 'coordinates': [-122.33, 47.61]}
+
+class TestDogLocation(unittest.TestCase):
+    def test_location_is_validated(self):
+        """Test that locations must be GeoJSON points with coordinates in range"""
+        dog = Dog(name='Buddy', location={'type': 'Point', 'coordinates': ['-122.33', 47.61]})
+
+        self.assertEqual(dog.to_dict()['location'], SEATTLE)
+        self.assertIsNone(Dog(name='Max').to_dict()['location'])
+        with self.assertRaises(ValueError):
+            Dog(name='Max', location={'type': 'Point', 'coordinates': [47.61, -122.33]})
+        with self.assertRaises(ValueError):
+            Dog(name='Max', location={'type': 'Polygon', 'coordinates': []})
+
+    @patch('models.dog.db')
+    def test_find_nearby(self, mock_db):
+        """Test the $geoNear query, its pagination and the shape of the results"""
+        # Arrange
+        collection = mock_db.get_collection.return_value
+        collection.aggregate.return_value = [
+            {'_id': ObjectId(), 'name': f'Dog {number}', 'breed': 'Beagle', 'status': 'Available',
+             'shelter_id': 'north', 'location': SEATTLE, 'distance': 1234.567 * number}
+            for number in range(3)
+        ]
+
+        # Act
+        result = Dog.find_nearby(47.61, -122.33, 10, status=AdoptionStatus.AVAILABLE, page=2, per_page=2)
+
+        # Assert
+        pipeline = collection.aggregate.call_args.args[0]
+        geo_near = pipeline[0]['$geoNear']
+        self.assertEqual(geo_near['near'], SEATTLE)
+        self.assertEqual(geo_near['maxDistance'], 10000)
+        self.assertEqual(geo_near['query'], {'status': 'Available'})
+        self.assertEqual(pipeline[1:4], [{'$sort': {'distance': 1, '_id': 1}}, {'$skip': 2}, {'$limit': 3}])
+        self.assertEqual([dog['distance_km'] for dog in result['dogs']], [0.0, 1.23])
+        self.assertEqual(result['dogs'][0]['shelter_id'], 'north')
+        self.assertTrue(result['has_more'])
+
+class TestNearbyRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        payload_cache.clear()
+
+    @patch('app.Dog.find_nearby')
+    def test_parameters_are_passed_through(self, mock_find_nearby):
+        """Test the defaults and limits of the nearby search parameters"""
+        # Arrange
+        mock_find_nearby.return_value = {'dogs': [], 'page': 3, 'per_page': 100, 'has_more': False}
+
+        # Act
+        response = self.client.get('/api/dogs/nearby?lat=47.61&lng=-122.33&min_age=2&page=3&per_page=1000')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['page'], 3)
+        mock_find_nearby.assert_called_once_with(
+            47.61, -122.33, 25.0, page=3, per_page=100, min_age=2, status=AdoptionStatus.AVAILABLE
+        )
+
+    def test_invalid_parameters(self):
+        """Test that missing or out-of-range coordinates and radii are rejected"""
+        for query in ('lat=47.61', 'lat=95&lng=0', 'lat=north&lng=0', 'lat=0&lng=0&radius=0', 'lat=0&lng=0&radius=1000'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/dogs/nearby?{query}').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import gzip
+import os
+import sys
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.payloads import EncodedPayload, CollectionVersions, PayloadCache
+
+class TestEncodedPayload(unittest.TestCase):
+    def test_variants_decode_to_body(self):
+        """Test that every variant holds the same JSON"""
+        payload = EncodedPayload.from_data([{'id': '1', 'name': 'Buddy'}])
+
+        self.assertEqual(payload.body, b'[{"id":"1","name":"Buddy"}]')
+        self.assertEqual(gzip.decompress(payload.gzip), payload.body)
+
+    def test_select_prefers_brotli_then_gzip(self):
+        """Test content-encoding negotiation"""
+        payload = EncodedPayload.from_data({'name': 'Buddy'})
+
+        self.assertEqual(payload.select([]), (payload.body, None))
+        self.assertEqual(payload.select(['gzip']), (payload.gzip, 'gzip'))
+        if payload.br is not None:
+            self.assertEqual(payload.select(['gzip', 'br']), (payload.br, 'br'))
+
+class TestPayloadCache(unittest.TestCase):
+    def test_rebuilds_only_when_version_changes(self):
+        """Test that a version bump invalidates the cached payload"""
+        # Arrange
+        versions = CollectionVersions()
+        cache = PayloadCache()
+        builds = []
+
+        def build():
+            builds.append(1)
+            return EncodedPayload.from_data(len(builds))
+
+        # Act
+        first = cache.get_or_build('breeds:list', versions.get('breeds'), build)
+        second = cache.get_or_build('breeds:list', versions.get('breeds'), build)
+        versions.bump('breeds')
+        third = cache.get_or_build('breeds:list', versions.get('breeds'), build)
+
+        # Assert
+        self.assertIs(first, second)
+        self.assertEqual(third.body, b'2')
+        self.assertEqual(cache.stats(), {'entries': 1, 'hits': 1, 'misses': 2, 'stale_hits': 0})
+
+    def test_evicts_least_recently_used(self):
+        """Test that the cache keeps only the most requested entries"""
+        cache = PayloadCache(max_entries=2)
+
+        for key in ['a', 'b', 'a', 'c']:
+            cache.get_or_build(key, 0, lambda: EncodedPayload.from_data(key))
+
+        misses_before = cache.stats()['misses']
+        cache.get_or_build('a', 0, lambda: EncodedPayload.from_data('a'))
+        cache.get_or_build('b', 0, lambda: EncodedPayload.from_data('b'))
+
+        self.assertEqual(cache.stats()['misses'], misses_before + 1)
+
+    def test_missing_records_are_not_cached(self):
+        """Test that a builder returning None is retried on the next call"""
+        cache = PayloadCache()
+
+        self.assertIsNone(cache.get_or_build('dogs:detail:1', 0, lambda: None))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+with patch('database.MongoDB.init_app'):
+    from config import Config
+    from database import BREED_NAME_COLLATION
+    from models.breed import Breed
+    from query_plans import PlanSampler, plan_problems, query_shape, summarize_explain
+
+def find_explain(stage, keys_examined, docs_examined, returned, index_name=None):
+    """Build the executionStats explain of a find"""
+    input_stage = {'stage': stage}
+    if index_name:
+        input_stage['indexName'] = index_name
+    return {
+        'queryPlanner': {
+            'winningPlan': {'stage': 'FETCH', 'inputStage': input_stage},
+            'rejectedPlans': [{'stage': 'COLLSCAN'}]
+        },
+        'executionStats': {
+            'nReturned': returned, 'executionTimeMillis': 3,
+            'totalKeysExamined': keys_examined, 'totalDocsExamined': docs_examined
+        }
+    }
+
+def started_event(command, command_name='find'):
+    """Build the fields of a CommandStartedEvent the sampler reads"""
+    return SimpleNamespace(command=command, command_name=command_name, database_name='dogshelter')
+
+class TestExplainSummaries(unittest.TestCase):
+    def test_index_scan(self):
+        """Test a find that examines what it returns"""
+        # Act
+        summary = summarize_explain(find_explain('IXSCAN', 20, 20, 20, 'shelter_id_1_name_1'))
+
+        # Assert
+        self.assertEqual(summary['stages'], ['FETCH', 'IXSCAN'])
+        self.assertEqual(summary['indexes'], ['shelter_id_1_name_1'])
+        self.assertEqual((summary['keys_examined'], summary['docs_examined'], summary['returned']), (20, 20, 20))
+        self.assertEqual(plan_problems(summary, 10), [])
+
+    def test_aggregate_with_lookup(self):
+        """Test an aggregation whose $match scans the collection and whose $lookup scans breeds"""
+        # Arrange
+        explain = {'stages': [
+            {'$cursor': find_explain('COLLSCAN', 0, 5000, 40)},
+            {'$lookup': {'from': 'breeds'}, 'totalDocsExamined': 8000, 'collectionScans': 40, 'indexesUsed': []},
+            {'$sort': {'sortKey': {'name': 1}}}
+        ]}
+
+        # Act
+        summary = summarize_explain(explain)
+        problems = plan_problems(summary, 10)
+
+        # Assert
+        self.assertEqual(summary['stages'], ['FETCH', 'COLLSCAN', '$lookup', '$sort'])
+        self.assertEqual(summary['docs_examined'], 13000)
+        self.assertEqual(problems[0], 'collection scan')
+        self.assertIn('docs examined 13000 for 40 returned', problems[1])
+
+    def test_slot_based_join_and_shards(self):
+        """Test a pushed-down $lookup that loops over the foreign collection, on each shard"""
+        # Arrange
+        shard = {
+            'queryPlanner': {'winningPlan': {'queryPlan': {
+                'stage': 'EQ_LOOKUP', 'strategy': 'NestedLoopJoin',
+                'inputStage': {'stage': 'IXSCAN', 'indexName': 'shelter_id_1_status_1_name_1'}
+            }, 'slotBasedPlan': {'stages': '[1] nlj'}}},
+            'executionStats': {'nReturned': 10, 'totalKeysExamined': 10, 'totalDocsExamined': 20}
+        }
+
+        # Act
+        summary = summarize_explain({'shards': {'shard1': shard, 'shard2': shard}})
+
+        # Assert
+        self.assertEqual(summary['stages'], ['EQ_LOOKUP', 'IXSCAN', 'EQ_LOOKUP', 'IXSCAN'])
+        self.assertEqual(summary['collection_scans'], 2)
+        self.assertEqual(summary['returned'], 20)
+        self.assertEqual(plan_problems(summary, 10), ['collection scan'])
+
+    def test_query_shape_ignores_values(self):
+        """Test that the same query with other values has the same shape"""
+        first = query_shape({'find': 'dogs', 'filter': {'shelter_id': 'north', 'age': {'$gte': 2}}, 'sort': {'name': 1}})
+        second = query_shape({'find': 'dogs', 'filter': {'shelter_id': 'south', 'age': {'$gte': 7}}, 'sort': {'name': 1}})
+        other = query_shape({'find': 'dogs', 'filter': {'shelter_id': 'south'}, 'sort': {'name': 1}})
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+class TestPlanSampler(unittest.TestCase):
+    @patch.object(PlanSampler, '_ensure_worker')
+    def test_samples_are_queued_without_session_fields(self, mock_worker):
+        """Test which commands are sampled, and that a full queue drops samples"""
+        # Arrange
+        sampler = PlanSampler(MagicMock(), sample_rate=1.0, max_pending=1)
+        command = {'find': 'dogs', 'filter': {'shelter_id': 'main'}, 'lsid': {'id': 1}, '$db': 'dogshelter'}
+
+        # Act
+        sampler.started(started_event({'insert': 'dogs'}, 'insert'))
+        sampler.started(started_event({'aggregate': 'dogs', 'pipeline': [{'$changeStream': {}}]}, 'aggregate'))
+        sampler.started(started_event(command))
+        sampler.started(started_event(command))
+
+        # Assert
+        self.assertEqual(sampler._pending.get_nowait(), ('dogshelter', {'find': 'dogs', 'filter': {'shelter_id': 'main'}}))
+        self.assertEqual((sampler.sampled, sampler.dropped), (1, 1))
+
+    def test_disabled(self):
+        """Test that a zero sample rate never queues"""
+        sampler = PlanSampler(MagicMock())
+
+        sampler.started(started_event({'find': 'dogs', 'filter': {}}))
+
+        self.assertTrue(sampler._pending.empty())
+
+    def test_plan_changes_are_logged(self):
+        """Test that a query switching to a collection scan is flagged and logged once"""
+        # Arrange
+        explain = MagicMock(side_effect=[
+            find_explain('IXSCAN', 5, 5, 5, 'shelter_id_1_breed_id_1_name_1'),
+            find_explain('COLLSCAN', 0, 9000, 5),
+            find_explain('COLLSCAN', 0, 9000, 5)
+        ])
+        sampler = PlanSampler(explain, sample_rate=0.1)
+        command = {'find': 'dogs', 'filter': {'shelter_id': 'main', 'breed_id': 'x'}}
+
+        # Act
+        with self.assertLogs(level='WARNING') as logs:
+            for _ in range(3):
+                sampler.check('dogshelter', command)
+
+        # Assert
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('Query plan changed', logs.output[0])
+        self.assertIn('Slow query plan', logs.output[1])
+        stats = sampler.stats()
+        self.assertEqual((stats['explained'], stats['plan_changes'], stats['flagged']), (3, 1, 2))
+        self.assertEqual(list(stats['flagged_shapes'].values())[0]['plan'], 'FETCH>COLLSCAN []')
+
+class TestBreedNameLookup(unittest.TestCase):
+    @patch('models.breed.db')
+    def test_find_by_name_is_an_indexed_equality(self, mock_db):
+        """Test that names are matched exactly, ignoring case, instead of as a regular expression"""
+        # Arrange
+        collection = mock_db.get_collection.return_value
+        collection.find_one.return_value = None
+
+        # Act
+        Breed.find_by_name('.*')
+
+        # Assert
+        self.assertEqual(collection.find_one.call_args.args[0], {'name': '.*'})
+        self.assertEqual(collection.find_one.call_args.kwargs['collation'], BREED_NAME_COLLATION)
+
+@unittest.skipUnless(os.getenv('MONGODB_EXPLAIN_URI'), 'requires a local mongod (set MONGODB_EXPLAIN_URI)')
+class TestModelQueryPlans(unittest.TestCase):
+    def test_no_model_query_is_flagged(self):
+        """Test the plan of every model query against a seeded scratch database"""
+        from utils.explain_queries import check_query_plans
+
+        # Act
+        results = check_query_plans(Config, os.environ['MONGODB_EXPLAIN_URI'], 'dogshelter_explain_test',
+                                    dog_count=4000, breed_count=200, max_examined_ratio=Config.PLAN_MAX_EXAMINED_RATIO)
+
+        # Assert
+        self.assertEqual({result['query']: result['problems'] for result in results if result['problems']}, {})
+        by_name = next(result for result in results if result['query'] == 'Breed.find_by_name')
+        self.assertLessEqual(by_name['keys_examined'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+    from models.recommendations import DogRecommender, count_bits, np
+
+STATUSES = ['Available', 'Adopted', 'Pending']
+LABRADOR_ID = str(ObjectId())
+POODLE_ID = str(ObjectId())
+
+def make_change(name, age, gender='Male', breed_id=LABRADOR_ID, status='Available', description=None):
+    """Build a dog as returned by the incremental sync API"""
+    return {
+        'id': str(ObjectId()), 'name': name, 'breed_id': breed_id,
+        'breed': 'Labrador' if breed_id == LABRADOR_ID else 'Poodle', 'age': age, 'gender': gender,
+        'status': status, 'description': description
+    }
+
+@unittest.skipIf(np is None, 'requires numpy')
+class TestDogRecommender(unittest.TestCase):
+    def setUp(self):
+        """Load a few dogs into a recommender"""
+        self.recommender = DogRecommender(STATUSES, ['friendly', 'calm', 'kids', 'playful'])
+        self.dogs = [
+            make_change('Buddy', 3, description='A friendly, calm dog who loves kids'),
+            make_change('Max', 9, description='A calm senior'),
+            make_change('Luna', 2, gender='Female', breed_id=POODLE_ID, description='Playful and friendly'),
+            make_change('Rocky', 4, status='Adopted', description='Friendly and calm, great with kids'),
+            make_change('Daisy', None, gender='Female')
+        ]
+        self.recommender.apply(self.dogs)
+
+    def test_best_matches_first(self):
+        """Test that dogs matching more preferences rank higher and status is a hard filter"""
+        # Act
+        results = self.recommender.recommend(min_age=2, max_age=5, gender='Male',
+                                             keywords=['friendly', 'kids'], limit=3)
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in results], ['Buddy', 'Luna', 'Max'])
+        self.assertEqual(results[0]['score'], 1.0)
+        self.assertNotIn('Rocky', [dog['name'] for dog in results])
+
+    def test_breed_preference(self):
+        """Test that preferred breeds score higher"""
+        results = self.recommender.recommend(breed_ids=[POODLE_ID], limit=1)
+
+        self.assertEqual(results[0]['name'], 'Luna')
+        self.assertEqual(results[0]['breed'], 'Poodle')
+
+    def test_incremental_updates(self):
+        """Test that changed dogs are rewritten in place and deleted rows are reused"""
+        # Act
+        self.recommender.apply([dict(self.dogs[1], status='Adopted')], deleted=[self.dogs[0]['id']])
+        self.recommender.apply([make_change('Cooper', 3, description='Friendly with kids')])
+        results = self.recommender.recommend(keywords=['friendly', 'kids'], limit=10)
+
+        # Assert
+        names = [dog['name'] for dog in results]
+        self.assertEqual(names[0], 'Cooper')
+        self.assertNotIn('Buddy', names)
+        self.assertNotIn('Max', names)
+        self.assertEqual(self.recommender.info()['rows'], 5)
+        self.assertEqual(self.recommender._size, 5)
+
+    def test_keyword_scores_without_bitwise_count(self):
+        """Test that keyword matches are counted on numpy 1.x, which has no np.bitwise_count"""
+        # Arrange
+        expected = self.recommender.recommend(keywords=['friendly', 'kids'], limit=5)
+        masks = np.array([0, 1, 0b1011, 2 ** 64 - 1], dtype=np.uint64)
+        bitwise_count = getattr(np, 'bitwise_count', None)
+        if bitwise_count is not None:
+            del np.bitwise_count
+
+        # Act
+        try:
+            results = self.recommender.recommend(keywords=['friendly', 'kids'], limit=5)
+            counts = count_bits(masks)
+        finally:
+            if bitwise_count is not None:
+                np.bitwise_count = bitwise_count
+
+        # Assert
+        self.assertEqual(results, expected)
+        self.assertEqual(counts.tolist(), [0, 1, 3, 64])
+
+class TestRecommendationsRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    @patch('app.recommender')
+    def test_parameters_are_passed_through(self, mock_recommender):
+        """Test query parsing for the recommendations endpoint"""
+        # Arrange
+        mock_recommender.recommend.return_value = [{'id': '1', 'name': 'Buddy', 'score': 1.0}]
+
+        # Act
+        response = self.client.get(
+            f'/api/recommendations?min_age=2&gender=Female&breed_id={LABRADOR_ID},{POODLE_ID}'
+            '&keywords=calm,kids&limit=500'
+        )
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['name'], 'Buddy')
+        kwargs = mock_recommender.recommend.call_args.kwargs
+        self.assertEqual(kwargs['status'], 'Available')
+        self.assertEqual(kwargs['min_age'], 2)
+        self.assertEqual(kwargs['breed_ids'], [LABRADOR_ID, POODLE_ID])
+        self.assertEqual(kwargs['keywords'], ['calm', 'kids'])
+        self.assertEqual(kwargs['limit'], 100)
+
+    @patch('app.recommender')
+    def test_invalid_gender(self, mock_recommender):
+        """Test that an unknown gender is rejected"""
+        response = self.client.get('/api/recommendations?gender=Other')
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('app.recommender')
+    def test_scoring_errors_return_500(self, mock_recommender):
+        """Test that a failure while scoring is logged and returned as a JSON error"""
+        # Arrange
+        mock_recommender.recommend.side_effect = RuntimeError('boom')
+
+        # Act
+        with self.assertLogs(level='ERROR'):
+            response = self.client.get('/api/recommendations')
+
+        # Assert
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(json.loads(response.data), {'error': 'Failed to retrieve recommendations'})
+
+    def test_disabled(self):
+        """Test that the endpoint reports when recommendations are off"""
+        response = self.client.get('/api/recommendations')
+
+        self.assertEqual(response.status_code, 503)
+
+if __name__ == '__main__':
+    unittest.main()
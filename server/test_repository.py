@@ -0,0 +1,140 @@
+import unittest
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from config import Config
+    from models import Breed, Dog
+    from models.dog import AdoptionStatus
+    from models.repository import MongoRepository, SQLiteRepository, open_sqlite, set_repository
+    from utils.sync_sqlite import sync_breeds, sync_dogs
+    from tenancy import use_shelter
+    import app as app_module
+
+LABRADOR_ID = str(ObjectId())
+POODLE_ID = str(ObjectId())
+
+def make_change(name, breed_id, age, status='Available'):
+    """Build a dog as returned by the incremental sync API"""
+    return {
+        'id': str(ObjectId()), 'shelter_id': Config.SHELTER_ID, 'name': name, 'breed_id': breed_id, 'breed': None, 'age': age,
+        'description': None, 'gender': 'Male', 'status': status, 'intake_date': '2024-01-01T00:00:00',
+        'adoption_date': None, 'updated_at': '2024-01-02T00:00:00'
+    }
+
+class TestSQLiteRepository(unittest.TestCase):
+    def setUp(self):
+        """Sync a few dogs and breeds into a scratch SQLite file and read it through the models"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'dogs.sqlite3')
+        self.dogs = [
+            make_change('Max', POODLE_ID, 3),
+            make_change('Buddy', LABRADOR_ID, 5),
+            make_change('Luna', POODLE_ID, None),
+            make_change('Zed', LABRADOR_ID, 1, status='Adopted')
+        ]
+        page = {'reset': False, 'changes': self.dogs, 'deleted': [], 'next': 'token', 'has_more': False}
+        breeds = [
+            Breed(_id=ObjectId(LABRADOR_ID), name='Labrador', description='A friendly breed'),
+            Breed(_id=ObjectId(POODLE_ID), name='Poodle', description='A curly breed')
+        ]
+
+        writer = open_sqlite(self.path, readonly=False)
+        with patch('utils.sync_sqlite.changes_since', return_value=page), \
+                patch('utils.sync_sqlite.SyncToken'), \
+                patch('models.breed.Breed.find_all', return_value=breeds):
+            sync_breeds(writer)
+            sync_dogs(writer, 100, timedelta(days=30))
+        self.journal_mode = writer.execute('PRAGMA journal_mode').fetchone()[0]
+        writer.close()
+
+        set_repository(SQLiteRepository(self.path))
+
+    def tearDown(self):
+        set_repository(MongoRepository())
+        self.directory.cleanup()
+
+    def test_finders(self):
+        """Test that the model finders read from the SQLite file"""
+        self.assertEqual([dog.name for dog in Dog.find_all()], ['Buddy', 'Luna', 'Max', 'Zed'])
+        self.assertEqual([dog.name for dog in Dog.find_by_breed_id(LABRADOR_ID)], ['Buddy', 'Zed'])
+        self.assertEqual([breed.name for breed in Breed.find_all()], ['Labrador', 'Poodle'])
+        self.assertEqual((Dog.count(), Breed.count()), (4, 2))
+        self.assertEqual(self.journal_mode, 'wal')
+
+    def test_find_by_id_with_breed_info(self):
+        """Test that the detail joins the breed name like the MongoDB aggregation"""
+        # Act
+        dog_data = Dog.find_by_id_with_breed_info(self.dogs[0]['id'])
+
+        # Assert
+        self.assertEqual(dog_data['_id'], self.dogs[0]['id'])
+        self.assertEqual(dog_data['breed'], 'Poodle')
+        self.assertEqual(dog_data['age'], 3)
+        self.assertIsNone(Dog.find_by_id_with_breed_info(str(ObjectId())))
+
+    def test_filters_and_sorting(self):
+        """Test the dog list filters and sort orders"""
+        # Act
+        by_age = Dog.find_with_breed_info(sort='-age')
+        available = Dog.find_with_breed_info(status=AdoptionStatus.AVAILABLE, min_age=2)
+        poodles = Dog.find_with_breed_info(breed_id=POODLE_ID)
+
+        # Assert
+        self.assertEqual([dog['name'] for dog in by_age], ['Buddy', 'Max', 'Zed', 'Luna'])
+        self.assertEqual([dog['name'] for dog in available], ['Buddy', 'Max'])
+        self.assertEqual([dog['name'] for dog in poodles], ['Luna', 'Max'])
+
+    def test_stats(self):
+        """Test that stats are grouped in SQLite like the MongoDB aggregation"""
+        # Act
+        everything = Dog.stats()
+        poodles = Dog.stats(breed_id=POODLE_ID)
+
+        # Assert
+        self.assertEqual(everything['total'], 4)
+        self.assertEqual(everything['by_status'], {'Available': 3, 'Adopted': 1})
+        self.assertEqual(everything['by_breed'], {'Labrador': 2, 'Poodle': 2})
+        self.assertEqual(everything['age'], {'min': 1, 'max': 5, 'mean': 3.0})
+        self.assertEqual((poodles['total'], poodles['age']['mean']), (2, 3.0))
+
+    def test_edge_node_routes(self):
+        """Test that an edge node serves stats and refuses routes that need MongoDB with 503"""
+        # Arrange
+        client = app_module.app.test_client()
+
+        # Act
+        with patch.object(app_module, 'repository', SQLiteRepository(self.path)):
+            stats = client.get('/api/dogs/stats?status=Available')
+            refused = [client.get(path) for path in ('/api/dogs/changes', '/api/dogs/export', '/api/dogs/events',
+                                                     '/api/dogs/nearby?lat=47.6&lng=-122.3', '/api/stats/timeline')]
+
+        # Assert
+        self.assertEqual(stats.status_code, 200)
+        self.assertEqual(stats.get_json()['total'], 3)
+        self.assertEqual([response.status_code for response in refused], [503] * 5)
+        self.assertIn('edge nodes', refused[0].get_json()['error'])
+
+    def test_other_shelters_are_not_visible(self):
+        """Test that the SQLite finders are scoped to the current shelter too"""
+        with use_shelter('elsewhere'):
+            self.assertEqual(Dog.find_all(), [])
+            self.assertEqual(Dog.count(), 0)
+            self.assertIsNone(Dog.find_by_id_with_breed_info(self.dogs[0]['id']))
+            self.assertEqual(Breed.count(), 2)
+
+    def test_connection_is_read_only(self):
+        """Test that edge nodes cannot write to the copy"""
+        with self.assertRaises(Exception):
+            SQLiteRepository(self.path)._connection().execute('DELETE FROM dogs')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import json
+import os
+import sys
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+    from models.dog import Dog
+    from models.status_events import StatusHistory, initial_events
+    from tenancy import use_shelter
+
+STATUSES = ['Available', 'Adopted', 'Pending']
+LABRADOR_ID = str(ObjectId())
+
+class TestStatusEvents(unittest.TestCase):
+    def setUp(self):
+        """Load a dog as stored"""
+        self.dog = Dog.from_dict({
+            '_id': ObjectId(),
+            'shelter_id': 'north',
+            'name': 'Buddy',
+            'breed_id': LABRADOR_ID,
+            'status': 'Available',
+            'intake_date': '2024-01-01T00:00:00'
+        })
+
+    def test_initial_events_of_an_adopted_dog(self):
+        """Test that a dog stored as adopted records its intake and its adoption"""
+        # Act
+        events = initial_events({
+            '_id': ObjectId(), 'shelter_id': 'north', 'breed_id': None, 'status': 'Adopted',
+            'intake_date': '2024-01-01T00:00:00', 'adoption_date': '2024-01-11T12:00:00'
+        })
+
+        # Assert
+        self.assertEqual([(event['from'], event['to']) for event in events], [(None, 'Available'), ('Available', 'Adopted')])
+        self.assertEqual(events[1]['days_in_shelter'], 10.5)
+        self.assertEqual(events[0]['meta'], {'shelter_id': 'north', 'breed_id': ''})
+
+    def test_rollup_update(self):
+        """Test that an adoption increments the counters of its shelter, breed and day"""
+        # Arrange
+        event = {
+            'at': datetime(2024, 3, 5, 15, 30), 'meta': {'shelter_id': 'north', 'breed_id': LABRADOR_ID},
+            'from': 'Pending', 'to': 'Adopted', 'days_in_shelter': 12.0
+        }
+
+        # Act
+        operation = StatusHistory.rollup_update(event)
+
+        # Assert
+        self.assertEqual(operation._filter, {'shelter_id': 'north', 'breed_id': LABRADOR_ID, 'day': datetime(2024, 3, 5)})
+        self.assertEqual(operation._doc, {'$inc': {
+            'entered.Adopted': 1, 'days_to_adoption_total': 12.0, 'days_to_adoption_count': 1
+        }})
+        self.assertTrue(operation._upsert)
+
+    @patch('models.dog.status_history')
+    @patch('models.dog.db')
+    def test_saves_record_status_changes(self, mock_db, mock_history):
+        """Test that inserts record an intake, status changes a transition, and other edits nothing"""
+        # Arrange
+        mock_db.get_collection.return_value.update_one.return_value.matched_count = 1
+        new_dog = Dog(name='Max', breed_id=LABRADOR_ID, shelter_id='north')
+
+        # Act
+        new_dog.save()
+        self.dog.description = 'A very friendly dog'
+        self.dog.save()
+        self.dog.status = self.dog.status.__class__('Adopted')
+        self.dog.save()
+
+        # Assert
+        recorded = [call.args[0] for call in mock_history.record.call_args_list]
+        self.assertEqual(len(recorded), 2)
+        self.assertEqual((recorded[0][0]['from'], recorded[0][0]['to']), (None, 'Available'))
+        self.assertEqual((recorded[1][0]['from'], recorded[1][0]['to']), ('Available', 'Adopted'))
+        self.assertEqual(recorded[1][0]['dog_id'], self.dog._id)
+        self.assertIn('days_in_shelter', recorded[1][0])
+
+    def test_timeline_reads_rollups_of_the_range(self):
+        """Test the timeline query and the shape of its result"""
+        # Arrange
+        rollups = MagicMock()
+        group = {'intakes': 3, 'days_total': 30.0, 'days_count': 2, 'entered_Available': 3, 'entered_Adopted': 2, 'entered_Pending': 1}
+        rollups.aggregate.return_value = iter([{
+            'days': [{'_id': datetime(2024, 3, 5), **group}, {'_id': datetime(2024, 3, 4), **group}],
+            'by_breed': [{'_id': LABRADOR_ID, **group}]
+        }])
+        history = StatusHistory(STATUSES, MagicMock(), lambda: rollups)
+
+        # Act
+        with patch('models.breed.Breed.names_by_id', return_value={LABRADOR_ID: 'Labrador'}):
+            timeline = history.timeline(datetime(2024, 3, 1), datetime(2024, 4, 1), 'week')
+
+        # Assert
+        match = rollups.aggregate.call_args.args[0][0]['$match']
+        self.assertEqual(match['day'], {'$gte': datetime(2024, 3, 1), '$lt': datetime(2024, 4, 1)})
+        self.assertIn('shelter_id', match)
+        self.assertEqual(len(timeline['buckets']), 1)
+        self.assertEqual(timeline['buckets'][0]['start'], '2024-03-04T00:00:00')
+        self.assertEqual(timeline['buckets'][0]['entered']['Adopted'], 4)
+        self.assertEqual(timeline['by_breed'][0]['breed'], 'Labrador')
+        self.assertEqual(timeline['by_breed'][0]['avg_days_to_adoption'], 15.0)
+
+    def test_rebuild_replaces_rollups_of_the_shelter(self):
+        """Test that a rebuild only reads the shelter's events and merges without deleting rollups"""
+        # Arrange
+        events, rollups = MagicMock(), MagicMock()
+        rollups.name = 'dog_status_rollups'
+        history = StatusHistory(STATUSES, lambda: events, lambda: rollups)
+
+        # Act
+        with use_shelter('north'):
+            history.rebuild_rollups(datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+        # Assert
+        pipeline = events.aggregate.call_args.args[0]
+        self.assertEqual(pipeline[0]['$match']['meta.shelter_id'], 'north')
+        self.assertEqual(pipeline[-1]['$merge']['whenMatched'], 'replace')
+        self.assertNotIn('$dateTrunc', str(pipeline))
+        rollups.delete_many.assert_not_called()
+
+class TestTimelineRoute(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    @patch('app.status_history')
+    def test_range_is_parsed_to_whole_days(self, mock_history):
+        """Test that the last day is included and the interval is passed through"""
+        # Arrange
+        mock_history.timeline.return_value = {'buckets': []}
+
+        # Act
+        response = self.client.get('/api/stats/timeline?from=2024-03-01&to=2024-03-31T10:00:00Z&interval=day')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'buckets': []})
+        mock_history.timeline.assert_called_once_with(datetime(2024, 3, 1), datetime(2024, 4, 1), 'day', None)
+
+    def test_invalid_parameters(self):
+        """Test that bad intervals, dates and ranges are rejected"""
+        self.assertEqual(self.client.get('/api/stats/timeline?interval=year').status_code, 400)
+        self.assertEqual(self.client.get('/api/stats/timeline?from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/stats/timeline?from=2024-03-02&to=2024-03-01').status_code, 400)
+        self.assertEqual(self.client.get('/api/stats/timeline?from=2000-01-01&to=2024-01-01').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+with patch('database.MongoDB.init_app'):
+    from app import app
+    from config import Config
+    from database import MongoDB
+    from change_events import ChangeEvent, ChangeStreamBroadcaster
+    from models.dog import AdoptionStatus, Dog
+    from models.payloads import payload_cache
+    from models.repository import MongoRepository, dog_list_filter
+    from models.write_behind import WriteBehindQueue
+    from tenancy import current_shelter, use_shelter
+
+class TestShelterScoping(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        payload_cache.clear()
+
+    @patch('models.repository.db')
+    def test_request_shelter_scopes_dog_queries(self, mock_db):
+        """Test that the shelter header and query parameter reach the dog list query"""
+        # Arrange
+        collection = mock_db.get_collection.return_value
+        collection.aggregate.return_value = []
+
+        # Act
+        header = self.client.get('/api/dogs', headers={'X-Shelter-Id': 'north'})
+        both = self.client.get('/api/dogs?shelter_id=south', headers={'X-Shelter-Id': 'north'})
+
+        # Assert
+        self.assertEqual(header.status_code, 200)
+        self.assertEqual(both.status_code, 200)
+        matches = [call.args[0][0]['$match'] for call in collection.aggregate.call_args_list]
+        self.assertEqual([match['shelter_id'] for match in matches], ['north', 'south'])
+        self.assertEqual(current_shelter(), Config.SHELTER_ID)
+
+    def test_invalid_shelter(self):
+        """Test that a malformed shelter id is rejected"""
+        response = self.client.get('/api/dogs', headers={'X-Shelter-Id': 'north/../south'})
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('models.dog.db')
+    def test_model_reads_and_writes_carry_the_shelter(self, mock_db):
+        """Test that new dogs join the current shelter and writes filter on the shard key"""
+        # Arrange
+        collection = mock_db.get_collection.return_value
+        collection.delete_one.return_value.deleted_count = 1
+        collection.find_one.return_value = None
+        with use_shelter('south'):
+            dog = Dog(_id=ObjectId(), name='Buddy')
+
+            # Act
+            Dog.find_by_id(str(dog._id))
+            dog.delete()
+
+        # Assert
+        self.assertEqual(dog.shelter_id, 'south')
+        self.assertEqual(collection.find_one.call_args.args[0], {'shelter_id': 'south', '_id': dog._id})
+        self.assertEqual(collection.delete_one.call_args.args[0], {'_id': dog._id, 'shelter_id': 'south'})
+        self.assertEqual(collection.replace_one.call_args.args[1]['shelter_id'], 'south')
+
+    def test_deferred_updates_filter_on_the_shard_key(self):
+        """Test that write-behind updates are routed by the shelter they were queued with"""
+        # Arrange
+        collection = MagicMock()
+        queue = WriteBehindQueue(lambda: collection, flush_interval=0.01)
+        dog_id = ObjectId()
+
+        # Act
+        queue.submit(dog_id, {'age': 4}, shard_key={'shelter_id': 'north'})
+        queue.flush(timeout=1)
+        queue.stop(timeout=1)
+
+        # Assert
+        operation = collection.bulk_write.call_args.args[0][0]
+        self.assertEqual(operation._filter, {'_id': dog_id, 'shelter_id': 'north'})
+
+    def test_dogs_without_a_shelter_are_assigned_on_connect(self):
+        """Test that documents stored before shelters existed are put into SHELTER_ID"""
+        # Arrange
+        manager = MongoDB()
+        collection = MagicMock()
+        collection.update_many.return_value.modified_count = 2
+        manager.get_collection = MagicMock(return_value=collection)
+
+        # Act
+        counts = manager.assign_missing_shelter('main')
+
+        # Assert
+        self.assertEqual(collection.update_many.call_args.args, ({'shelter_id': None}, {'$set': {'shelter_id': 'main'}}))
+        self.assertEqual(counts, {Config.DOGS_COLLECTION: 2, Config.DOG_TOMBSTONES_COLLECTION: 2})
+
+    @patch.object(ChangeStreamBroadcaster, 'start')
+    def test_events_are_filtered_by_shelter(self, mock_start):
+        """Test that subscribers only get their shelter's events, and deletes the stream cannot attribute"""
+        # Arrange
+        broadcaster = ChangeStreamBroadcaster(lambda: None)
+        subscription = broadcaster.subscribe(shelter_id='north')
+
+        # Act
+        broadcaster.publish(ChangeEvent('1', 'insert', {'id': 'a'}, 'south'))
+        broadcaster.publish(ChangeEvent('2', 'insert', {'id': 'b'}, 'north'))
+        broadcaster.publish(ChangeEvent('3', 'delete', {'id': 'c'}))
+
+        # Assert
+        self.assertEqual([subscription.get(timeout=0.1).id for _ in range(2)], ['2', '3'])
+        self.assertIsNone(subscription.get(timeout=0.01))
+
+@unittest.skipUnless(os.getenv('MONGODB_SHARDED_URI'), 'requires a local sharded cluster (scripts/start_sharded_cluster.sh)')
+class TestShardedCluster(unittest.TestCase):
+    def setUp(self):
+        """Insert dogs of a shelter on each shard"""
+        from pymongo import MongoClient
+
+        self.client = MongoClient(os.environ['MONGODB_SHARDED_URI'])
+        self.database = self.client[os.getenv('MONGODB_SHARDED_DATABASE', 'dogshelter_sharded')]
+        self.database.dogs.delete_many({})
+        self.database.dogs.insert_many([
+            {'shelter_id': shelter_id, 'name': f'Dog {number}', 'status': 'Available', 'age': number}
+            for shelter_id in ('north', 'south') for number in range(10)
+        ])
+
+    def tearDown(self):
+        self.database.dogs.delete_many({})
+        self.client.close()
+
+    def explain_find(self, query):
+        """Get the mongos query plan of a find"""
+        explain = self.database.command('explain', {'find': 'dogs', 'filter': query}, verbosity='queryPlanner')
+        return explain['queryPlanner']['winningPlan']
+
+    def test_dog_queries_target_one_shard(self):
+        """Test that the filters the models build are routed to a single shard"""
+        # Arrange
+        with use_shelter('south'):
+            list_filter = dog_list_filter(AdoptionStatus.AVAILABLE, min_age=2)
+            with patch('models.repository.db') as mock_db:
+                mock_db.get_collection.return_value.aggregate.return_value = []
+                MongoRepository().find_dogs_with_breed(AdoptionStatus.AVAILABLE, sort='-age')
+                pipeline = mock_db.get_collection.return_value.aggregate.call_args.args[0]
+
+        # Act
+        scoped = self.explain_find(list_filter)
+        unscoped = self.explain_find({'status': 'Available'})
+        aggregate = self.database.command('aggregate', 'dogs', pipeline=pipeline, explain=True)
+
+        # Assert
+        self.assertEqual(scoped['stage'], 'SINGLE_SHARD')
+        self.assertEqual([shard['shardName'] for shard in scoped['shards']], ['shard2'])
+        self.assertEqual(unscoped['stage'], 'SHARD_MERGE')
+        self.assertEqual(list(aggregate['shards']), ['shard2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Add the server directory to the path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+with patch('database.MongoDB.init_app'):
+    from models.dog import Dog
+    from models.write_behind import WriteBehindFull, WriteBehindQueue
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        """Create a queue writing to a mock collection"""
+        self.collection = MagicMock()
+        self.flushed = MagicMock()
+        self.queue = WriteBehindQueue(
+            lambda: self.collection, max_pending=2, batch_size=10,
+            flush_interval=0.01, enqueue_timeout=0.05, on_flush=self.flushed
+        )
+
+    def tearDown(self):
+        self.queue.stop(timeout=1)
+
+    def _written(self):
+        """Get (filter, update) of every operation sent to bulk_write"""
+        return [
+            (operation._filter, operation._doc)
+            for call in self.collection.bulk_write.call_args_list
+            for operation in call.args[0]
+        ]
+
+    def test_updates_are_coalesced_per_document(self):
+        """Test that later fields win and each document is written once"""
+        # Arrange
+        dog_id = ObjectId()
+        gate = threading.Event()
+        self.collection.bulk_write.side_effect = lambda *args, **kwargs: gate.wait(1)
+
+        self.queue.submit(ObjectId(), {'age': 1})
+        self.queue.flush(timeout=0.05)  # the worker is now blocked writing the first update
+
+        # Act
+        self.queue.submit(dog_id, {'description': 'First description', 'age': 3})
+        self.queue.submit(dog_id, {'description': 'Second description'})
+        gate.set()
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        # Assert
+        self.assertEqual(self._written()[-1], ({'_id': dog_id}, {'$set': {'description': 'Second description', 'age': 3}}))
+        self.assertEqual(self.collection.bulk_write.call_count, 2)
+        self.assertEqual(self.queue.stats()['coalesced'], 1)
+        self.flushed.assert_called()
+
+    def test_full_queue_rejects_after_timeout(self):
+        """Test backpressure when the worker cannot keep up"""
+        # Arrange
+        gate = threading.Event()
+        self.collection.bulk_write.side_effect = lambda *args, **kwargs: gate.wait(1)
+        self.queue.submit(ObjectId(), {'age': 1})
+        self.queue.flush(timeout=0.05)  # the worker is now blocked writing the first update
+
+        # Act
+        self.queue.submit(ObjectId(), {'age': 2})
+        self.queue.submit(ObjectId(), {'age': 3})
+        with self.assertRaises(WriteBehindFull):
+            self.queue.submit(ObjectId(), {'age': 4})
+        gate.set()
+
+        # Assert
+        self.assertEqual(self.queue.stats()['rejected'], 1)
+
+    def test_transient_errors_are_retried(self):
+        """Test that a batch is requeued when MongoDB is unavailable"""
+        # Arrange
+        dog_id = ObjectId()
+        self.collection.bulk_write.side_effect = [AutoReconnect('no primary'), None]
+
+        # Act
+        self.queue.submit(dog_id, {'age': 5})
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        # Assert
+        stats = self.queue.stats()
+        self.assertEqual(stats['flush_errors'], 1)
+        self.assertEqual(stats['written'], 1)
+        self.assertEqual(self.collection.bulk_write.call_count, 2)
+
+    def test_write_errors_are_counted(self):
+        """Test that per-document failures are dropped and counted"""
+        # Arrange
+        self.collection.bulk_write.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'Document failed validation'}]
+        })
+
+        # Act
+        self.queue.submit(ObjectId(), {'age': -1})
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        # Assert
+        stats = self.queue.stats()
+        self.assertEqual(stats['failed_writes'], 1)
+        self.assertEqual(stats['written'], 0)
+        self.assertEqual(stats['last_error'], 'Document failed validation')
+
+    def test_cleared_fields_are_unset_and_stamped_at_write(self):
+        """Test that None values become $unset and the timestamp field is set when written"""
+        # Arrange
+        dog_id = ObjectId()
+        self.queue.timestamp_field = 'updated_at'
+
+        # Act
+        self.queue.submit(dog_id, {'description': 'A friendly dog', 'age': None})
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        # Assert
+        _, update = self._written()[0]
+        self.assertEqual(update['$unset'], {'age': ''})
+        self.assertEqual(set(update['$set']), {'description', 'updated_at'})
+
+    def test_unexpected_errors_are_retried(self):
+        """Test that errors other than PyMongoError requeue the batch instead of stopping the worker"""
+        # Arrange
+        self.collection.bulk_write.side_effect = [RuntimeError('boom'), None]
+
+        # Act
+        self.queue.submit(ObjectId(), {'age': 5})
+        self.assertTrue(self.queue.flush(timeout=1))
+
+        # Assert
+        stats = self.queue.stats()
+        self.assertEqual(stats['flush_errors'], 1)
+        self.assertEqual(stats['written'], 1)
+        self.assertTrue(stats['running'])
+
+class TestDogSaveDeferred(unittest.TestCase):
+    @patch('models.dog.write_behind')
+    def test_deferred_update_is_queued(self, mock_write_behind):
+        """Test that save(defer=True) queues an update instead of writing it"""
+        # Arrange
+        dog = Dog(_id=ObjectId(), name='Buddy', description='A friendly dog')
+
+        # Act
+        dog.save(defer=True)
+
+        # Assert
+        doc_id, fields = mock_write_behind.submit.call_args.args
+        self.assertEqual(doc_id, dog._id)
+        self.assertEqual(fields['description'], 'A friendly dog')
+        self.assertNotIn('updated_at', fields)
+
+if __name__ == '__main__':
+    unittest.main()
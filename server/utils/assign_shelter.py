@@ -0,0 +1,35 @@
+import argparse
+import os
+import sys
+import logging
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, init_db
+from config import config
+from tenancy import validate_shelter_id
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(
+        description='Assign dogs without a shelter_id to a shelter (the API server assigns them to SHELTER_ID at startup)'
+    )
+    parser.add_argument('--shelter', default=app_config.SHELTER_ID, help='shelter to assign them to')
+    args = parser.parse_args()
+
+    # Connecting assigns documents without a shelter_id to SHELTER_ID, so point it at --shelter
+    settings = app_config()
+    settings.SHELTER_ID = validate_shelter_id(args.shelter)
+    init_db(settings)
+    # Reports 0 unless the assignment on connect failed (it logs a warning then)
+    counts = db.assign_missing_shelter(settings.SHELTER_ID)
+    for collection_name, count in counts.items():
+        logging.info(f"Assigned {count} more {collection_name} documents to shelter '{args.shelter}'")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import random
+import sys
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+
+from models import db, init_db, Breed, Dog
+from models.dog import AdoptionStatus, status_history
+from models.status_events import initial_events
+from config import Config, config
+from query_plans import CommandRecorder, plan_problems, plan_signature, summarize_explain
+from tenancy import use_shelter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Seeded dogs are split between the shelter the queries run for and another one, so a query
+# that ignores the shelter examines twice what it returns
+OTHER_SHELTER = 'explain-other'
+
+def seed(dog_count: int, breed_count: int, shelter_id: str):
+    """Fill the empty scratch database with breeds, dogs, tombstones and status history"""
+    database = db.get_database()
+    breed_ids = database[Config.BREEDS_COLLECTION].insert_many([
+        {'name': f'Breed {number:04d}', 'description': f'Synthetic breed number {number}'} for number in range(breed_count)
+    ]).inserted_ids
+
+    rng = random.Random(11)
+    intake = datetime(2024, 1, 1)
+    statuses = [status.value for status in AdoptionStatus]
+    for start in range(0, dog_count, 5000):
+        docs = []
+        for number in range(start, min(start + 5000, dog_count)):
+            dog = Dog(
+                name=f'Dog {number:06d}',
+                shelter_id=shelter_id if number % 2 else OTHER_SHELTER,
+                breed_id=str(rng.choice(breed_ids)),
+                age=rng.randint(0, 15),
+                gender=rng.choice(['Male', 'Female']),
+                status=rng.choice(statuses),
+                intake_date=intake + timedelta(minutes=rng.randint(0, 500000)),
+                location=Dog.point(47.6 + rng.uniform(-1, 1), -122.3 + rng.uniform(-1, 1))
+            )
+            docs.append({**dog.to_dict(include_id=False), '_id': ObjectId()})
+        database[Config.DOGS_COLLECTION].insert_many(docs)
+        status_history.record([event for doc in docs for event in initial_events(doc)])
+
+    database[Config.DOG_TOMBSTONES_COLLECTION].insert_many([
+        {'_id': ObjectId(), 'shelter_id': shelter_id if number % 2 else OTHER_SHELTER,
+         'deleted_at': datetime.utcnow() - timedelta(minutes=number)}
+        for number in range(max(dog_count // 100, 1))
+    ])
+    return [str(breed_id) for breed_id in breed_ids]
+
+def model_queries(breed_ids: List[str]) -> List[Tuple[str, Callable[[], Any]]]:
+    """Every read query the models run against MongoDB, with typical arguments"""
+    dog_id = str(db.get_collection(Config.DOGS_COLLECTION).find_one(
+        {'shelter_id': Config.SHELTER_ID}, sort=[('name', 1)])['_id'])
+    since = datetime.utcnow() - timedelta(minutes=10)
+    today = datetime.utcnow()
+    return [
+        ('Dog.find_with_breed_info', lambda: Dog.find_with_breed_info()),
+        ('Dog.find_with_breed_info status', lambda: Dog.find_with_breed_info(status=AdoptionStatus.AVAILABLE)),
+        ('Dog.find_with_breed_info breed', lambda: Dog.find_with_breed_info(breed_id=breed_ids[0])),
+        ('Dog.find_with_breed_info age -age', lambda: Dog.find_with_breed_info(min_age=2, max_age=4, sort='-age')),
+        ('Dog.find_with_breed_info intake_date', lambda: Dog.find_with_breed_info(sort='intake_date')),
+        ('Dog.find_by_id_with_breed_info', lambda: Dog.find_by_id_with_breed_info(dog_id)),
+        ('Dog.find_by_id', lambda: Dog.find_by_id(dog_id)),
+        ('Dog.find_by_breed_id', lambda: Dog.find_by_breed_id(breed_ids[0])),
+        ('Dog.find_nearby', lambda: Dog.find_nearby(47.6, -122.3, 25)),
+        ('Dog.find_all', lambda: Dog.find_all()),
+        ('Dog.stats', lambda: Dog.stats(status=AdoptionStatus.AVAILABLE)),
+        ('Dog.latest_update', lambda: Dog.latest_update()),
+        ('Dog.find_changed_since', lambda: Dog.find_changed_since(since, limit=Config.SYNC_PAGE_SIZE)),
+        ('Dog.find_changed_since after_id', lambda: Dog.find_changed_since(since, ObjectId(dog_id), Config.SYNC_PAGE_SIZE)),
+        ('Dog.find_deleted_since', lambda: Dog.find_deleted_since(since, limit=Config.SYNC_PAGE_SIZE)),
+        ('Breed.find_by_name', lambda: Breed.find_by_name('breed 0042')),
+        ('Breed.find_all', lambda: Breed.find_all()),
+        ('status_history.timeline', lambda: status_history.timeline(today - timedelta(days=84), today, 'week'))
+    ]
+
+def explain_queries(recorder: CommandRecorder, queries: List[Tuple[str, Callable[[], Any]]],
+                    max_examined_ratio: float) -> List[Dict[str, Any]]:
+    """Run each query, then explain every find and aggregate it sent"""
+    results = []
+    database = db.get_database()
+    for name, query in queries:
+        with recorder.recording() as commands:
+            query()
+        for command in commands:
+            summary = summarize_explain(database.command('explain', command, verbosity='executionStats'))
+            results.append({
+                'query': name,
+                'collection': command.get('find') or command.get('aggregate'),
+                'plan': plan_signature(summary),
+                **summary,
+                'problems': plan_problems(summary, max_examined_ratio)
+            })
+    return results
+
+def check_query_plans(app_config: Config, mongodb_uri: str, database_name: str, dog_count: int,
+                      breed_count: int, max_examined_ratio: float, keep: bool = False) -> List[Dict[str, Any]]:
+    """Seed a scratch database, explain every model query in it and drop it"""
+    class ExplainConfig(app_config):
+        MONGODB_URI = mongodb_uri
+        DATABASE_NAME = database_name
+
+    # Start from an empty database, with the collections and indexes init_db creates
+    with MongoClient(mongodb_uri) as client:
+        client.drop_database(database_name)
+
+    # Registered before the client is created, so it sees every command the models send
+    recorder = CommandRecorder()
+    monitoring.register(recorder)
+    init_db(ExplainConfig)
+    try:
+        with use_shelter(app_config.SHELTER_ID):
+            breed_ids = seed(dog_count, breed_count, app_config.SHELTER_ID)
+            return explain_queries(recorder, model_queries(breed_ids), max_examined_ratio)
+    finally:
+        if not keep:
+            db._client.drop_database(database_name)
+        db.close_connection()
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(
+        description='Explain every model query against a seeded scratch database and flag collection scans '
+                    'and queries that examine far more than they return (exits 1 if any is flagged)'
+    )
+    parser.add_argument('--mongodb-uri', default=app_config.MONGODB_URI, help='MongoDB server to seed')
+    parser.add_argument('--database', default='dogshelter_explain', help='scratch database (dropped before and after)')
+    parser.add_argument('--dogs', type=int, default=20000, help='dogs to seed, half in another shelter')
+    parser.add_argument('--breeds', type=int, default=200, help='breeds to seed')
+    parser.add_argument('--max-ratio', type=float, default=app_config.PLAN_MAX_EXAMINED_RATIO,
+                        help='largest accepted keys or documents examined per document returned')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch database afterwards')
+    args = parser.parse_args()
+
+    results = check_query_plans(app_config, args.mongodb_uri, args.database, args.dogs, args.breeds,
+                                args.max_ratio, keep=args.keep)
+    for result in results:
+        print(f"{result['query']:<38} {result['collection']:<18} {result['plan']}")
+        print(f"{'':<38} keys {result['keys_examined']:>7}  docs {result['docs_examined']:>7}  "
+              f"returned {result['returned']:>7}  {result['execution_ms']}ms")
+        for problem in result['problems']:
+            print(f"{'':<38} FLAGGED: {problem}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    flagged = [result for result in results if result['problems']]
+    if flagged:
+        logging.error(f"{len(flagged)} of {len(results)} query plans flagged")
+        sys.exit(1)
+    logging.info(f"All {len(results)} query plans are within a {args.max_ratio:g}x examined/returned ratio")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, init_db, Breed, Dog
+from models.dog import status_history
+from models.status_events import initial_events
+from config import Config, config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# MongoDB error code for a duplicate _id (or unique index) on insert
+DUPLICATE_KEY = 11000
+
+def read_records(path: str, file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream records from a CSV or NDJSON file without loading it into memory"""
+    file_format = file_format or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        elif file_format == 'ndjson':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported format '{file_format}'")
+
+def _normalize(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Lowercase keys so 'Name' and 'name' columns are treated alike"""
+    return {key.strip().lower().replace(' ', '_'): value for key, value in record.items() if key}
+
+def record_id(record: Dict[str, Any], source: str, sequence: int) -> ObjectId:
+    """Use the record's own id, or derive a stable one from its position in the source
+
+    Stable ids make re-running an interrupted ingestion idempotent: rows written before the
+    interruption fail with duplicate key errors instead of being inserted twice.
+    """
+    value = record.get('_id') or record.get('id')
+    if value and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return ObjectId(hashlib.blake2b(f'{source}:{sequence}'.encode('utf-8'), digest_size=12).digest())
+
+def validate_breeds(rows: List[Tuple[int, Dict[str, Any]]], context: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate breed records into documents, returning (documents, errors)"""
+    docs, errors = [], []
+    for sequence, row in rows:
+        record = _normalize(row)
+        try:
+            breed = Breed(name=record.get('name') or record.get('breed'), description=record.get('description') or None)
+            doc = breed.to_dict(include_id=False)
+            doc['_id'] = record_id(record, context['source'], sequence)
+            docs.append(doc)
+        except (TypeError, ValueError) as e:
+            errors.append(f"record {sequence}: {e}")
+    return docs, errors
+
+def validate_dogs(rows: List[Tuple[int, Dict[str, Any]]], context: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate dog records into documents, resolving breed names, returning (documents, errors)"""
+    breed_ids = context.get('breed_ids', {})
+    docs, errors = [], []
+    for sequence, row in rows:
+        record = _normalize(row)
+        try:
+            breed_id = record.get('breed_id')
+            if not breed_id and record.get('breed'):
+                breed_id = breed_ids.get(record['breed'].strip().lower())
+                if breed_id is None:
+                    raise ValueError(f"Unknown breed '{record['breed']}'")
+            location = record.get('location')
+            if record.get('latitude') not in (None, ''):
+                # Flat files give coordinates as latitude and longitude columns
+                location = Dog.point(record['latitude'], record.get('longitude'))
+            dog = Dog(
+                shelter_id=record.get('shelter_id') or context.get('shelter_id'),
+                name=record.get('name'),
+                breed_id=breed_id,
+                age=int(record['age']) if record.get('age') not in (None, '') else None,
+                gender=record.get('gender') or None,
+                description=record.get('description') or None,
+                status=record.get('status') or 'Available',
+                location=location,
+                **{key: record[key] for key in ('intake_date', 'adoption_date') if record.get(key)}
+            )
+            doc = dog.to_dict(include_id=False)
+            doc['_id'] = record_id(record, context['source'], sequence)
+            docs.append(doc)
+        except (TypeError, ValueError, KeyError) as e:
+            errors.append(f"record {sequence}: {e}")
+    return docs, errors
+
+VALIDATORS: Dict[str, Callable] = {
+    Config.BREEDS_COLLECTION: validate_breeds,
+    Config.DOGS_COLLECTION: validate_dogs
+}
+
+class Checkpoint:
+    """Completed chunks of one source, persisted so an interrupted ingestion can resume"""
+
+    def __init__(self, path: Optional[str], source: str, chunk_size: int):
+        self.path = path
+        self.source = source
+        self.chunk_size = chunk_size
+        # Every chunk below the watermark is done, plus the ones in completed
+        self.watermark = 0
+        self.completed: Set[int] = set()
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                data = json.load(file)
+            if data.get('source') == source and data.get('chunk_size') == chunk_size:
+                self.watermark = data['watermark']
+                self.completed = set(data['completed'])
+            else:
+                logging.warning(f"Ignoring checkpoint {path}: it was written for another source or chunk size")
+
+    def is_done(self, chunk_index: int) -> bool:
+        """Whether a chunk was written by an earlier run"""
+        return chunk_index < self.watermark or chunk_index in self.completed
+
+    def mark(self, chunk_index: int):
+        """Record a written chunk"""
+        self.completed.add(chunk_index)
+        while self.watermark in self.completed:
+            self.completed.remove(self.watermark)
+            self.watermark += 1
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({
+                'source': self.source,
+                'chunk_size': self.chunk_size,
+                'watermark': self.watermark,
+                'completed': sorted(self.completed)
+            }, file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Forget the checkpoint once the source has been fully ingested"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class Progress:
+    """Ingestion counters, logged periodically"""
+
+    def __init__(self, name: str, interval: float = 2.0):
+        self.name = name
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self.read = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    def report(self, force: bool = False):
+        """Log progress if the interval has passed (or force is set)"""
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        logging.info(
+            f"{self.name}: read {self.read}, written {self.written} ({self.written / elapsed:.0f}/s), "
+            f"invalid {self.invalid}, duplicates {self.duplicates}, failed {self.failed}, "
+            f"skipped {self.skipped} (checkpoint)"
+        )
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'read': self.read,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'written': self.written,
+            'duplicates': self.duplicates,
+            'failed': self.failed
+        }
+
+class _InlineExecutor:
+    """Executor running tasks in the calling thread, for small inputs and tests"""
+
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def _chunks(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[Tuple[int, List[Tuple[int, Dict[str, Any]]]]]:
+    """Group records into numbered chunks of (sequence, record)"""
+    numbered = enumerate(records)
+    chunk_index = 0
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk_index, chunk
+        chunk_index += 1
+
+def _insert(collection_name: str, docs: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+    """Insert one chunk, returning (written, duplicates, failed)"""
+    if not docs:
+        return 0, 0, 0
+    try:
+        result = db.get_collection(collection_name).insert_many(docs, ordered=False)
+        _record_intakes(collection_name, docs)
+        return len(result.inserted_ids), 0, 0
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        duplicates = sum(1 for error in errors if error.get('code') == DUPLICATE_KEY)
+        failed = len(errors) - duplicates
+        for error in errors:
+            if error.get('code') != DUPLICATE_KEY:
+                logging.error(f"Failed to insert into {collection_name}: {error.get('errmsg')}")
+        # Dogs that already existed (e.g. from an interrupted run) had their intake recorded then
+        rejected = {error.get('index') for error in errors}
+        _record_intakes(collection_name, [doc for index, doc in enumerate(docs) if index not in rejected])
+        return e.details.get('nInserted', len(docs) - len(errors)), duplicates, failed
+
+def _record_intakes(collection_name: str, docs: List[Dict[str, Any]]):
+    """Append the intake (and adoption) events of newly inserted dogs to the status history"""
+    if collection_name == Config.DOGS_COLLECTION:
+        status_history.record([event for doc in docs for event in initial_events(doc)])
+
+def ingest(collection_name: str, records: Iterable[Dict[str, Any]], source: str,
+           chunk_size: int = 1000, validators: Optional[int] = None, writers: int = 4,
+           checkpoint_path: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> Progress:
+    """Validate and insert records: chunks are validated by a process pool and written by a thread pool
+
+    validators=0 validates in the calling thread. Chunks already recorded in the checkpoint
+    file are skipped, so an interrupted run can be repeated with the same arguments.
+    """
+    validate = VALIDATORS[collection_name]
+    context = dict(context or {}, source=source)
+    checkpoint = Checkpoint(checkpoint_path, source, chunk_size)
+    progress = Progress(collection_name)
+
+    validators = (os.cpu_count() or 1) if validators is None else validators
+    max_in_flight = 2 * (max(validators, 1) + writers)
+
+    validate_pool = ProcessPoolExecutor(validators) if validators > 0 else _InlineExecutor()
+    with validate_pool, ThreadPoolExecutor(writers, thread_name_prefix='ingest-writer') as write_pool:
+        validating: Dict[Future, int] = {}
+        writing: Dict[Future, int] = {}
+
+        def drain(block_until: int):
+            """Move finished validations to the writers and record finished writes"""
+            while len(validating) + len(writing) > block_until:
+                done, _ = wait(list(validating) + list(writing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in validating:
+                        chunk_index = validating.pop(future)
+                        docs, errors = future.result()
+                        progress.invalid += len(errors)
+                        for error in errors[:5]:
+                            logging.warning(f"{collection_name}: invalid {error}")
+                        writing[write_pool.submit(_insert, collection_name, docs)] = chunk_index
+                    else:
+                        chunk_index = writing.pop(future)
+                        written, duplicates, failed = future.result()
+                        progress.written += written
+                        progress.duplicates += duplicates
+                        progress.failed += failed
+                        if failed:
+                            # Left out of the checkpoint so the next run retries it; rows that
+                            # did get written come back as duplicates
+                            logging.warning(f"{collection_name}: chunk {chunk_index} had {failed} failed writes and will be retried")
+                        else:
+                            checkpoint.mark(chunk_index)
+                progress.report()
+
+        for chunk_index, chunk in _chunks(records, chunk_size):
+            progress.read += len(chunk)
+            if checkpoint.is_done(chunk_index):
+                progress.skipped += len(chunk)
+                continue
+            # Backpressure: the reader never gets more than max_in_flight chunks ahead
+            drain(max_in_flight - 1)
+            validating[validate_pool.submit(validate, chunk, context)] = chunk_index
+        drain(0)
+
+    progress.report(force=True)
+    if not progress.failed:
+        checkpoint.clear()
+    return progress
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(description='Ingest dogs or breeds from a CSV or NDJSON file')
+    parser.add_argument('collection', choices=sorted(VALIDATORS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='default: from the file extension')
+    parser.add_argument('--shelter', default=app_config.SHELTER_ID,
+                        help='shelter of dogs whose record has no shelter_id')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='records per validation task and insert_many')
+    parser.add_argument('--validators', type=int, default=None, help='validation processes (default: CPU count, 0: inline)')
+    parser.add_argument('--writers', type=int, default=4, help='writer threads; keep at or below the MongoDB maxPoolSize')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <path>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f'{args.path}.checkpoint.json'
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    init_db(app_config)
+    context = {}
+    if args.collection == Config.DOGS_COLLECTION:
+        context['shelter_id'] = args.shelter
+        # Dogs may name their breed instead of giving its id
+        context['breed_ids'] = {name.lower(): breed_id for breed_id, name in Breed.names_by_id().items()}
+
+    progress = ingest(
+        args.collection, read_records(args.path, args.format), os.path.abspath(args.path),
+        chunk_size=args.chunk_size, validators=args.validators, writers=args.writers,
+        checkpoint_path=checkpoint_path, context=context
+    )
+    if progress.failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,10 @@ import os
 import sys
 import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from collections import defaultdict
+from typing import Dict, List, Tuple
 from bson import ObjectId
 
 # Add the parent directory to sys.path to allow importing from models
@@ -12,90 +14,54 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import init_db, Breed, Dog
 from models.dog import AdoptionStatus
-from config import DevelopmentConfig
+from config import Config, DevelopmentConfig
+from utils.ingest import ingest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-def seed_breeds():
-    """Seed the database with breeds from the CSV file"""
-    
-    # Path to the CSV file
-    csv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                           'models', 'breeds.csv')
-    
-    # Check if breeds already exist
-    existing_breeds_count = Breed.count()
-    if existing_breeds_count > 0:
-        logging.info(f"Database already contains {existing_breeds_count} breeds. Skipping seed.")
-        return
-    
-    # Read the CSV file and add breeds to the database
-    breeds_added = 0
+def _read_csv(file_name: str) -> List[Dict[str, str]]:
+    """Read one of the seed CSV files next to the models"""
+    csv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'models', file_name)
     with open(csv_path, 'r') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            try:
-                breed = Breed(name=row['Breed'], description=row['Description'])
-                breed.save()
-                breeds_added += 1
-            except Exception as e:
-                logging.error(f"Error adding breed {row['Breed']}: {e}")
-    
-    logging.info(f"Successfully seeded {breeds_added} breeds to the database.")
+        return list(csv.DictReader(file))
+
+def seed_breeds(breed_rows: List[Dict[str, str]]):
+    """Seed the database with breeds read from the CSV file, keeping their client-side IDs"""
+    progress = ingest(Config.BREEDS_COLLECTION, breed_rows, 'seed:breeds', validators=0)
+    logging.info(f"Successfully seeded {progress.written} breeds to the database.")
 
-def seed_dogs():
+def seed_dogs(breeds: List[Tuple[str, str]]):
     """Seed the database with dogs from the CSV file, ensuring at least 3 dogs per breed"""
     
-    # Path to the CSV file
-    csv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                           'models', 'dogs.csv')
-    
     # Check if dogs already exist
     existing_dogs_count = Dog.count()
     if existing_dogs_count > 0:
         logging.info(f"Database already contains {existing_dogs_count} dogs. Skipping seed.")
         return
     
-    # Get all breeds from the database
-    breeds = Breed.find_all()
     if not breeds:
-        logging.error("No breeds found in database. Please seed breeds first.")
+        logging.error("No breeds found. Please seed breeds first.")
         return
     
     # Track how many dogs are assigned to each breed
     breed_counts = defaultdict(int)
+    dogs_data = _read_csv('dogs.csv')
+    records = []
     
-    # Read the CSV file
-    dogs_data = []
-    with open(csv_path, 'r') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            dogs_data.append(row)
-    
-    def create_dog(dog_info, breed):
-        """Helper function to create a dog with consistent attributes"""
-        try:
-            dog = Dog(
-                name=dog_info['Name'],
-                description=dog_info['Description'],
-                breed_id=breed._id,
-                age=int(dog_info['Age']),
-                gender=dog_info['Gender'],
-                status=random.choice(list(AdoptionStatus)),
-                intake_date=datetime.utcnow() - timedelta(days=random.randint(1, 365))
-            )
-            dog.save()
-            breed_counts[breed.id] += 1
-            return dog
-        except Exception as e:
-            logging.error(f"Error creating dog {dog_info['Name']}: {e}")
-            return None
-    
-    dogs_added = 0
+    def add_dog(dog_info, breed_id):
+        """Helper function to create a dog record with consistent attributes"""
+        records.append({
+            **dog_info,
+            'breed_id': breed_id,
+            'status': random.choice(list(AdoptionStatus)).value,
+            'intake_date': (datetime.utcnow() - timedelta(days=random.randint(1, 365))).isoformat()
+        })
+        breed_counts[breed_id] += 1
     
     # First pass: assign at least 3 dogs to each breed
-    for breed in breeds:
+    for breed_id, _ in breeds:
         # Get 3 random dogs that haven't been assigned yet
         for _ in range(3):
             if not dogs_data:
@@ -103,34 +69,44 @@ def seed_dogs():
             
             dog_info = random.choice(dogs_data)
             dogs_data.remove(dog_info)
-            
-            dog = create_dog(dog_info, breed)
-            if dog:
-                dogs_added += 1
+            add_dog(dog_info, breed_id)
     
     # Second pass: assign remaining dogs randomly
     for dog_info in dogs_data:
-        breed = random.choice(breeds)
-        dog = create_dog(dog_info, breed)
-        if dog:
-            dogs_added += 1
+        add_dog(dog_info, random.choice(breeds)[0])
     
-    logging.info(f"Successfully seeded {dogs_added} dogs to the database.")
+    progress = ingest(Config.DOGS_COLLECTION, records, 'seed:dogs', validators=0)
+    logging.info(f"Successfully seeded {progress.written} dogs to the database.")
     
     # Print distribution of dogs across breeds
-    for breed in breeds:
-        count = breed_counts[breed.id]
-        logging.info(f"Breed '{breed.name}': {count} dogs")
+    for breed_id, name in breeds:
+        logging.info(f"Breed '{name}': {breed_counts[breed_id]} dogs")
 
 def seed_database():
-    """Run all seeding functions in the correct order"""
+    """Seed breeds and dogs concurrently"""
     try:
         # Initialize database connection
         init_db(DevelopmentConfig)
         
         logging.info("Starting database seeding...")
-        seed_breeds()
-        seed_dogs()
+        
+        existing_breeds_count = Breed.count()
+        if existing_breeds_count > 0:
+            logging.info(f"Database already contains {existing_breeds_count} breeds. Skipping seed.")
+            breed_rows = []
+            breeds = [(breed.id, breed.name) for breed in Breed.find_all()]
+        else:
+            # Breed IDs are generated client-side, so dogs can reference them before the breeds are written
+            breed_rows = [dict(row, id=str(ObjectId())) for row in _read_csv('breeds.csv')]
+            breeds = [(row['id'], row['Breed']) for row in breed_rows]
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            tasks = [pool.submit(seed_dogs, breeds)]
+            if breed_rows:
+                tasks.append(pool.submit(seed_breeds, breed_rows))
+            for task in tasks:
+                task.result()
+        
         logging.info("Database seeding completed successfully!")
         
     except Exception as e:
@@ -138,4 +114,4 @@ def seed_database():
         raise
 
 if __name__ == '__main__':
-    seed_database()
\ No newline at end of file
+    seed_database()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, init_db
+from models.dog import status_history
+from models.status_events import initial_events
+from config import Config, config
+from tenancy import use_shelter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Fields initial_events() reads
+DOG_FIELDS = {'shelter_id': 1, 'breed_id': 1, 'status': 1, 'intake_date': 1, 'adoption_date': 1}
+
+def backfill(batch_size: int = 1000) -> int:
+    """Record the intake (and adoption) of every stored dog, for dogs from before the status history"""
+    recorded = 0
+    cursor = db.get_collection(Config.DOGS_COLLECTION).find({}, DOG_FIELDS).batch_size(batch_size)
+    batch = []
+    for doc in cursor:
+        batch.extend(initial_events(doc))
+        if len(batch) >= batch_size:
+            status_history.record(batch)
+            recorded += len(batch)
+            batch = []
+    status_history.record(batch)
+    return recorded + len(batch)
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(description='Maintain the dog status history and its daily rollups')
+    commands = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = commands.add_parser('backfill', help='record intakes and adoptions of existing dogs (run once)')
+    backfill_parser.add_argument('--force', action='store_true', help='run even if events were already recorded')
+    rebuild_parser = commands.add_parser('rebuild', help='recompute the rollups of a range of past days from the events')
+    rebuild_parser.add_argument('--from', dest='start', required=True, type=datetime.fromisoformat, help='first day')
+    rebuild_parser.add_argument('--to', dest='end', required=True, type=datetime.fromisoformat, help='last day')
+    rebuild_parser.add_argument('--shelter', default=app_config.SHELTER_ID, help='shelter whose rollups to rebuild')
+    args = parser.parse_args()
+
+    init_db(app_config)
+    started = time.perf_counter()
+    if args.command == 'backfill':
+        if not args.force and db.get_collection(Config.DOG_STATUS_EVENTS_COLLECTION).find_one():
+            logging.error("Status events already exist; backfilling again would count dogs twice (use --force)")
+            sys.exit(1)
+        count = backfill()
+        logging.info(f"Recorded {count} status events in {(time.perf_counter() - started) * 1000:.0f}ms")
+    else:
+        with use_shelter(args.shelter):
+            status_history.rebuild_rollups(args.start, args.end)
+        logging.info(f"Rebuilt {args.shelter} rollups from {args.start.date()} to {args.end.date()} "
+                     f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+    if status_history.failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import os
+import sys
+import time
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import init_db, Breed
+from models.repository import open_sqlite
+from config import config
+from tenancy import use_shelter
+from dog_sync import SyncToken, changes_since
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+TOKEN_KEY = 'dogs_sync_token'
+
+DOG_COLUMNS = (
+    'id', 'shelter_id', 'name', 'breed_id', 'age', 'gender', 'description', 'status',
+    'intake_date', 'adoption_date', 'updated_at'
+)
+
+UPSERT_DOG = (
+    f"INSERT INTO dogs ({', '.join(DOG_COLUMNS)}) VALUES ({', '.join('?' * len(DOG_COLUMNS))}) "
+    f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in DOG_COLUMNS[1:])}"
+)
+
+def _load_token(connection) -> Optional[SyncToken]:
+    """Get the sync token stored by the previous run, if any"""
+    row = connection.execute('SELECT value FROM sync_state WHERE key = ?', (TOKEN_KEY,)).fetchone()
+    return SyncToken.decode(row['value']) if row else None
+
+def sync_breeds(connection) -> int:
+    """Replace the breed table; it is small, so it is copied whole on every pass"""
+    breeds = Breed.find_all()
+    with connection:
+        connection.execute('DELETE FROM breeds')
+        connection.executemany(
+            'INSERT INTO breeds (id, name, description, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            [
+                (row['id'], row['name'], row['description'], row['created_at'], row['updated_at'])
+                for row in (breed.to_dict() for breed in breeds)
+            ]
+        )
+    return len(breeds)
+
+def sync_dogs(connection, page_size: int, tombstone_ttl: timedelta) -> Dict[str, int]:
+    """Apply every dog change and delete since the stored token, one transaction per page"""
+    token = _load_token(connection)
+    counts = {'changed': 0, 'deleted': 0}
+
+    while True:
+        page = changes_since(token, page_size, tombstone_ttl)
+        if page['reset']:
+            # The token is older than the tombstones, so start over from a full copy
+            logging.warning("Sync token expired; rebuilding the dog table")
+            with connection:
+                connection.execute('DELETE FROM dogs')
+                connection.execute('DELETE FROM sync_state WHERE key = ?', (TOKEN_KEY,))
+            token = None
+            continue
+
+        rows: List[tuple] = [tuple(change[column] for column in DOG_COLUMNS) for change in page['changes']]
+        # Commit the rows and the token that covers them together, so a crash never skips a page
+        with connection:
+            connection.executemany(UPSERT_DOG, rows)
+            connection.executemany('DELETE FROM dogs WHERE id = ?', [(dog_id,) for dog_id in page['deleted']])
+            connection.execute(
+                'INSERT INTO sync_state (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (TOKEN_KEY, page['next'])
+            )
+        counts['changed'] += len(rows)
+        counts['deleted'] += len(page['deleted'])
+        token = SyncToken.decode(page['next'])
+
+        if not page['has_more']:
+            return counts
+
+def sync(path: str, page_size: int, tombstone_ttl: timedelta):
+    """Bring the SQLite copy at path up to date with MongoDB"""
+    started = time.perf_counter()
+    connection = open_sqlite(path, readonly=False)
+    try:
+        breeds = sync_breeds(connection)
+        counts = sync_dogs(connection, page_size, tombstone_ttl)
+    finally:
+        connection.close()
+    logging.info(
+        f"Synced {breeds} breeds, {counts['changed']} changed and {counts['deleted']} deleted dogs "
+        f"to {path} in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(description='Copy dogs and breeds from MongoDB into the SQLite file edge nodes read')
+    parser.add_argument('--path', default=app_config.SQLITE_PATH, help='SQLite file to write')
+    parser.add_argument('--shelter', default=app_config.SHELTER_ID, help='shelter whose dogs are copied')
+    parser.add_argument('--page-size', type=int, default=app_config.SYNC_PAGE_SIZE, help='dogs fetched per page')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='keep syncing every INTERVAL seconds (default: sync once)')
+    args = parser.parse_args()
+
+    init_db(app_config)
+    tombstone_ttl = timedelta(days=app_config.TOMBSTONE_TTL_DAYS)
+    with use_shelter(args.shelter):
+        sync(args.path, args.page_size, tombstone_ttl)
+        # Later passes only fetch the changes since the previous one
+        while args.interval > 0:
+            time.sleep(args.interval)
+            try:
+                sync(args.path, args.page_size, tombstone_ttl)
+            except Exception as e:
+                logging.error(f"Failed to sync the SQLite copy: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import time
+import logging
+
+# Add the parent directory to sys.path to allow importing from models
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import init_db, Breed
+from models.dog import snapshot
+from config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+def write_snapshot(path: str):
+    """Bring the dog snapshot up to date and write it, with the breed table, to path"""
+    started = time.perf_counter()
+    snapshot.refresh()
+    snapshot.save(path, breeds=Breed.table())
+    logging.info(
+        f"Wrote {snapshot.info()['rows']} dogs to {path} in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+
+def main():
+    app_config = config.get(os.getenv('FLASK_ENV', 'development'), config['default'])
+
+    parser = argparse.ArgumentParser(description='Write the memory-mapped dog snapshot file workers start from')
+    parser.add_argument('--path', default=app_config.SNAPSHOT_FILE or 'dogs.snap', help='snapshot file to write')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='keep rewriting the file every INTERVAL seconds (default: write once)')
+    args = parser.parse_args()
+
+    init_db(app_config)
+    write_snapshot(args.path)
+    # Later writes only fetch the changes since the previous one
+    while args.interval > 0:
+        time.sleep(args.interval)
+        try:
+            write_snapshot(args.path)
+        except Exception as e:
+            logging.error(f"Failed to write the dog snapshot: {e}")
+
+if __name__ == '__main__':
+    main()